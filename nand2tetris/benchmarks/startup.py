@@ -0,0 +1,67 @@
+# benchmarks/startup.py
+# 启动开销基准：各模块的导入时间，以及“每个文件一个进程”与批量模式的对比
+#
+#   python benchmarks/startup.py [N]      N 为批量对比用的文件数（默认 200）
+
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+MODULES = [
+    "nand2tetris.cli",
+    "nand2tetris.asm.assembler",
+    "nand2tetris.vm.translator",
+    "nand2tetris.jack.compiler",
+    "nand2tetris.emu.emulator",
+]
+SAMPLE_ASM = "@2\nD=A\n@3\nD=D+A\n@0\nM=D\n(END)\n@END\n0;JMP\n"
+
+
+def run(args, repeat=1) -> float:
+    """
+    运行 repeat 次，返回最快一次的秒数
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(args, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def import_times(repeat=5):
+    baseline = run([sys.executable, "-c", "pass"], repeat)
+    print(f"{'interpreter':32} {baseline * 1000:8.1f} ms")
+    for module in MODULES:
+        elapsed = run([sys.executable, "-c", f"import {module}"], repeat) - baseline
+        print(f"{module:32} {elapsed * 1000:+8.1f} ms")
+
+
+def batch_vs_spawn(n):
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for i in range(n):
+            path = Path(tmp) / f"Prog{i}.asm"
+            path.write_text(SAMPLE_ASM)
+            files.append(str(path))
+
+        command = [sys.executable, "-m", "nand2tetris.cli", "asm"]
+        start = time.perf_counter()
+        for path in files:
+            subprocess.run(command + [path], cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        spawn = time.perf_counter() - start
+
+        list_file = Path(tmp) / "inputs.txt"
+        list_file.write_text("\n".join(files) + "\n")
+        batch = run(command + [f"@{list_file}"])
+
+    print(f"{n} files, one process each: {spawn:7.2f} s ({spawn / n * 1000:.1f} ms/file)")
+    print(f"{n} files, one batch:        {batch:7.2f} s ({batch / n * 1000:.1f} ms/file)")
+
+
+if __name__ == "__main__":
+    import_times()
+    batch_vs_spawn(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
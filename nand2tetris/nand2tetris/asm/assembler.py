@@ -8,32 +8,35 @@ Guided by MIT 'The Missing Semester of Your CS Education' principles:
 
 Usage:
   python assembler.py Prog.asm > Prog.hack
+  python assembler.py Prog.asm --symbols Prog.sym > Prog.hack
 """
 
 import sys
-import re
-from typing import Dict, List
+from types import MappingProxyType
 
 # -----------------------------
 # Symbol Table
 # -----------------------------
 
-PREDEFINED_SYMBOLS: Dict[str, int] = {
+# 模块级常量表全部写成字面量并冻结（只读视图），导入时不做任何计算
+# （也不导入 typing：单是它就占汇编器导入时间的一大半）
+PREDEFINED_SYMBOLS = MappingProxyType({
     "SP": 0,
     "LCL": 1,
     "ARG": 2,
     "THIS": 3,
     "THAT": 4,
-    **{f"R{i}": i for i in range(16)},
+    "R0": 0, "R1": 1, "R2": 2, "R3": 3, "R4": 4, "R5": 5, "R6": 6, "R7": 7,
+    "R8": 8, "R9": 9, "R10": 10, "R11": 11, "R12": 12, "R13": 13, "R14": 14, "R15": 15,
     "SCREEN": 16384,
     "KBD": 24576,
-}
+})
 
 # -----------------------------
 # C-instruction tables
 # -----------------------------
 
-DEST = {
+DEST = MappingProxyType({
     None: "000",
     "M": "001",
     "D": "010",
@@ -42,9 +45,9 @@ DEST = {
     "AM": "101",
     "AD": "110",
     "AMD": "111",
-}
+})
 
-JUMP = {
+JUMP = MappingProxyType({
     None: "000",
     "JGT": "001",
     "JEQ": "010",
@@ -53,9 +56,9 @@ JUMP = {
     "JNE": "101",
     "JLE": "110",
     "JMP": "111",
-}
+})
 
-COMP = {
+COMP = MappingProxyType({
     "0":   "0101010",
     "1":   "0111111",
     "-1":  "0111010",
@@ -84,14 +87,14 @@ COMP = {
     "M-D": "1000111",
     "D&M": "1000000",
     "D|M": "1010101",
-}
+})
 
 # -----------------------------
 # Parsing utilities
 # -----------------------------
 
 def clean_line(line: str) -> str | None:
-    line = re.sub(r"//.*", "", line).strip()
+    line = line.partition("//")[0].strip()
     return line if line else None
 
 
@@ -109,7 +112,7 @@ def parse_c_instruction(instr: str):
 # Assembler passes
 # -----------------------------
 
-def first_pass(lines: List[str]) -> Dict[str, int]:
+def first_pass(lines: list[str]) -> dict[str, int]:
     symbols = dict(PREDEFINED_SYMBOLS)
     rom_addr = 0
     for line in lines:
@@ -121,7 +124,7 @@ def first_pass(lines: List[str]) -> Dict[str, int]:
     return symbols
 
 
-def second_pass(lines: List[str], symbols: Dict[str, int]) -> List[str]:
+def second_pass(lines: list[str], symbols: dict[str, int]) -> list[str]:
     result = []
     next_var_addr = 16
 
@@ -143,14 +146,66 @@ def second_pass(lines: List[str], symbols: Dict[str, int]) -> List[str]:
             continue
 
         # C-instruction
+        result.append(encode_c_instruction(line))
+
+    return result
+
+
+# C 指令编码缓存：生成的汇编里同一条 C 指令（如 M=D、AM=M+1）反复出现，每种只拆分一次
+_C_CODES: dict[str, str] = {}
+
+
+def encode_c_instruction(line: str) -> str:
+    code = _C_CODES.get(line)
+    if code is None:
         dest, comp, jump = parse_c_instruction(line)
         try:
             code = "111" + COMP[comp] + DEST[dest] + JUMP[jump]
         except KeyError:
             raise ValueError(f"Invalid C-instruction: {line}")
-        result.append(code)
+        _C_CODES[line] = code
+    return code
 
-    return result
+def assemble(raw_lines: list[str]) -> list[str]:
+    """
+    汇编源码行 -> 机器码行（每行 16 个 0/1 字符）
+    """
+    lines = list(filter(None, (clean_line(l) for l in raw_lines)))
+    symbols = first_pass(lines)
+    return second_pass(lines, symbols)
+
+
+def assemble_path(path) -> list[str]:
+    """
+    汇编一个 .asm 文件：两遍扫描共用同一个 mmap 映射，不保留行字符串列表，
+    每条指令只在扫描到时解码
+    """
+    from nand2tetris.common.mmapio import code_lines, mapped
+
+    with mapped(path) as buf:
+        symbols = first_pass(line.decode() for line in code_lines(buf))
+        return second_pass((line.decode() for line in code_lines(buf)), symbols)
+
+
+def assemble_with_symbols(raw_lines: list[str]):
+    """
+    同 assemble，另外返回调试信息：
+    (机器码行, 标签 {name: ROM 地址}, 变量 {name: RAM 地址}, 每个 ROM 字的源码行号)
+    """
+    numbered = [(n, clean_line(l)) for n, l in enumerate(raw_lines, 1)]
+    numbered = [(n, line) for n, line in numbered if line]
+    lines = [line for _, line in numbered]
+
+    symbols = first_pass(lines)
+    labels = {name: addr for name, addr in symbols.items() if name not in PREDEFINED_SYMBOLS}
+    machine_code = second_pass(lines, symbols)
+    # second_pass 在 symbols 中新增的就是变量
+    variables = {
+        name: addr for name, addr in symbols.items()
+        if name not in labels and name not in PREDEFINED_SYMBOLS
+    }
+    rom_lines = [n for n, line in numbered if not line.startswith('(')]
+    return machine_code, labels, variables, rom_lines
 
 # -----------------------------
 # CLI entry
@@ -160,27 +215,75 @@ def main(argv=None):
     """
     Hack 汇编器入口
     argv: 由 CLI 传入的参数列表，例如 ['Add.asm']
+    --symbols Prog.sym  同时写出符号 / 调试文件（标签、变量、ROM -> 源码行）
+
+    批量模式：多个输入、glob（"src/*.asm"）或 @list.txt 时，每个 X.asm 写出同目录的 X.hack，
+    一个进程处理全部文件；-j N 使用 N 个工作进程。单个文件出错不影响其他文件
     """
     if argv is None:
         argv = sys.argv[1:]
 
-    if len(argv) != 1:
-        print("Usage: asm Prog.asm", file=sys.stderr)
+    from nand2tetris.common.batch import expand_inputs, parse_jobs, run_batch
+
+    usage = (
+        "Usage: asm Prog.asm [--symbols Prog.sym] | "
+        "asm [-j N] <A.asm B.asm ... | 'dir/*.asm' | @list.txt>"
+    )
+    symbols_path = None
+    try:
+        jobs, argv = parse_jobs(argv)
+    except ValueError:
+        print(usage, file=sys.stderr)
         sys.exit(1)
+    if "--symbols" in argv:
+        i = argv.index("--symbols")
+        if i + 1 >= len(argv):
+            print(usage, file=sys.stderr)
+            sys.exit(1)
+        symbols_path = argv[i + 1]
+        argv = argv[:i] + argv[i + 2:]
 
-    filename = argv[0]
+    inputs = expand_inputs(argv)
+    # 恰好一个普通文件参数时保持原来的行为：输出到 stdout
+    batch = len(inputs) != 1 or inputs != argv
 
-    with open(filename) as f:
-        raw_lines = f.readlines()
+    if not inputs or (batch and symbols_path):
+        print(usage, file=sys.stderr)
+        sys.exit(1)
 
-    lines = list(filter(None, (clean_line(l) for l in raw_lines)))
-    symbols = first_pass(lines)
-    machine_code = second_pass(lines, symbols)
+    if batch:
+        if run_batch(assemble_file, inputs, jobs):
+            sys.exit(1)
+        return
+
+    filename = inputs[0]
+
+    if symbols_path:
+        from nand2tetris.asm.symbols import write_symbols
+        # 符号文件需要源码行号，逐行读取
+        with open(filename) as f:
+            raw_lines = f.readlines()
+        machine_code, labels, variables, rom_lines = assemble_with_symbols(raw_lines)
+        write_symbols(symbols_path, labels, variables, rom_lines)
+        print(f"Generated: {symbols_path}", file=sys.stderr)
+    else:
+        machine_code = assemble_path(filename)
 
     for code in machine_code:
         print(code)
 
 
+def assemble_file(filename: str) -> str:
+    """
+    汇编 X.asm，写出同目录的 X.hack，返回输出路径
+    """
+    machine_code = assemble_path(filename)
+    out_path = filename[:-len(".asm")] + ".hack" if filename.endswith(".asm") else filename + ".hack"
+    with open(out_path, "w") as f:
+        f.write("\n".join(machine_code) + "\n")
+    return out_path
+
+
 if __name__ == "__main__":
     main()
 
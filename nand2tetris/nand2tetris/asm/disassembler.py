@@ -0,0 +1,210 @@
+# nand2tetris/asm/disassembler.py
+# Hack 反汇编器：.hack 机器码 -> .asm，用于检查各个优化阶段的输出
+#
+# C 指令按汇编器的 COMP / DEST / JUMP 表反查，输出再汇编一次与原机器码逐字相同。
+# 给出汇编器的符号文件（.sym）时恢复名字：
+#   - 标签位置写出 (label)，跳转前的 @地址 写成 @label
+#   - 读写 M 的 @地址 写成变量名或 SP / LCL / ARG / THIS / THAT / R13..R15
+# 汇编器按首次出现的顺序从 16 起分配变量，变量名只在不打乱这个顺序时使用，
+# 其余地址保留数字，保证再汇编的结果不变。
+
+import os
+import sys
+
+from nand2tetris.asm.assembler import COMP, DEST, JUMP, assemble, assemble_with_symbols
+
+COMP_NAMES = {int(code, 2): name for name, code in COMP.items()}
+DEST_NAMES = {int(code, 2): name for name, code in DEST.items()}
+JUMP_NAMES = {int(code, 2): name for name, code in JUMP.items()}
+
+# 读写 M 时使用的预定义符号（R5..R12 在 VM 代码中是 temp 段，保留数字）
+REGISTER_NAMES = {0: "SP", 1: "LCL", 2: "ARG", 3: "THIS", 4: "THAT", 13: "R13", 14: "R14", 15: "R15"}
+FIRST_VARIABLE = 16
+
+# 同一个 C 指令字在程序中反复出现，每种只反查一次
+_C_LINES: dict[int, str] = {}
+
+
+def decode_c_instruction(word: int) -> str:
+    line = _C_LINES.get(word)
+    if line is None:
+        comp = COMP_NAMES.get((word >> 6) & 0x7F)
+        if comp is None or word >> 13 != 0b111:
+            raise ValueError(f"Invalid C-instruction: {word:016b}")
+        dest = DEST_NAMES[(word >> 3) & 0x7]
+        jump = JUMP_NAMES[word & 0x7]
+        line = comp
+        if dest:
+            line = f"{dest}={line}"
+        if jump:
+            line = f"{line};{jump}"
+        _C_LINES[word] = line
+    return line
+
+
+def _uses_m(word: int) -> bool:
+    # a 位为 1（读 M）或 dest 含 M（写 M）
+    return bool(word & 0x1000) or bool(word & 0x8)
+
+
+def disassemble(words, labels=None, variables=None) -> list[str]:
+    """
+    机器字列表 -> 汇编行
+    labels / variables: 可选的 {name: 地址}（来自符号文件），不给时所有地址保留数字
+    """
+    words = list(words)
+    symbolic = labels is not None
+    labels_at = {}
+    for name, addr in (labels or {}).items():
+        labels_at.setdefault(addr, []).append(name)
+    jump_targets = {addr: names[0] for addr, names in labels_at.items()}
+    variable_at = {addr: name for name, addr in (variables or {}).items()}
+    # 已经写出的变量名；下一个新变量必须恰好在 FIRST_VARIABLE + len(seen) 处
+    seen = set()
+
+    lines = []
+    for pc, word in enumerate(words):
+        for name in labels_at.get(pc, ()):
+            lines.append(f"({name})")
+
+        if word & 0x8000:
+            try:
+                lines.append(decode_c_instruction(word))
+            except ValueError as e:
+                raise ValueError(f"ROM[{pc}]: {e}") from None
+            continue
+
+        operand = str(word)
+        following = words[pc + 1] if pc + 1 < len(words) else 0
+        if symbolic and following & 0x8000:
+            if following & 0x7 and word in jump_targets:
+                operand = jump_targets[word]
+            elif _uses_m(following):
+                name = variable_at.get(word)
+                if name is not None and (
+                    name in seen or word == FIRST_VARIABLE + len(seen)
+                ):
+                    seen.add(name)
+                    operand = name
+                elif word in REGISTER_NAMES:
+                    operand = REGISTER_NAMES[word]
+        lines.append(f"@{operand}")
+
+    # 程序末尾的标签（例如只有标签、没有指令的结尾）
+    for name in labels_at.get(len(words), ()):
+        lines.append(f"({name})")
+    return lines
+
+
+def load_words(path) -> list[int]:
+    """
+    读取 .hack 文件（每行 16 个 0/1 字符）
+    """
+    from nand2tetris.common.mmapio import code_lines, mapped
+
+    with mapped(path) as buf:
+        return [int(line, 2) for line in code_lines(buf)]
+
+
+def disassemble_path(path, symbols_path=None) -> list[str]:
+    labels = variables = None
+    if symbols_path:
+        from nand2tetris.asm.symbols import SymbolFile
+
+        with SymbolFile(symbols_path) as symbols:
+            labels = dict(symbols.labels())
+            variables = dict(symbols.variables())
+    return disassemble(load_words(path), labels, variables)
+
+
+def disassemble_file(path: str) -> str:
+    """
+    反汇编 X.hack，写出同目录的 X.dis.asm（有 X.sym 时恢复名字），返回输出路径
+    """
+    stem = path[:-len(".hack")] if path.endswith(".hack") else path
+    symbols_path = stem + ".sym"
+    lines = disassemble_path(path, symbols_path if os.path.exists(symbols_path) else None)
+    out_path = stem + ".dis.asm"
+    with open(out_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return out_path
+
+
+def verify_file(path: str):
+    """
+    asm -> hack -> asm -> hack 往返检查：数字形式和恢复名字后的反汇编，
+    再汇编都必须与原机器码逐字相同；不同时抛出 ValueError，指出第一个不同的 ROM 地址
+    """
+    with open(path) as f:
+        raw_lines = f.readlines()
+    machine_code, labels, variables, _ = assemble_with_symbols(raw_lines)
+    words = [int(code, 2) for code in machine_code]
+
+    for mode, text in (
+        ("numeric", disassemble(words)),
+        ("symbolic", disassemble(words, labels, variables)),
+    ):
+        again = assemble(text)
+        if again != machine_code:
+            pc = next(
+                (i for i, (a, b) in enumerate(zip(machine_code, again)) if a != b),
+                min(len(machine_code), len(again)),
+            )
+            raise ValueError(
+                f"{mode} round trip differs at ROM[{pc}] "
+                f"({len(machine_code)} words, reassembled {len(again)})"
+            )
+
+
+def main(argv=None):
+    """
+    nand2tetris disasm Prog.hack [--symbols Prog.sym]       反汇编到 stdout
+    nand2tetris disasm [-j N] <A.hack B.hack ... | 'dir/*.hack' | @list.txt>
+        批量：X.hack -> 同目录的 X.dis.asm（有 X.sym 时自动使用）
+    nand2tetris disasm verify [-j N] <A.asm ... | 'dir/*.asm' | @list.txt>
+        往返检查 asm -> hack -> asm -> hack，只报告不一致的文件
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+
+    from nand2tetris.common.batch import expand_inputs, parse_jobs, run_batch
+
+    usage = (
+        "Usage: nand2tetris disasm Prog.hack [--symbols Prog.sym] | "
+        "disasm [-j N] <A.hack ... | 'dir/*.hack' | @list.txt> | "
+        "disasm verify [-j N] <A.asm ... | 'dir/*.asm' | @list.txt>"
+    )
+    verify = bool(argv) and argv[0] == "verify"
+    if verify:
+        argv = argv[1:]
+    symbols_path = None
+    try:
+        jobs, argv = parse_jobs(argv)
+    except ValueError:
+        print(usage, file=sys.stderr)
+        sys.exit(1)
+    if "--symbols" in argv:
+        i = argv.index("--symbols")
+        if i + 1 >= len(argv):
+            print(usage, file=sys.stderr)
+            sys.exit(1)
+        symbols_path = argv[i + 1]
+        argv = argv[:i] + argv[i + 2:]
+
+    inputs = expand_inputs(argv)
+    batch = verify or len(inputs) != 1 or inputs != argv
+    if not inputs or (batch and symbols_path):
+        print(usage, file=sys.stderr)
+        sys.exit(1)
+
+    if batch:
+        if run_batch(verify_file if verify else disassemble_file, inputs, jobs):
+            sys.exit(1)
+        return
+
+    for line in disassemble_path(inputs[0], symbols_path):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
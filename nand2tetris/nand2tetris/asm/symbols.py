@@ -0,0 +1,156 @@
+# nand2tetris/asm/symbols.py
+# 汇编器的符号 / 调试文件（.sym）：标签、变量、ROM 地址 -> 源码行号
+#
+# 二进制格式（小端），读取时用 mmap 映射，按需查询，不整体解析：
+#   文件头   b"HSYM", 版本, 保留, 标签数 NL, 变量数 NV, ROM 字数 NR
+#   u32[NR]      每个 ROM 字在 .asm 中的行号（从 1 开始）
+#   u32[NL + 1]  标签名在字符串表中的起止偏移
+#   u32[NV + 1]  变量名的起止偏移（紧接在标签名之后）
+#   u16[NL]      标签地址（升序，同一地址按源码顺序）
+#   u16[NV]      变量地址（升序）
+#   字符串表     UTF-8 名字依次拼接
+# 文件头 20 字节，各数组按 4 / 2 字节自然对齐，可以直接 memoryview.cast。
+
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+MAGIC = b"HSYM"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIII")
+
+
+def write_symbols(path, labels, variables, rom_lines):
+    """
+    labels / variables: {name: address}（保持插入顺序）
+    rom_lines: 每个 ROM 字对应的源码行号
+    """
+    labels = sorted(labels.items(), key=lambda item: item[1])
+    variables = sorted(variables.items(), key=lambda item: item[1])
+
+    names = [name.encode() for name, _ in labels + variables]
+    offsets = [0]
+    for name in names:
+        offsets.append(offsets[-1] + len(name))
+    n_labels = len(labels)
+
+    sections = [
+        HEADER.pack(MAGIC, VERSION, 0, n_labels, len(variables), len(rom_lines)),
+        _pack("I", rom_lines),
+        _pack("I", offsets[:n_labels + 1]),
+        _pack("I", offsets[n_labels:]),
+        _pack("H", [addr for _, addr in labels]),
+        _pack("H", [addr for _, addr in variables]),
+        b"".join(names),
+    ]
+    with open(path, "wb") as f:
+        f.write(b"".join(sections))
+
+
+def _pack(typecode, values) -> bytes:
+    data = array(typecode, values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+class SymbolFile:
+    """
+    只读的符号文件视图（mmap），地址查询用二分，名字查询首次使用时建索引
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, n_labels, n_vars, n_rom = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.mm.close()
+            raise ValueError(f"Not a symbol file: {path}")
+
+        offset = HEADER.size
+        self.rom_lines, offset = self._section(offset, "I", n_rom)
+        self.label_offsets, offset = self._section(offset, "I", n_labels + 1)
+        self.var_offsets, offset = self._section(offset, "I", n_vars + 1)
+        self.label_addrs, offset = self._section(offset, "H", n_labels)
+        self.var_addrs, offset = self._section(offset, "H", n_vars)
+        self.strings = offset
+        self._by_name = None
+
+    def _section(self, offset, typecode, count):
+        size = array(typecode).itemsize * count
+        if sys.byteorder == "little":
+            view = memoryview(self.mm)[offset:offset + size].cast(typecode)
+        else:
+            # 大端主机需要交换字节序，只能复制一份
+            view = array(typecode, self.mm[offset:offset + size])
+            view.byteswap()
+        return view, offset + size
+
+    def _name(self, offsets, i) -> str:
+        start = self.strings + offsets[i]
+        return self.mm[start:self.strings + offsets[i + 1]].decode()
+
+    def close(self):
+        # 先释放 memoryview，mmap 才能关闭
+        for view in (self.rom_lines, self.label_offsets, self.var_offsets,
+                     self.label_addrs, self.var_addrs):
+            if isinstance(view, memoryview):
+                view.release()
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def labels(self):
+        for i, addr in enumerate(self.label_addrs):
+            yield self._name(self.label_offsets, i), addr
+
+    def variables(self):
+        for i, addr in enumerate(self.var_addrs):
+            yield self._name(self.var_offsets, i), addr
+
+    def address(self, name: str):
+        """
+        标签或变量的地址，不存在时返回 None
+        """
+        if self._by_name is None:
+            self._by_name = dict(self.variables())
+            # 同名时标签优先（汇编器也是先定义标签）
+            self._by_name.update(self.labels())
+        return self._by_name.get(name)
+
+    def label_at(self, rom_addr: int):
+        """
+        恰好位于 rom_addr 的第一个标签，没有则返回 None
+        """
+        i = bisect_left(self.label_addrs, rom_addr)
+        if i < len(self.label_addrs) and self.label_addrs[i] == rom_addr:
+            return self._name(self.label_offsets, i)
+        return None
+
+    def nearest_label(self, rom_addr: int):
+        """
+        rom_addr 之前（含）最近的标签，返回 (name, 偏移)；没有则返回 None
+        """
+        i = bisect_right(self.label_addrs, rom_addr)
+        if i == 0:
+            return None
+        addr = self.label_addrs[i - 1]
+        # 同一地址有多个标签时取第一个
+        i = bisect_left(self.label_addrs, addr)
+        return self._name(self.label_offsets, i), rom_addr - addr
+
+    def variable_at(self, ram_addr: int):
+        i = bisect_left(self.var_addrs, ram_addr)
+        if i < len(self.var_addrs) and self.var_addrs[i] == ram_addr:
+            return self._name(self.var_offsets, i)
+        return None
+
+    def source_line(self, rom_addr: int) -> int:
+        return self.rom_lines[rom_addr]
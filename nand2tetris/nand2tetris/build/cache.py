@@ -0,0 +1,167 @@
+# nand2tetris/build/cache.py
+# 增量构建缓存：常驻进程（serve / watch）在多次构建之间复用的结果
+#
+# 文件级：先比较 (mtime, size)，变了再比较内容摘要，内容没变就不重新编译
+# 链接级：VM -> 汇编按文件分片翻译，片段按内容缓存（见 translator.translate_cached）
+# 汇编、链接是整程序的，每次重做，但它们只占构建时间的一小部分
+
+import hashlib
+import os
+import time
+from pathlib import Path
+
+from nand2tetris.asm.assembler import assemble
+from nand2tetris.jack.compiler import compile_to_commands
+from nand2tetris.vm.commands import format_command
+from nand2tetris.vm.translator import link_program
+
+
+def vm_lines(text: str) -> list[str]:
+    """
+    VM 文本 -> 指令行（去掉空行和注释）
+    """
+    return [
+        line.strip()
+        for line in text.splitlines()
+        if line.strip() and not line.strip().startswith("//")
+    ]
+
+
+class FileCache:
+    """
+    path -> (stat 键, 内容摘要, 结果)；结果由 loader(path) 生成
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path):
+        path = str(path)
+        st = os.stat(path)
+        stat_key = (st.st_mtime_ns, st.st_size)
+        entry = self.entries.get(path)
+        if entry is not None and entry[0] == stat_key:
+            self.hits += 1
+            return entry[2]
+
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read()).digest()
+        if entry is not None and entry[1] == digest:
+            # 只是被 touch 过，内容没变
+            self.entries[path] = (stat_key, digest, entry[2])
+            self.hits += 1
+            return entry[2]
+
+        result = self.loader(path)
+        self.entries[path] = (stat_key, digest, result)
+        self.misses += 1
+        return result
+
+    def changed(self, path) -> bool:
+        """
+        文件是否与缓存中的版本不同（不存在于缓存也算变化）
+        """
+        path = str(path)
+        entry = self.entries.get(path)
+        if entry is None:
+            return True
+        st = os.stat(path)
+        if entry[0] == (st.st_mtime_ns, st.st_size):
+            return False
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).digest() != entry[1]
+
+    def discard(self, path):
+        self.entries.pop(str(path), None)
+
+
+def vm_text(commands) -> str:
+    """
+    指令元组 -> VM 文本（与 nand2tetris jack 写出的 .vm 相同）
+    """
+    return "".join(format_command(command) + "\n" for command in commands)
+
+
+def _compile_and_write(path):
+    commands = compile_to_commands(path)
+    with open(path.replace(".jack", ".vm"), "w") as f:
+        f.write(vm_text(commands))
+    return commands
+
+
+def _read_text(path):
+    with open(path) as f:
+        return f.read()
+
+
+class BuildCache:
+    """
+    一组程序目录的增量构建状态
+    """
+
+    def __init__(self, write_vm=False):
+        # .jack -> VM 指令元组（直接交给链接器，不经过文本）
+        # write_vm=True 时同时写出 .vm（与 nand2tetris jack 一致）
+        self.jack = FileCache(_compile_and_write if write_vm else compile_to_commands)
+        # .vm -> VM 指令行
+        self.vm = FileCache(lambda path: vm_lines(_read_text(path)))
+        # .asm -> 机器码行
+        self.asm = FileCache(lambda path: assemble(_read_text(path).splitlines()))
+        # 程序目录 -> 翻译片段缓存
+        self.fragments = {}
+
+    def compile(self, path) -> list[tuple]:
+        return self.jack.get(path)
+
+    def program(self, directory):
+        """
+        目录中的 .jack（编译）与没有对应 .jack 的 .vm，按文件名排序拼成整程序
+        """
+        directory = Path(directory)
+        sources = {}
+        for vm_file in sorted(directory.glob("*.vm")):
+            sources[vm_file.stem] = vm_file
+        for jack_file in sorted(directory.glob("*.jack")):
+            sources[jack_file.stem] = jack_file
+
+        program = []
+        for stem in sorted(sources):
+            path = sources[stem]
+            lines = self.jack.get(path) if path.suffix == ".jack" else self.vm.get(path)
+            program.extend((stem, line) for line in lines)
+        return program
+
+    def translate(self, directory, **options) -> list[str]:
+        directory = Path(directory)
+        fragments = self.fragments.setdefault(str(directory.resolve()), {})
+        return link_program(self.program(directory), cache=fragments, **options)
+
+    def build(self, directory, write=True, **options):
+        """
+        构建整个目录：编译 -> 翻译 -> 汇编
+        write=True 时写出 <dir>/<dir>.asm 与 <dir>/<dir>.hack
+        返回 (机器码行, 统计信息)
+        """
+        directory = Path(directory).resolve()
+        start = time.perf_counter()
+        asm_lines = self.translate(directory, **options)
+        machine_code = assemble(asm_lines)
+
+        if write:
+            base = directory / directory.name
+            base.with_suffix(".asm").write_text("\n".join(asm_lines) + "\n")
+            base.with_suffix(".hack").write_text("\n".join(machine_code) + "\n")
+
+        return machine_code, {
+            "rom": len(machine_code),
+            "ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+
+    def stats(self) -> dict:
+        return {
+            kind: {"files": len(cache.entries), "hits": cache.hits, "misses": cache.misses}
+            for kind, cache in (("jack", self.jack), ("vm", self.vm), ("asm", self.asm))
+        }
@@ -0,0 +1,188 @@
+# nand2tetris/build/daemon.py
+# 常驻构建进程：在本地 Unix socket 上提供编译 / 翻译 / 汇编服务
+#
+# 模块只导入一次，编译结果和翻译片段缓存在内存里（见 build/cache.py），
+# 编辑器每次保存后只需要一次 socket 往返。
+#
+# 协议：每行一个 JSON 请求，每行一个 JSON 响应
+#   {"op": "compile",   "path": "Main.jack", "write": false}  -> {"ok": true, "vm": "..."}
+#   {"op": "translate", "path": "ProgDir", "options": ["--inline"]} -> {"ok": true, "asm": "..."}
+#   {"op": "assemble",  "path": "Prog.asm"}                    -> {"ok": true, "hack": "..."}
+#   {"op": "build",     "path": "ProgDir", "options": [...]}   -> {"ok": true, "rom": N, "ms": T}
+#   {"op": "stats"} / {"op": "shutdown"}
+# 出错时返回 {"ok": false, "error": "..."}
+# path 按守护进程的工作目录解析；客户端（request）发送前先转成绝对路径
+
+import asyncio
+import errno
+import json
+import os
+import socket
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from nand2tetris.build.cache import BuildCache, vm_text
+from nand2tetris.vm.translator import parse_options
+
+
+def default_socket() -> str:
+    return os.path.join(tempfile.gettempdir(), f"nand2tetris-{os.getuid()}.sock")
+
+
+def _link_options(request):
+    options, rest = parse_options(request.get("options", []))
+    if rest:
+        raise ValueError(f"Unknown option(s): {' '.join(rest)}")
+    return options
+
+
+def _listening(path) -> bool:
+    """
+    socket 文件上是否有进程在监听（否则是上次异常退出留下的）
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+def _is_shutdown(line: bytes) -> bool:
+    try:
+        return json.loads(line).get("op") == "shutdown"
+    except (ValueError, AttributeError):
+        return False
+
+
+class BuildServer:
+    def __init__(self, path):
+        self.path = path
+        self.cache = BuildCache()
+        # 翻译器使用模块级计数器，请求在同一个工作线程里串行执行
+        self.worker = ThreadPoolExecutor(max_workers=1)
+        self.server = None
+
+    def handle(self, request) -> dict:
+        op = request.get("op")
+        if op == "compile":
+            text = vm_text(self.cache.compile(request["path"]))
+            if request.get("write"):
+                with open(request["path"].replace(".jack", ".vm"), "w") as f:
+                    f.write(text)
+            return {"vm": text}
+        if op == "translate":
+            asm_lines = self.cache.translate(request["path"], **_link_options(request))
+            return {"asm": "\n".join(asm_lines) + "\n"}
+        if op == "assemble":
+            return {"hack": "\n".join(self.cache.asm.get(request["path"])) + "\n"}
+        if op == "build":
+            _, info = self.cache.build(
+                request["path"], write=request.get("write", True), **_link_options(request)
+            )
+            return info
+        if op == "stats":
+            return self.cache.stats()
+        raise ValueError(f"Unknown op: {op}")
+
+    def respond(self, line: bytes) -> dict:
+        try:
+            request = json.loads(line)
+            response = self.handle(request)
+            response["ok"] = True
+        except Exception as e:
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        return response
+
+    async def client(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while line := await reader.readline():
+                if _is_shutdown(line):
+                    writer.write(b'{"ok": true}\n')
+                    await writer.drain()
+                    self.server.close()
+                    return
+                response = await loop.run_in_executor(self.worker, self.respond, line)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        if os.path.exists(self.path):
+            if _listening(self.path):
+                raise OSError(errno.EADDRINUSE, "Build server already running", self.path)
+            os.unlink(self.path)
+        self.server = await asyncio.start_unix_server(self.client, path=self.path)
+        print(f"Listening on {self.path}", file=sys.stderr)
+        try:
+            async with self.server:
+                await self.server.wait_closed()
+        finally:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self.worker.shutdown()
+
+
+def request(payload: dict, path=None) -> dict:
+    """
+    发送一个请求并等待响应（同步客户端，供脚本 / 编辑器插件使用）
+    """
+    if "path" in payload:
+        payload = dict(payload, path=os.path.abspath(payload["path"]))
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path or default_socket())
+        sock.sendall(json.dumps(payload).encode() + b"\n")
+        with sock.makefile("rb") as f:
+            return json.loads(f.readline())
+
+
+def main(argv=None):
+    """
+    nand2tetris serve [--socket PATH]            启动常驻构建进程
+    nand2tetris serve [--socket PATH] --send JSON  发送一个请求并打印响应
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+
+    usage = "Usage: nand2tetris serve [--socket PATH] [--send JSON]"
+    path = default_socket()
+    payload = None
+
+    it = iter(argv)
+    for arg in it:
+        if arg in ("--socket", "--send"):
+            value = next(it, None)
+            if value is None:
+                print(usage, file=sys.stderr)
+                sys.exit(1)
+            if arg == "--socket":
+                path = value
+            else:
+                payload = json.loads(value)
+        else:
+            print(usage, file=sys.stderr)
+            sys.exit(1)
+
+    if payload is not None:
+        response = request(payload, path)
+        print(json.dumps(response))
+        if not response.get("ok"):
+            sys.exit(1)
+        return
+
+    try:
+        asyncio.run(BuildServer(path).serve())
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
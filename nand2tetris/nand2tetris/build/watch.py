@@ -0,0 +1,165 @@
+# nand2tetris/build/watch.py
+# 监视模式：文件变化后只重做受影响的阶段
+#
+# 轮询目录（标准库没有 inotify），每个文件先比较 (mtime, size)，变了再比较内容摘要：
+#   X.jack 变化    重新编译这一个类（写出 X.vm），只重新翻译它的片段，再链接、汇编
+#   X.vm 变化      （没有对应 .jack 时）只重新翻译它的片段，再链接、汇编
+#   X.asm 变化     （手写汇编，不是构建产物）只重新汇编为 X.hack
+#   X.jack 删除    同时删除为它写出的 X.vm，否则它会被当作独立的 .vm 继续链接
+# 其余文件的编译结果与翻译片段都从缓存中取（见 build/cache.py）
+
+import sys
+import time
+from pathlib import Path
+
+from nand2tetris.build.cache import BuildCache
+from nand2tetris.vm.translator import parse_options
+
+DEFAULT_INTERVAL = 0.5
+
+
+def sources(directory: Path):
+    """
+    返回 (程序源文件, 独立的 .asm 文件)
+    程序源文件：.jack，以及没有对应 .jack 的 .vm；构建产物（X.vm、<dir>.asm）不算
+    """
+    jack = sorted(directory.glob("*.jack"))
+    stems = {path.stem for path in jack}
+    vm = [path for path in sorted(directory.glob("*.vm")) if path.stem not in stems]
+    asm = [path for path in sorted(directory.glob("*.asm")) if path.stem != directory.name]
+    return jack + vm, asm
+
+
+class Watcher:
+    def __init__(self, directory, options, log=None):
+        self.directory = Path(directory).resolve()
+        self.options = options
+        self.log = log or (lambda message: print(message, file=sys.stderr))
+        self.cache = BuildCache(write_vm=True)
+        self.known = None
+        # 构建失败时各文件的 (mtime, size)：文件再次改动之前不重复报错
+        self.failed = {}
+
+    def _cache_for(self, path: Path):
+        return {".jack": self.cache.jack, ".vm": self.cache.vm, ".asm": self.cache.asm}[path.suffix]
+
+    def poll(self) -> bool:
+        """
+        检查一次变化并重建；有变化时返回 True
+        """
+        program_files, asm_files = sources(self.directory)
+        changed, changed_asm, vanished = [], [], set()
+        for path in program_files + asm_files:
+            try:
+                if self._changed(path):
+                    (changed_asm if path.suffix == ".asm" else changed).append(path)
+            except FileNotFoundError:
+                # 列出目录之后才被删除，按已删除处理
+                vanished.add(path)
+        current = set(program_files + asm_files) - vanished
+
+        removed = self.known - current if self.known is not None else set()
+        generated = {path.with_suffix(".vm") for path in removed if path.suffix == ".jack"}
+        for path in generated:
+            path.unlink(missing_ok=True)
+            self.cache.vm.discard(path)
+        changed = [path for path in changed if path not in generated]
+        current -= generated
+        for path in removed:
+            self._cache_for(path).discard(path)
+        self.known = current
+
+        try:
+            for path in changed_asm:
+                self._assemble(path)
+            removed_sources = [path for path in removed if path.suffix != ".asm"]
+            if changed or removed_sources:
+                self._build(changed, removed_sources)
+            self.failed = {}
+        except Exception as e:
+            # 保存了半截的文件很常见，报告错误后继续监视
+            self.log(f"Error: {type(e).__name__}: {e}")
+            self.failed = {path: _stat_key(path) for path in changed + changed_asm}
+        return bool(changed or changed_asm or removed)
+
+    def _changed(self, path: Path) -> bool:
+        if path in self.failed and self.failed[path] == _stat_key(path):
+            return False
+        return self._cache_for(path).changed(path)
+
+    def _assemble(self, path: Path):
+        start = time.perf_counter()
+        machine_code = self.cache.asm.get(path)
+        path.with_suffix(".hack").write_text("\n".join(machine_code) + "\n")
+        self.log(f"Assembled {path.name} ({_ms(start)} ms)")
+
+    def _build(self, changed, removed):
+        start = time.perf_counter()
+        compiled = []
+        for path in changed:
+            if path.suffix == ".jack":
+                self.cache.compile(path)
+                compiled.append(path.name)
+        compile_ms = _ms(start)
+
+        machine_code, info = self.cache.build(self.directory, **self.options)
+        names = [path.name for path in changed] + [f"-{path.name}" for path in removed]
+        detail = f"compiled {', '.join(compiled)} in {compile_ms} ms, " if compiled else ""
+        self.log(
+            f"Rebuilt {self.directory.name}.hack after {', '.join(names)}: "
+            f"{detail}ROM {info['rom']} words, {_ms(start)} ms total"
+        )
+
+    def run(self, interval=DEFAULT_INTERVAL):
+        self.log(f"Watching {self.directory} (Ctrl-C to stop)")
+        while True:
+            self.poll()
+            time.sleep(interval)
+
+
+def _stat_key(path: Path):
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _ms(start) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def main(argv=None):
+    """
+    nand2tetris watch <dir> [--interval SEC] [VM 翻译选项]
+    VM 翻译选项同 nand2tetris vm（--no-dce / --inline[=N] / --regalloc / --bump-alloc / --intrinsics）
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+
+    usage = (
+        "Usage: nand2tetris watch <dir> [--interval SEC] [--no-dce] [--inline[=N]] "
+        "[--regalloc] [--bump-alloc] [--intrinsics]"
+    )
+    interval = DEFAULT_INTERVAL
+    if "--interval" in argv:
+        i = argv.index("--interval")
+        if i + 1 >= len(argv):
+            print(usage, file=sys.stderr)
+            sys.exit(1)
+        interval = float(argv[i + 1])
+        argv = argv[:i] + argv[i + 2:]
+
+    options, args = parse_options(argv)
+    if len(args) != 1 or not Path(args[0]).is_dir():
+        print(usage, file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        Watcher(args[0], options).run(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
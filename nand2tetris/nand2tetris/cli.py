@@ -7,13 +7,20 @@ import sys
 def main():
     # sys.argv:
     #   argv[0] -> 模块名
-    #   argv[1] -> 子命令（asm / vm / jack）
+    #   argv[1] -> 子命令（asm / disasm / vm / vmb / jack / check / emu / test / serve / watch）
     if len(sys.argv) < 2:
         print("Usage: nand2tetris <command> [args...]")
         print("Commands:")
         print("  asm   Hack 汇编器（Project 6）")
+        print("  disasm Hack 反汇编器（.hack -> .asm，verify 做往返检查）")
         print("  vm    VM 翻译器（Project 7–8）")
+        print("  vmb   .vm 与 .vmb 字节码互相转换")
         print("  jack  Jack 编译器（Project 10–11）")
+        print("  check Jack 全程序调用检查（子程序、参数个数）")
+        print("  emu   Hack 模拟器（无界面，可导出屏幕）")
+        print("  test  批量运行 tests/ 下的夹具与 .tst 场景")
+        print("  serve 常驻构建进程（Unix socket，增量编译）")
+        print("  watch 监视目录，文件变化后增量重建")
         sys.exit(1)
 
     command = sys.argv[1]
@@ -27,14 +34,42 @@ def main():
         # 把剩余参数传给 assembler
         asm_main(sys.argv[2:])
 
+    elif command == "disasm":
+        from nand2tetris.asm.disassembler import main as disasm_main
+        disasm_main(sys.argv[2:])
+
     elif command == "vm":
         from nand2tetris.vm.translator import main as vm_main
         vm_main(sys.argv[2:])
 
+    elif command == "vmb":
+        from nand2tetris.vm.bytecode import main as vmb_main
+        vmb_main(sys.argv[2:])
+
     elif command == "jack":
         from nand2tetris.jack.compiler import main as jack_main
         jack_main(sys.argv[2:])
 
+    elif command == "check":
+        from nand2tetris.jack.checker import main as check_main
+        check_main(sys.argv[2:])
+
+    elif command == "emu":
+        from nand2tetris.emu.emulator import main as emu_main
+        emu_main(sys.argv[2:])
+
+    elif command == "test":
+        from nand2tetris.testing.runner import main as test_main
+        test_main(sys.argv[2:])
+
+    elif command == "serve":
+        from nand2tetris.build.daemon import main as serve_main
+        serve_main(sys.argv[2:])
+
+    elif command == "watch":
+        from nand2tetris.build.watch import main as watch_main
+        watch_main(sys.argv[2:])
+
     else:
         print(f"Unknown command: {command}")
         sys.exit(1)
@@ -0,0 +1,78 @@
+# nand2tetris/common/batch.py
+# 批量调用：一个进程处理多个输入，省掉每个文件一次的解释器启动和模块导入
+
+import glob
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+
+def expand_inputs(args) -> list[str]:
+    """
+    展开命令行输入：
+    - @list.txt 表示从文件读取输入列表（每行一个路径，# 之后为注释）
+    - 含 * ? [ 的参数按 glob 展开（Windows 的 shell 不会替我们展开）；没有匹配时原样保留，
+      由处理阶段报告“文件不存在”
+    """
+    inputs = []
+    for arg in args:
+        if arg.startswith("@"):
+            with open(arg[1:]) as f:
+                for line in f:
+                    line = line.split("#")[0].strip()
+                    if line:
+                        inputs.extend(_glob(line))
+        else:
+            inputs.extend(_glob(arg))
+    return inputs
+
+
+def _glob(pattern: str) -> list[str]:
+    if not glob.has_magic(pattern):
+        return [pattern]
+    return sorted(glob.glob(pattern, recursive=True)) or [pattern]
+
+
+def parse_jobs(argv):
+    """
+    取出 -j N，返回 (N, 其余参数)；未指定时为 1（不启动工作进程）
+    """
+    if "-j" not in argv:
+        return 1, argv
+    i = argv.index("-j")
+    if i + 1 >= len(argv):
+        raise ValueError("-j requires a number")
+    return int(argv[i + 1]), argv[:i] + argv[i + 2:]
+
+
+def _call(func, path):
+    """
+    在工作进程中处理一个输入，异常转为错误信息，不中断整批
+    """
+    try:
+        return path, func(path), None
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def run_batch(func, inputs, jobs: int = 1) -> int:
+    """
+    对每个输入调用 func(path)（返回输出路径），jobs > 1 时使用进程池
+    每个文件单独报告结果，返回失败的文件数
+    func 必须是模块级函数（或其 functools.partial），以便传给工作进程
+    """
+    if jobs > 1 and len(inputs) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_call, [func] * len(inputs), inputs))
+    else:
+        results = [_call(func, path) for path in inputs]
+
+    failed = 0
+    for path, out, error in results:
+        if error:
+            failed += 1
+            print(f"Error: {path}: {error}", file=sys.stderr)
+        elif out:
+            print(f"Generated: {out}", file=sys.stderr)
+    if len(results) > 1:
+        print(f"{len(results) - failed} succeeded, {failed} failed", file=sys.stderr)
+    return failed
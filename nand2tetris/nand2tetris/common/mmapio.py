@@ -0,0 +1,65 @@
+# nand2tetris/common/mmapio.py
+# 基于 mmap 的输入读取：直接扫描字节，只把真正需要的指令 / token 解码成 str
+#
+# 文本 I/O 会为每一行解码并分配一个字符串（包括注释和空行）；
+# 对几 MB 的生成代码，映射文件后按字节扫描，内存和 I/O 时间都更少。
+
+import functools
+import mmap
+import os
+import re
+from contextlib import contextmanager
+
+
+@contextmanager
+def mapped(path):
+    """
+    只读映射整个文件；空文件无法 mmap，返回 b""
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+# 映射中根本没有注释时（生成的 .asm / .hack）每个非空行都是代码
+_PLAIN_LINE = re.compile(rb"\S[^\n]*")
+
+
+@functools.lru_cache(maxsize=None)
+def _code_pattern(comment: bytes, keep):
+    """
+    每次匹配先整段跳过空行和注释行，再匹配一行：代码部分（到注释为止）进入分组，
+    行尾的注释一并吃掉；以 keep 开头的注释行不跳过，整行进入分组
+    每次匹配都结束在行尾（或文件末尾，此时分组为空），扫描不会从一行的中间开始
+    """
+    full = re.escape(comment)
+    first, rest = re.escape(comment[:1]), re.escape(comment[1:])
+    skip = full
+    if keep is not None:
+        skip = rb"(?!" + re.escape(keep) + rb")" + full
+    code = (
+        rb"(?!" + full + rb")\S[^" + first + rb"\n]*"
+        rb"(?:" + first + rb"(?!" + rest + rb")[^" + first + rb"\n]*)*"
+    )
+    if keep is not None:
+        code = re.escape(keep) + rb"[^\n]*|" + code
+    return re.compile(
+        rb"[^\S\n]*(?:(?:" + skip + rb"[^\n]*)?\n[^\S\n]*)*"
+        rb"(?:(" + code + rb")[^\n]*|(?:" + skip + rb"[^\n]*)?\Z)"
+    )
+
+
+def code_lines(buf, comment=b"//", keep=None):
+    """
+    用编译好的正则直接扫描映射，去掉注释和首尾空白，产出 bytes 行
+    空行和注释行在正则内部跳过，只有含代码的行切出 bytes 对象
+    以 keep 开头的注释行原样保留（如 VM 中的 "// @Main.jack:12" 位置注释）
+    可以对同一个映射多次调用
+    """
+    pattern = _PLAIN_LINE if buf.find(comment, 0) < 0 else _code_pattern(comment, keep)
+    for line in pattern.findall(buf):
+        if line:
+            yield line.rstrip()
@@ -0,0 +1,311 @@
+# nand2tetris/emu/emulator.py
+# Hack CPU 模拟器：执行 .hack 机器码（Projects 4–5 的软件版本）
+
+import sys
+from array import array
+
+RAM_SIZE = 32768
+SCREEN = 16384
+KBD = 24576
+
+# comp 字段（a 位 + c1..c6，共 7 位）-> 计算函数 f(x, d)
+# x 为 A 或 M（由 a 位决定），结果统一截断为 16 位无符号数
+COMP_FUNCS = {
+    0b0101010: lambda x, d: 0,
+    0b0111111: lambda x, d: 1,
+    0b0111010: lambda x, d: 0xFFFF,
+    0b0001100: lambda x, d: d,
+    0b0110000: lambda x, d: x,
+    0b0001101: lambda x, d: ~d & 0xFFFF,
+    0b0110001: lambda x, d: ~x & 0xFFFF,
+    0b0001111: lambda x, d: -d & 0xFFFF,
+    0b0110011: lambda x, d: -x & 0xFFFF,
+    0b0011111: lambda x, d: (d + 1) & 0xFFFF,
+    0b0110111: lambda x, d: (x + 1) & 0xFFFF,
+    0b0001110: lambda x, d: (d - 1) & 0xFFFF,
+    0b0110010: lambda x, d: (x - 1) & 0xFFFF,
+    0b0000010: lambda x, d: (d + x) & 0xFFFF,
+    0b0010011: lambda x, d: (d - x) & 0xFFFF,
+    0b0000111: lambda x, d: (x - d) & 0xFFFF,
+    0b0000000: lambda x, d: d & x,
+    0b0010101: lambda x, d: d | x,
+}
+# a = 1 时同一组 c 位作用于 M（ALU 本身不区分，x 换成 M 即可）
+COMP_FUNCS.update({code | 0b1000000: f for code, f in list(COMP_FUNCS.items())})
+
+
+def load_hack(path) -> list[int]:
+    """
+    读取 .hack 文件（每行 16 个 0/1 字符），返回机器字列表
+    """
+    with open(path) as f:
+        return [int(line.strip(), 2) for line in f if line.strip()]
+
+
+def decode(word: int):
+    """
+    预解码一条指令，避免执行时重复拆位
+    A 指令：(None, value)
+    C 指令：(comp_func, uses_m, dest_a, dest_d, dest_m, jump)
+    """
+    if not word & 0x8000:
+        return (None, word)
+    comp = (word >> 6) & 0x7F
+    try:
+        func = COMP_FUNCS[comp]
+    except KeyError:
+        raise ValueError(f"Invalid C-instruction: {word:016b}")
+    return (
+        func,
+        bool(comp & 0x40),
+        bool(word & 0x20),
+        bool(word & 0x10),
+        bool(word & 0x08),
+        word & 0x07,
+    )
+
+
+def jump_taken(jump: int, out: int) -> bool:
+    """
+    jump 三位依次为 lt / eq / gt
+    """
+    if out == 0:
+        return bool(jump & 0b010)
+    if out & 0x8000:
+        return bool(jump & 0b100)
+    return bool(jump & 0b001)
+
+
+class HackEmulator:
+    """
+    Hack 计算机：ROM + RAM + A / D / PC
+
+    RAM 用 array('H') 存放，屏幕和快照可以通过 memoryview 零拷贝访问
+    """
+
+    def __init__(self, rom):
+        self.rom = list(rom)
+        self.program = [decode(word) for word in self.rom]
+        self.ram = array("H", bytes(2 * RAM_SIZE))
+        self.a = 0
+        self.d = 0
+        self.pc = 0
+        self.cycles = 0
+        self.halted = False
+        # 脚本化键盘输入：[(cycle, keycode), ...]，按 cycle 升序
+        self.key_events = []
+        # 键盘事件生效时回调 f(cycle, keycode)，录制会话时用来记录输入轨迹
+        self.key_listener = None
+        # 断点：跳转到这些 ROM 地址时停机（函数入口总是经由跳转到达）
+        self.breakpoints = set()
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(load_hack(path))
+
+    def schedule_keys(self, events):
+        """
+        在指定周期把键码写入 KBD（0 表示松开）
+        同一周期的多个事件按安排的顺序依次生效（只按周期稳定排序，不按键码）
+        """
+        self.key_events = sorted(self.key_events + list(events), key=lambda event: event[0])
+
+    def run(self, max_cycles: int) -> int:
+        """
+        最多执行 max_cycles 个周期，遇到停机循环（@X / 0;JMP 指向自身）提前结束
+        返回本次执行的周期数
+        """
+        start = self.cycles
+        limit = start + max_cycles
+        while self.cycles < limit and not self.halted:
+            # 两个键盘事件之间整段执行，主循环内不检查事件
+            while self.key_events and self.key_events[0][0] <= self.cycles:
+                _, code = self.key_events.pop(0)
+                self.ram[KBD] = code
+                if self.key_listener:
+                    self.key_listener(self.cycles, code)
+            stop = limit
+            if self.key_events:
+                stop = min(stop, self.key_events[0][0])
+            self._execute(stop - self.cycles)
+        return self.cycles - start
+
+    def _execute(self, n: int):
+        program = self.program
+        ram = self.ram
+        size = len(program)
+        a, d, pc = self.a, self.d, self.pc
+        breakpoints = self.breakpoints
+        executed = 0
+
+        while executed < n:
+            if pc >= size:
+                # 跑出 ROM 末尾视为停机
+                self.halted = True
+                break
+            instr = program[pc]
+            executed += 1
+            func = instr[0]
+            if func is None:
+                a = instr[1]
+                pc += 1
+                continue
+
+            _, uses_m, dest_a, dest_d, dest_m, jump = instr
+            # 数据地址总线只有 15 位（addressM = A[14..0]），A 的最高位不参与寻址
+            out = func(ram[a & 0x7FFF] if uses_m else a, d)
+            target = a
+            if dest_m:
+                ram[a & 0x7FFF] = out
+            if dest_a:
+                a = out
+            if dest_d:
+                d = out
+
+            if jump and jump_taken(jump, out):
+                # @X / 0;JMP 且 X 指向 @X 自身：程序结束时的死循环
+                if target == pc - 1 and program[target] == (None, target):
+                    self.halted = True
+                    pc = target
+                    break
+                pc = target
+                if target in breakpoints:
+                    self.halted = True
+                    break
+            else:
+                pc += 1
+
+        self.a, self.d, self.pc = a, d, pc
+        self.cycles += executed
+
+    def screen(self):
+        from nand2tetris.emu.screen import Framebuffer
+        return Framebuffer(self.ram)
+
+
+def parse_key_script(path):
+    """
+    键盘脚本：每行 "<cycle> <keycode>"，// 之后为注释
+    """
+    events = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("//")[0].strip()
+            if not line:
+                continue
+            cycle, code = line.split()
+            events.append((int(cycle), int(code)))
+    return events
+
+
+def parse_range(text: str):
+    start, _, end = text.partition("-")
+    return int(start), int(end or start)
+
+
+def main(argv=None):
+    """
+    Hack 模拟器入口
+    nand2tetris emu Prog.hack [--cycles N] [--keys keys.txt]
+                              [--screen out.pbm|out.png|out.raw] [--ram START-END]
+                              [--record session.hsnap [--snapshot-every N]]
+                              [--resume session.hsnap[@K]]
+                              [--profile Prog.map.json [--folded out.folded]]
+    --record  录制会话：定期写入差分快照，并记录键盘输入
+    --resume  从会话的第 K 个快照（默认最后一个）继续运行，键盘输入按录制回放
+    --profile 按源码映射（nand2tetris vm --source-map）统计周期，
+              输出 folded stacks（默认 stdout）和摘要（stderr）
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+
+    usage = (
+        "Usage: nand2tetris emu Prog.hack [--cycles N] [--keys FILE] "
+        "[--screen FILE] [--ram START-END] [--record FILE [--snapshot-every N]] "
+        "[--resume FILE[@K]] [--profile MAP [--folded FILE]]"
+    )
+    cycles = 1_000_000
+    keys = None
+    screen_path = None
+    ram_range = None
+    record_path = None
+    snapshot_every = 1_000_000
+    resume = None
+    profile_map = None
+    folded_path = None
+    args = []
+
+    it = iter(argv)
+    for arg in it:
+        if arg in ("--cycles", "--keys", "--screen", "--ram", "--record",
+                   "--snapshot-every", "--resume", "--profile", "--folded"):
+            value = next(it, None)
+            if value is None:
+                print(usage, file=sys.stderr)
+                sys.exit(1)
+            if arg == "--cycles":
+                cycles = int(value)
+            elif arg == "--keys":
+                keys = value
+            elif arg == "--screen":
+                screen_path = value
+            elif arg == "--record":
+                record_path = value
+            elif arg == "--snapshot-every":
+                snapshot_every = int(value)
+            elif arg == "--resume":
+                resume = value
+            elif arg == "--profile":
+                profile_map = value
+            elif arg == "--folded":
+                folded_path = value
+            else:
+                ram_range = parse_range(value)
+        else:
+            args.append(arg)
+
+    if len(args) != 1:
+        print(usage, file=sys.stderr)
+        sys.exit(1)
+
+    if profile_map:
+        from nand2tetris.emu.profiler import ProfilingEmulator
+        from nand2tetris.vm.sourcemap import SourceMap
+        emulator = ProfilingEmulator(load_hack(args[0]), SourceMap.load(profile_map))
+    else:
+        emulator = HackEmulator.from_file(args[0])
+    if keys:
+        emulator.schedule_keys(parse_key_script(keys))
+
+    if resume:
+        from nand2tetris.emu.snapshot import Session
+        session_path, _, index = resume.partition("@")
+        start = Session(session_path).restore(emulator, int(index) if index else -1)
+        print(f"Resumed at cycle {start}", file=sys.stderr)
+
+    if record_path:
+        from nand2tetris.emu.snapshot import record
+        count = record(emulator, record_path, cycles, snapshot_every)
+        print(f"Recorded {count} snapshot(s): {record_path}", file=sys.stderr)
+    else:
+        emulator.run(cycles)
+    state = "halted" if emulator.halted else "budget exhausted"
+    print(f"{emulator.cycles} cycles, {state}, PC={emulator.pc}", file=sys.stderr)
+
+    if ram_range:
+        start, end = ram_range
+        for addr in range(start, end + 1):
+            value = emulator.ram[addr]
+            print(f"RAM[{addr}] = {value - 0x10000 if value & 0x8000 else value}")
+
+    if screen_path:
+        emulator.screen().save(screen_path)
+        print(f"Generated: {screen_path}", file=sys.stderr)
+
+    if profile_map:
+        from nand2tetris.emu.profiler import write_report
+        write_report(emulator, folded_path)
+
+
+if __name__ == "__main__":
+    main()
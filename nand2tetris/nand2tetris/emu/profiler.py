@@ -0,0 +1,163 @@
+# nand2tetris/emu/profiler.py
+# 周期级分析器：统计每条 Hack 指令的执行次数，按调用栈映射回 VM 指令和 Jack 源码行
+#
+# 每个调用栈对应一个按 ROM 地址计数的数组，主循环里只做一次下标自增；
+# 只有在 call / return 的跳转指令（地址来自源码映射）处才切换数组。
+# 结束后按源码映射聚合为 folded stacks（flamegraph.pl / speedscope 可直接读取）：
+#   Sys.init;Main.main;Main.jack:12 48213
+
+import sys
+from array import array
+
+from nand2tetris.emu.emulator import HackEmulator, jump_taken
+
+
+class ProfilingEmulator(HackEmulator):
+    """
+    与 HackEmulator 行为相同，额外按调用栈记录每个 ROM 地址的执行周期数
+    """
+
+    def __init__(self, rom, source_map):
+        super().__init__(rom)
+        if len(source_map.rom) != len(self.rom):
+            raise ValueError(
+                f"Source map covers {len(source_map.rom)} ROM words, program has {len(self.rom)}"
+            )
+        self.source_map = source_map
+        self.function_at = {addr: name for name, addr in source_map.functions.items()}
+        self.call_sites = frozenset(source_map.calls)
+        self.return_sites = frozenset(source_map.returns)
+        self.stack = []
+        # 调用栈（函数名元组）-> 每个 ROM 地址的执行次数
+        self.counts = {}
+        self.current = self._counts_for(())
+
+    def _counts_for(self, stack):
+        counts = self.counts.get(stack)
+        if counts is None:
+            counts = self.counts[stack] = array("Q", bytes(8 * len(self.rom)))
+        return counts
+
+    def _execute(self, n: int):
+        program = self.program
+        ram = self.ram
+        size = len(program)
+        a, d, pc = self.a, self.d, self.pc
+        breakpoints = self.breakpoints
+        call_sites = self.call_sites
+        return_sites = self.return_sites
+        stack = self.stack
+        counts = self.current
+        executed = 0
+
+        while executed < n:
+            if pc >= size:
+                self.halted = True
+                break
+            instr = program[pc]
+            counts[pc] += 1
+            executed += 1
+            func = instr[0]
+            if func is None:
+                a = instr[1]
+                pc += 1
+                continue
+
+            _, uses_m, dest_a, dest_d, dest_m, jump = instr
+            # 数据地址总线只有 15 位（addressM = A[14..0]），A 的最高位不参与寻址
+            out = func(ram[a & 0x7FFF] if uses_m else a, d)
+            target = a
+            if dest_m:
+                ram[a & 0x7FFF] = out
+            if dest_a:
+                a = out
+            if dest_d:
+                d = out
+
+            if jump and jump_taken(jump, out):
+                if target == pc - 1 and program[target] == (None, target):
+                    self.halted = True
+                    pc = target
+                    break
+                if pc in call_sites:
+                    stack.append(self.function_at.get(target, f"@{target}"))
+                    counts = self._counts_for(tuple(stack))
+                elif pc in return_sites and stack:
+                    stack.pop()
+                    counts = self._counts_for(tuple(stack))
+                pc = target
+                if target in breakpoints:
+                    self.halted = True
+                    break
+            else:
+                pc += 1
+
+        self.a, self.d, self.pc = a, d, pc
+        self.cycles += executed
+        self.current = counts
+
+    def frames(self):
+        """
+        聚合为 {(栈上的函数..., 叶子位置): 周期数}
+        叶子位置为 Jack 源码行；没有源码位置的代码（如预编译的 OS）用 VM 指令代替
+        """
+        entries = self.source_map.entries
+        rom = self.source_map.rom
+        result = {}
+        for stack, counts in self.counts.items():
+            for addr, n in enumerate(counts):
+                if not n:
+                    continue
+                command, function, location = entries[rom[addr]]
+                if not location:
+                    location = f"{function}: {command}" if function else command
+                key = stack + (location,)
+                result[key] = result.get(key, 0) + n
+        return result
+
+    def folded(self) -> str:
+        frames = self.frames()
+        return "".join(
+            f"{';'.join(key)} {n}\n" for key, n in sorted(frames.items())
+        )
+
+    def summary(self, top: int = 10) -> str:
+        """
+        按函数和源码行统计自身周期（self time），取前 top 项
+        """
+        entries = self.source_map.entries
+        rom = self.source_map.rom
+        by_function = {}
+        by_location = {}
+        for counts in self.counts.values():
+            for addr, n in enumerate(counts):
+                if not n:
+                    continue
+                _, function, location = entries[rom[addr]]
+                function = function or "(bootstrap)"
+                by_function[function] = by_function.get(function, 0) + n
+                if location:
+                    by_location[location] = by_location.get(location, 0) + n
+
+        total = sum(by_function.values()) or 1
+        lines = [f"Profile: {total} cycles"]
+        for title, table in (("function", by_function), ("line", by_location)):
+            lines.append(f"  Top {title}s (self):")
+            ranked = sorted(table.items(), key=lambda item: (-item[1], item[0]))[:top]
+            for name, n in ranked:
+                lines.append(f"    {n:>10}  {100 * n / total:5.1f}%  {name}")
+        return "\n".join(lines)
+
+
+def write_report(emulator, folded_path=None):
+    """
+    folded stacks 写入 folded_path（未指定时输出到 stdout），摘要输出到 stderr
+    """
+    folded = emulator.folded()
+    if folded_path:
+        with open(folded_path, "w") as f:
+            f.write(folded)
+        print(f"Generated: {folded_path}", file=sys.stderr)
+    else:
+        sys.stdout.write(folded)
+    print(emulator.summary(), file=sys.stderr)
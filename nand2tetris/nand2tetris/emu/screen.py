@@ -0,0 +1,112 @@
+# nand2tetris/emu/screen.py
+# 无界面的屏幕帧缓冲：直接映射 RAM[16384..24575]，不复制、不逐像素循环
+#
+# Hack 屏幕 256 行 x 512 列，每行 32 个字；
+# 字内第 0 位是最左边的像素，1 表示黑色。
+# RAM 以小端 16 位字存放时，每个字节内同样是低位在左，
+# 因此把每个字节按位反转，就得到 PBM（高位在左、1 为黑）的行数据。
+
+import sys
+import zlib
+import struct
+
+from nand2tetris.emu.emulator import SCREEN, KBD
+
+WIDTH = 512
+HEIGHT = 256
+ROW_BYTES = WIDTH // 8
+
+# 字节位反转表（低位在左 -> 高位在左），以及 PNG 用的反转 + 取反表（PNG 中 0 为黑）
+_REVERSE = bytes(int(f"{b:08b}"[::-1], 2) for b in range(256))
+_REVERSE_INVERT = bytes(r ^ 0xFF for r in _REVERSE)
+# 每个字节展开为 8 个像素（0 / 1），低位在左
+_EXPAND = [bytes((b >> i) & 1 for i in range(8)) for b in range(256)]
+
+try:
+    import numpy as np
+except ImportError:  # numpy 是可选依赖
+    np = None
+
+
+class Framebuffer:
+    """
+    屏幕区域的只读视图，底层与模拟器 RAM 共享内存
+    """
+
+    def __init__(self, ram):
+        words = memoryview(ram)
+        if sys.byteorder == "little":
+            self.view = words[SCREEN:KBD].cast("B")
+        else:
+            # 大端主机需要交换字节序，只能复制一份
+            self.view = memoryview(_byteswapped(ram, SCREEN, KBD))
+
+    def raw(self) -> bytes:
+        """
+        原始屏幕字节（小端 16 位字，8192 字 = 16384 字节）
+        """
+        return self.view.tobytes()
+
+    def pbm_rows(self) -> bytes:
+        return self.raw().translate(_REVERSE)
+
+    def to_pbm(self) -> bytes:
+        """
+        P4 二进制 PBM
+        """
+        return b"P4\n%d %d\n" % (WIDTH, HEIGHT) + self.pbm_rows()
+
+    def to_png(self) -> bytes:
+        """
+        1 位灰度 PNG（只用标准库 zlib / struct）
+        """
+        data = self.raw().translate(_REVERSE_INVERT)
+        # 每行前加一个过滤类型字节 0
+        rows = b"".join(
+            b"\x00" + data[i:i + ROW_BYTES] for i in range(0, len(data), ROW_BYTES)
+        )
+        header = struct.pack(">IIBBBBB", WIDTH, HEIGHT, 1, 0, 0, 0, 0)
+        return (
+            b"\x89PNG\r\n\x1a\n"
+            + _png_chunk(b"IHDR", header)
+            + _png_chunk(b"IDAT", zlib.compress(rows, 9))
+            + _png_chunk(b"IEND", b"")
+        )
+
+    def pixels(self):
+        """
+        逐像素数据（0 白 / 1 黑），行优先
+        有 numpy 时返回 (256, 512) 的 uint8 数组，否则返回长度 131072 的 bytes
+        """
+        if np is not None:
+            data = np.frombuffer(self.view, dtype=np.uint8)
+            return np.unpackbits(data, bitorder="little").reshape(HEIGHT, WIDTH)
+        return b"".join(map(_EXPAND.__getitem__, self.view))
+
+    def save(self, path: str):
+        """
+        按扩展名保存：.pbm / .png / 其他（原始字节）
+        """
+        if path.endswith(".pbm"):
+            data = self.to_pbm()
+        elif path.endswith(".png"):
+            data = self.to_png()
+        else:
+            data = self.raw()
+        with open(path, "wb") as f:
+            f.write(data)
+
+
+def _byteswapped(ram, start, end) -> bytes:
+    words = ram[start:end]
+    words.byteswap()
+    return words.tobytes()
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data))
+        + kind
+        + data
+        + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+    )
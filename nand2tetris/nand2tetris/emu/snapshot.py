@@ -0,0 +1,167 @@
+# nand2tetris/emu/snapshot.py
+# 模拟器快照与录制回放
+#
+# 会话文件（.hsnap）是追加写的记录流：
+#   文件头：b"HSNP" + 版本号 + ROM 的 CRC32（保证回放时是同一个程序）
+#   记录头：kind, cycles, pc, a, d, halted, payload 长度
+#     kind 0  完整快照：payload = zlib(RAM)
+#     kind 1  差分快照：payload = zlib(RAM XOR 上一个快照的 RAM)
+#     kind 2  键盘事件：payload = 键码（cycles 为事件发生的周期）
+#
+# 相邻快照之间大部分内存不变，XOR 之后几乎全是 0，压缩后只有几百字节。
+# 每 KEYFRAME_INTERVAL 个快照写一个完整快照，恢复时最多回放这么多个差分。
+
+import heapq
+import struct
+import zlib
+
+MAGIC = b"HSNP"
+VERSION = 1
+HEADER = struct.Struct("<4sHI")
+RECORD = struct.Struct("<BQHHHBI")
+
+FULL = 0
+DIFF = 1
+KEY = 2
+
+KEYFRAME_INTERVAL = 16
+
+
+def rom_checksum(rom) -> int:
+    return zlib.crc32(b"".join(word.to_bytes(2, "little") for word in rom))
+
+
+def xor_bytes(x: bytes, y: bytes) -> bytes:
+    """
+    两段等长字节逐位异或（借助大整数在 C 层完成，不逐字节循环）
+    """
+    n = len(x)
+    return (int.from_bytes(x, "little") ^ int.from_bytes(y, "little")).to_bytes(n, "little")
+
+
+class SnapshotWriter:
+    """
+    录制会话：定期写入快照，并记录所有键盘事件
+    """
+
+    def __init__(self, path, emulator):
+        self.path = path
+        self.emulator = emulator
+        self.previous = None
+        self.count = 0
+        self.f = open(path, "wb")
+        self.f.write(HEADER.pack(MAGIC, VERSION, rom_checksum(emulator.rom)))
+        emulator.key_listener = self.record_key
+
+    def _write(self, kind, cycles, payload, state=(0, 0, 0, False)):
+        pc, a, d, halted = state
+        self.f.write(RECORD.pack(kind, cycles, pc, a, d, int(halted), len(payload)))
+        self.f.write(payload)
+
+    def record_key(self, cycle, code):
+        self._write(KEY, cycle, struct.pack("<H", code))
+
+    def snapshot(self):
+        """
+        写入当前状态的快照（第一个和每隔 KEYFRAME_INTERVAL 个为完整快照）
+        """
+        emu = self.emulator
+        ram = emu.ram.tobytes()
+        state = (emu.pc, emu.a, emu.d, emu.halted)
+
+        if self.previous is None or self.count % KEYFRAME_INTERVAL == 0:
+            self._write(FULL, emu.cycles, zlib.compress(ram, 1), state)
+        else:
+            self._write(DIFF, emu.cycles, zlib.compress(xor_bytes(ram, self.previous), 1), state)
+
+        self.previous = ram
+        self.count += 1
+        self.f.flush()
+
+    def close(self):
+        self.emulator.key_listener = None
+        self.f.close()
+
+
+def record(emulator, path, max_cycles, every):
+    """
+    运行最多 max_cycles 个周期，每 every 个周期写一次快照（开始和结束时各写一次）
+    返回写入的快照数
+    """
+    writer = SnapshotWriter(path, emulator)
+    try:
+        writer.snapshot()
+        remaining = max_cycles
+        while remaining > 0 and not emulator.halted:
+            remaining -= emulator.run(min(every, remaining))
+            writer.snapshot()
+    finally:
+        writer.close()
+    return writer.count
+
+
+class Session:
+    """
+    读取会话文件：快照索引 + 键盘事件轨迹
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = f.read()
+
+        magic, version, self.rom_crc = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a snapshot session: {path}")
+
+        # snapshots: [(kind, cycles, (pc, a, d, halted), payload 偏移, 长度)]
+        self.snapshots = []
+        self.keys = []
+        offset = HEADER.size
+        while offset < len(self.data):
+            kind, cycles, pc, a, d, halted, length = RECORD.unpack_from(self.data, offset)
+            offset += RECORD.size
+            if kind == KEY:
+                (code,) = struct.unpack_from("<H", self.data, offset)
+                self.keys.append((cycles, code))
+            else:
+                self.snapshots.append((kind, cycles, (pc, a, d, bool(halted)), offset, length))
+            offset += length
+
+    def _payload(self, i):
+        _, _, _, offset, length = self.snapshots[i]
+        return zlib.decompress(self.data[offset:offset + length])
+
+    def ram_at(self, index: int) -> bytes:
+        """
+        重建第 index 个快照的 RAM：从最近的完整快照开始依次应用差分
+        """
+        start = index
+        while self.snapshots[start][0] != FULL:
+            start -= 1
+        ram = self._payload(start)
+        for i in range(start + 1, index + 1):
+            ram = xor_bytes(ram, self._payload(i))
+        return ram
+
+    def restore(self, emulator, index: int = -1):
+        """
+        把模拟器恢复到第 index 个快照，并重新安排该时刻之后录制到的键盘事件
+        已安排的事件（--keys）中尚未发生的保留，与录制的事件按周期稳定合并：
+        同一周期内录制的在前，两边各自保持原来的顺序，重复的事件不去掉
+        （用录制时的按键脚本恢复时，每个周期最后写入 KBD 的键码与录制时相同）
+        """
+        if rom_checksum(emulator.rom) != self.rom_crc:
+            raise ValueError("Snapshot was recorded with a different program")
+
+        index %= len(self.snapshots)
+        _, cycles, (pc, a, d, halted), _, _ = self.snapshots[index]
+
+        memoryview(emulator.ram).cast("B")[:] = self.ram_at(index)
+        emulator.pc, emulator.a, emulator.d = pc, a, d
+        emulator.cycles = cycles
+        emulator.halted = halted
+        recorded = [event for event in self.keys if event[0] >= cycles]
+        pending = [event for event in emulator.key_events if event[0] >= cycles]
+        emulator.key_events = []
+        emulator.schedule_keys(heapq.merge(recorded, pending, key=lambda event: event[0]))
+        return cycles
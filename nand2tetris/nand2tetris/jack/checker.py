@@ -0,0 +1,246 @@
+# nand2tetris/jack/checker.py
+# 全程序调用检查：跨类核对每个子程序调用
+#   - 目标类 / 子程序是否存在
+#   - method 必须通过对象（或隐式 this）调用，function / constructor 必须通过类名调用
+#   - function 中不能隐式调用本类的 method（没有 this）
+#   - 参数个数
+#   - 返回 void 的调用不能用在表达式中
+#
+# 每个类的签名与调用点由 CompilationEngine 在编译时记录（class_info），
+# 连同源码摘要保存在索引文件 <dir>/<dir>.sig.json 中：之后只重新解析改动过的类，
+# 检查本身只是查表，整个程序也只需几毫秒。
+# 程序中没有的类使用内置的 Jack OS 签名表；目录中只有 .vm（没有 .jack）的类签名未知，不检查。
+
+import hashlib
+import json
+import os
+import sys
+
+from nand2tetris.jack.compilation_engine import CompileError, JackError
+
+INDEX_VERSION = 1
+PRIMITIVE_TYPES = ("int", "char", "boolean")
+
+# Jack OS API：类 -> {子程序: (kind, 返回类型, 参数个数)}
+OS_SIGNATURES = {
+    "Math": {
+        "init": ("function", "void", 0),
+        "abs": ("function", "int", 1),
+        "multiply": ("function", "int", 2),
+        "divide": ("function", "int", 2),
+        "min": ("function", "int", 2),
+        "max": ("function", "int", 2),
+        "sqrt": ("function", "int", 1),
+    },
+    "String": {
+        "new": ("constructor", "String", 1),
+        "dispose": ("method", "void", 0),
+        "length": ("method", "int", 0),
+        "charAt": ("method", "char", 1),
+        "setCharAt": ("method", "void", 2),
+        "appendChar": ("method", "String", 1),
+        "eraseLastChar": ("method", "void", 0),
+        "intValue": ("method", "int", 0),
+        "setInt": ("method", "void", 1),
+        "backSpace": ("function", "char", 0),
+        "doubleQuote": ("function", "char", 0),
+        "newLine": ("function", "char", 0),
+    },
+    "Array": {
+        "new": ("function", "Array", 1),
+        "dispose": ("method", "void", 0),
+    },
+    "Output": {
+        "init": ("function", "void", 0),
+        "moveCursor": ("function", "void", 2),
+        "printChar": ("function", "void", 1),
+        "printString": ("function", "void", 1),
+        "printInt": ("function", "void", 1),
+        "println": ("function", "void", 0),
+        "backSpace": ("function", "void", 0),
+    },
+    "Screen": {
+        "init": ("function", "void", 0),
+        "clearScreen": ("function", "void", 0),
+        "setColor": ("function", "void", 1),
+        "drawPixel": ("function", "void", 2),
+        "drawLine": ("function", "void", 4),
+        "drawRectangle": ("function", "void", 4),
+        "drawCircle": ("function", "void", 3),
+    },
+    "Keyboard": {
+        "init": ("function", "void", 0),
+        "keyPressed": ("function", "char", 0),
+        "readChar": ("function", "char", 0),
+        "readLine": ("function", "String", 1),
+        "readInt": ("function", "int", 1),
+    },
+    "Memory": {
+        "init": ("function", "void", 0),
+        "peek": ("function", "int", 1),
+        "poke": ("function", "void", 2),
+        "alloc": ("function", "Array", 1),
+        "deAlloc": ("function", "void", 1),
+    },
+    "Sys": {
+        "init": ("function", "void", 0),
+        "halt": ("function", "void", 0),
+        "error": ("function", "void", 1),
+        "wait": ("function", "void", 1),
+    },
+}
+
+
+def _digest(path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def analyze(path) -> dict:
+    """
+    解析一个 .jack 文件（不写出 VM），返回 class_info；语法错误时抛出 CompileError
+    """
+    from nand2tetris.jack.compiler import _compile
+
+    return _compile(path).class_info()
+
+
+def load_index(path) -> dict:
+    """
+    读取索引文件，返回 {文件: class_info}；不存在或版本不符时返回空表
+    """
+    try:
+        with open(path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if index.get("version") != INDEX_VERSION:
+        return {}
+    return index["classes"]
+
+
+def save_index(path, classes):
+    with open(path, "w") as f:
+        json.dump({"version": INDEX_VERSION, "classes": classes}, f)
+
+
+def check(classes, opaque=()) -> list:
+    """
+    classes: {文件: class_info}；opaque: 签名未知、不检查的类名
+    返回 [JackError, ...]，按文件和位置排序
+    """
+    signatures = dict(OS_SIGNATURES)
+    for info in classes.values():
+        signatures[info["class"]] = info["subroutines"]
+
+    errors = []
+    for info in classes.values():
+        for caller, how, target, sub, n_args, used, line, column in info["calls"]:
+            message = _check_call(signatures, opaque, info, caller, how, target, sub, n_args, used)
+            if message:
+                errors.append(JackError(message, info["file"], line, column))
+    errors.sort(key=lambda error: (error.path, error.line, error.column))
+    return errors
+
+
+def _check_call(signatures, opaque, info, caller, how, target, sub, n_args, used):
+    if target in PRIMITIVE_TYPES:
+        return f"Cannot call method '{sub}' on a value of type {target}"
+    if target in opaque:
+        return None
+    subroutines = signatures.get(target)
+    if subroutines is None:
+        return f"Unknown class '{target}'"
+    signature = subroutines.get(sub)
+    name = f"{target}.{sub}"
+    if signature is None:
+        return f"{name} is not defined"
+
+    kind, return_type, n_params = signature
+    if how == "function" and kind == "method":
+        return f"{name} is a method; call it on an object"
+    if how != "function" and kind != "method":
+        return f"{name} is a {kind}; call it as {name}(...)"
+    if how == "this" and info["subroutines"].get(caller, ("method",))[0] == "function":
+        return f"Method {name} called inside function {info['class']}.{caller} (no 'this')"
+    if n_args != n_params:
+        return f"{name} expects {n_params} argument(s), got {n_args}"
+    if used and return_type == "void":
+        return f"{name} returns void; its value cannot be used"
+    return None
+
+
+def check_path(path, compiled=None) -> list:
+    """
+    检查单个 .jack 文件或整个目录（目录时读写索引 <dir>/<dir>.sig.json）
+    compiled: 刚刚编译得到的 {文件: class_info}，这些文件不再重新解析
+    """
+    compiled = compiled or {}
+    if os.path.isdir(path):
+        names = sorted(os.listdir(path))
+        files = [os.path.join(path, name) for name in names if name.endswith(".jack")]
+        stems = {name[:-len(".jack")] for name in names if name.endswith(".jack")}
+        opaque = {
+            name[:-len(".vm")] for name in names
+            if name.endswith(".vm") and name[:-len(".vm")] not in stems
+        }
+        index_file = os.path.join(path, f"{os.path.basename(os.path.normpath(path))}.sig.json")
+    else:
+        # 单个文件：同目录的其他类未解析，签名未知
+        directory = os.path.dirname(path) or "."
+        files, index_file = [path], None
+        opaque = {
+            os.path.splitext(name)[0] for name in os.listdir(directory)
+            if name.endswith((".jack", ".vm"))
+        }
+        opaque.discard(os.path.splitext(os.path.basename(path))[0])
+
+    index = load_index(index_file) if index_file else {}
+    classes = {}
+    errors = []
+    for f in files:
+        digest = _digest(f)
+        info = compiled.get(f)
+        if info is None:
+            cached = index.get(f)
+            if cached is not None and cached["digest"] == digest:
+                info = cached
+            else:
+                try:
+                    info = analyze(f)
+                except CompileError as e:
+                    # 有语法错误的类签名未知，对它的调用不再重复报错
+                    errors.extend(e.errors)
+                    opaque.add(os.path.splitext(os.path.basename(f))[0])
+                    continue
+        classes[f] = dict(info, digest=digest)
+
+    if index_file:
+        save_index(index_file, classes)
+    return errors + check(classes, opaque)
+
+
+def main(argv=None):
+    """
+    nand2tetris check [--json] <file.jack | directory>
+    只检查，不生成 VM；与 nand2tetris jack --check 的检查相同
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+
+    from nand2tetris.jack.compiler import report_errors
+
+    json_output = "--json" in argv
+    args = [arg for arg in argv if arg != "--json"]
+    if len(args) != 1:
+        print("Usage: nand2tetris check [--json] <file.jack | directory>", file=sys.stderr)
+        sys.exit(1)
+
+    errors = check_path(args[0])
+    report_errors(errors, json_output)
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,69 @@
 # nand2tetris/jack/compilation_engine.py
 from nand2tetris.jack.symbol_table import SymbolTable
 from nand2tetris.jack.vm_writer import VMWriter
+from nand2tetris.vm.commands import Op
+
+# 二元运算符；* 和 / 调用 Math，其余直接对应 VM 算术指令
+BINARY_OPS = frozenset("+-*/&|<>=")
+ARITHMETIC_OPS = {
+    "+": "add",
+    "-": "sub",
+    "&": "and",
+    "|": "or",
+    "<": "lt",
+    ">": "gt",
+    "=": "eq",
+}
+
+SUBROUTINE_KEYWORDS = ("constructor", "function", "method")
+STATEMENT_KEYWORDS = ("let", "do", "if", "while", "return")
+# 类成员的起始关键字：子程序出错后跳到下一个成员继续
+MEMBER_KEYWORDS = ("static", "field") + SUBROUTINE_KEYWORDS
+
+# 数组基址缓存只跟踪这两个段的变量：它们只会被本函数的 let 改写，调用不会改变
+CACHED_SEGMENTS = ("local", "argument")
+
+# 循环不变量外提：没有副作用、对任何参数都有定义的调用（Math.divide 除零会报错，不外提）
+PURE_CALLS = frozenset(("Math.multiply",))
+UNARY_OPS = frozenset(("neg", "not"))
+# 结果一定是 0 或 -1（false / true）的比较
+COMPARISON_OPS = frozenset(("eq", "gt", "lt"))
+
+TOKEN_NAMES = {
+    "keyword": "keyword",
+    "symbol": "symbol",
+    "identifier": "identifier",
+    "integerConstant": "integer constant",
+    "stringConstant": "string constant",
+}
+
+
+class JackError(ValueError):
+    """
+    一条带源码位置的编译错误
+    """
+
+    def __init__(self, message, path, line, column):
+        super().__init__(f"{path}:{line}:{column}: {message}")
+        self.message = message
+        self.path = path
+        self.line = line
+        self.column = column
+
+    def to_json(self):
+        return {"file": self.path, "line": self.line, "column": self.column, "message": self.message}
+
+
+class CompileError(ValueError):
+    """
+    一个文件中收集到的全部错误（errors: [JackError, ...]，按位置排序）
+    """
+
+    def __init__(self, errors):
+        # 恢复后报告的错误不一定按源码顺序出现
+        errors = sorted(errors, key=lambda error: (error.line, error.column))
+        super().__init__("\n".join(str(error) for error in errors))
+        self.errors = errors
 
 
 class CompilationEngine:
@@ -10,50 +73,171 @@ class CompilationEngine:
         self.symbol_table = SymbolTable()
         self.class_name = ""
         self.label_id = 0
+        # 已收集的错误；语句 / 子程序出错后同步到边界继续编译，结束时一并报告
+        self.errors = []
+        # 全程序检查用（见 jack/checker.py）：本类的子程序签名与所有调用点
+        self.subroutines = {}
+        self.calls = []
+        self.subroutine_name = ""
+        # 基本块内 THAT（pointer 1）的当前值：(数组变量, 下标的 base 部分, 常量偏移, 涉及的变量)
+        # 表示 THAT = 数组 + base + 偏移；未知时为 None
+        self.that = None
+        # 循环不变量外提用的隐藏局部变量（排在声明的局部变量之后）个数，以及 function 指令的位置
+        self.hidden = 0
+        self.function_index = 0
 
     # ---------- utility ----------
 
+    def error(self, message, position=None):
+        """
+        在 position（默认为当前 token）处构造一条错误
+        """
+        line, column = position or self.position()
+        return JackError(message, self.tokenizer.path, line, column)
+
+    def position(self):
+        return self.tokenizer.current_line, self.tokenizer.current_column
+
+    def found(self):
+        current = self.tokenizer.current
+        return "end of file" if current is None else f"'{current}'"
+
     def eat(self, t=None, v=None):
-        if t and self.tokenizer.token_type() != t:
-            raise ValueError("Unexpected token type")
-        if v and self.tokenizer.token_value() != v:
-            raise ValueError("Unexpected token value")
+        if (t and self.tokenizer.token_type() != t) or (v and self.tokenizer.token_value() != v):
+            expected = f"'{v}'" if v else TOKEN_NAMES.get(t, t)
+            raise self.error(f"Expected {expected}, found {self.found()}")
         self.tokenizer.advance()
 
+    def eat_type(self, allow_void=False):
+        """
+        int / char / boolean / 类名（返回类型还可以是 void），返回类型名
+        """
+        t = self.tokenizer.token_type()
+        v = self.tokenizer.token_value()
+        if t == "identifier" or (t == "keyword" and v in ("int", "char", "boolean")) or (
+            allow_void and t == "keyword" and v == "void"
+        ):
+            self.tokenizer.advance()
+            return v
+        raise self.error(f"Expected type, found {self.found()}")
+
+    def synchronize(self, stop):
+        """
+        panic mode：跳过 token，直到语句边界
+        ; 被吃掉；} 和 stop 中的关键字留给调用方；成对的 { } 整体跳过
+        """
+        depth = 0
+        while self.tokenizer.current is not None:
+            current = self.tokenizer.current
+            if depth == 0:
+                if current in stop or current == "}":
+                    return
+                if current == ";":
+                    self.tokenizer.advance()
+                    return
+            if current == "{":
+                depth += 1
+            elif current == "}":
+                depth -= 1
+            self.tokenizer.advance()
+
+    def skip_to_member(self):
+        """
+        跳到下一个类成员声明，或类的最后一个 }
+        """
+        while not self.at_class_end() and self.tokenizer.current not in MEMBER_KEYWORDS:
+            self.tokenizer.advance()
+
+    def at_class_end(self):
+        tokenizer = self.tokenizer
+        return tokenizer.current is None or (tokenizer.current == "}" and tokenizer.is_last())
+
+    def class_info(self):
+        """
+        类的元数据、签名与调用点，可以直接写入 JSON：
+          fields       字段数（对象大小，构造函数据此以常量大小调用 Memory.alloc）
+          subroutines  {name: [kind, 返回类型, 参数个数]}
+          calls        [[调用者, 调用方式, 目标类, 子程序, 参数个数, 是否使用返回值, 行, 列], ...]
+        调用方式：this（隐式 this.f()）/ method（obj.f()）/ function（Class.f()）
+        """
+        return {
+            "class": self.class_name,
+            "file": self.tokenizer.path,
+            "fields": self.symbol_table.var_count("field"),
+            "subroutines": {name: list(signature) for name, signature in self.subroutines.items()},
+            "calls": [list(call) for call in self.calls],
+        }
+
     def new_label(self, prefix):
         label = f"{prefix}{self.label_id}"
         self.label_id += 1
         return label
 
-    def kind_to_segment(self, kind):
-        return {
-            "static": "static",
-            "field": "this",
-            "arg": "argument",
-            "var": "local",
-        }[kind]
+    def write_label(self, label):
+        # 标签处控制流汇合，THAT 的值不再确定
+        self.vm.write_label(label)
+        self.that = None
+
+    def forget(self, segment, index):
+        """
+        变量被赋值：依赖它的 THAT 缓存失效
+        """
+        if self.that is not None and (segment, index) in self.that[3]:
+            self.that = None
+
+    def variable(self, name, position):
+        """
+        变量引用 -> (segment, index, type)
+        未定义时记录错误并继续（语句已经完整解析，不需要同步）
+        """
+        resolved = self.symbol_table.resolve(name)
+        if resolved is None:
+            self.errors.append(self.error(f"Undefined variable '{name}'", position))
+            return "constant", 0, None
+        return resolved
 
     # ---------- class ----------
 
     def compile_class(self):
-        self.eat("keyword", "class")
-        self.class_name = self.tokenizer.token_value()
-        self.eat("identifier")
-        self.eat("symbol", "{")
-
-        while self.tokenizer.token_value() in ("static", "field"):
-            self.compile_class_var_dec()
-
-        while self.tokenizer.token_value() in ("constructor", "function", "method"):
-            self.compile_subroutine()
-
-        self.eat("symbol", "}")
+        """
+        编译整个类；有错误时在最后抛出 CompileError，包含全部错误
+        """
+        try:
+            self.eat("keyword", "class")
+            self.class_name = self.tokenizer.token_value()
+            self.eat("identifier")
+            self.eat("symbol", "{")
+            self.compile_class_members()
+            self.eat("symbol", "}")
+        except JackError as e:
+            self.errors.append(e)
+
+        if self.errors:
+            raise CompileError(self.errors)
+
+    def compile_class_members(self):
+        while self.tokenizer.current in ("static", "field"):
+            try:
+                self.compile_class_var_dec()
+            except JackError as e:
+                self.errors.append(e)
+                self.skip_to_member()
+
+        while not self.at_class_end():
+            try:
+                if self.tokenizer.current not in SUBROUTINE_KEYWORDS:
+                    error = self.error(f"Expected subroutine declaration, found {self.found()}")
+                    self.tokenizer.advance()
+                    raise error
+                self.compile_subroutine()
+            except JackError as e:
+                self.errors.append(e)
+                self.skip_to_member()
 
     def compile_class_var_dec(self):
         kind = self.tokenizer.token_value()
         self.eat("keyword")
-        type_ = self.tokenizer.token_value()
-        self.eat(self.tokenizer.token_type())
+        type_ = self.eat_type()
         name = self.tokenizer.token_value()
         self.eat("identifier")
         self.symbol_table.define(name, type_, kind)
@@ -70,12 +254,14 @@ class CompilationEngine:
 
     def compile_subroutine(self):
         self.symbol_table.start_subroutine()
+        line = self.tokenizer.current_line
 
         subroutine_type = self.tokenizer.token_value()
         self.eat("keyword")
-        self.eat(self.tokenizer.token_type())  # return type
+        return_type = self.eat_type(allow_void=True)
         name = self.tokenizer.token_value()
         self.eat("identifier")
+        self.subroutine_name = name
 
         if subroutine_type == "method":
             self.symbol_table.define("this", self.class_name, "arg")
@@ -84,32 +270,44 @@ class CompilationEngine:
         self.compile_parameter_list()
         self.eat("symbol", ")")
 
-        self.compile_subroutine_body(subroutine_type, name)
+        n_params = self.symbol_table.var_count("arg")
+        if subroutine_type == "method":
+            n_params -= 1
+        self.subroutines[name] = (subroutine_type, return_type, n_params)
+
+        self.compile_subroutine_body(subroutine_type, name, line)
 
     def compile_parameter_list(self):
         if self.tokenizer.token_value() != ")":
-            type_ = self.tokenizer.token_value()
-            self.eat(self.tokenizer.token_type())
+            type_ = self.eat_type()
             name = self.tokenizer.token_value()
             self.eat("identifier")
             self.symbol_table.define(name, type_, "arg")
 
             while self.tokenizer.token_value() == ",":
                 self.eat("symbol")
-                type_ = self.tokenizer.token_value()
-                self.eat(self.tokenizer.token_type())
+                type_ = self.eat_type()
                 name = self.tokenizer.token_value()
                 self.eat("identifier")
                 self.symbol_table.define(name, type_, "arg")
 
-    def compile_subroutine_body(self, subroutine_type, name):
+    def compile_subroutine_body(self, subroutine_type, name, line):
         self.eat("symbol", "{")
 
-        while self.tokenizer.token_value() == "var":
-            self.compile_var_dec()
+        while self.tokenizer.current == "var":
+            try:
+                self.compile_var_dec()
+            except JackError as e:
+                self.errors.append(e)
+                self.synchronize(STATEMENT_KEYWORDS + ("var",))
 
         n_locals = self.symbol_table.var_count("var")
+        self.function_index = len(self.vm.commands())
         self.vm.write_function(f"{self.class_name}.{name}", n_locals)
+        self.that = None
+        self.hidden = 0
+        # 行号注释放在 function 之后，保证它与函数体同属一块（DCE / 内联按函数切分）
+        self.vm.set_line(line)
 
         if subroutine_type == "constructor":
             field_count = self.symbol_table.var_count("field")
@@ -124,12 +322,16 @@ class CompilationEngine:
         self.compile_statements()
         self.eat("symbol", "}")
 
+        if self.hidden:
+            buffer = self.vm.commands()
+            op, function, n = buffer[self.function_index]
+            buffer[self.function_index] = (op, function, n + self.hidden)
+
     # ---------- statements ----------
 
     def compile_var_dec(self):
         self.eat("keyword", "var")
-        type_ = self.tokenizer.token_value()
-        self.eat(self.tokenizer.token_type())
+        type_ = self.eat_type()
         name = self.tokenizer.token_value()
         self.eat("identifier")
         self.symbol_table.define(name, type_, "var")
@@ -143,41 +345,67 @@ class CompilationEngine:
         self.eat("symbol", ";")
 
     def compile_statements(self):
-        while self.tokenizer.token_value() in ("let", "do", "if", "while", "return"):
-            getattr(self, f"compile_{self.tokenizer.token_value()}")()
+        """
+        语句序列总是以 } 结束；出错的语句跳到下一个语句边界，继续编译后面的语句
+        """
+        while self.tokenizer.current is not None and self.tokenizer.current != "}":
+            try:
+                statement = self.tokenizer.current
+                if statement not in STATEMENT_KEYWORDS:
+                    raise self.error(f"Expected statement, found {self.found()}")
+                self.vm.set_line(self.tokenizer.current_line)
+                getattr(self, f"compile_{statement}")()
+            except JackError as e:
+                self.errors.append(e)
+                self.synchronize(STATEMENT_KEYWORDS)
 
     # ---------- let / do / return / if / while ----------
 
     def compile_let(self):
         self.eat("keyword", "let")
+        position = self.position()
         name = self.tokenizer.token_value()
         self.eat("identifier")
 
-        is_array = False
-        if self.tokenizer.token_value() == "[":
-            is_array = True
-            self.eat("symbol", "[")
+        if self.tokenizer.token_value() != "[":
+            self.eat("symbol", "=")
             self.compile_expression()
-            self.eat("symbol", "]")
-
-            kind = self.symbol_table.kind_of(name)
-            index = self.symbol_table.index_of(name)
-            self.vm.write_push(self.kind_to_segment(kind), index)
-            self.vm.write_arithmetic("add")
-
-        self.eat("symbol", "=")
+            self.eat("symbol", ";")
+            segment, index, _ = self.variable(name, position)
+            self.vm.write_pop(segment, index)
+            self.forget(segment, index)
+            return
+
+        self.eat("symbol", "[")
+        start = len(self.vm.commands())
         self.compile_expression()
-        self.eat("symbol", ";")
+        self.eat("symbol", "]")
+        segment, index, _ = self.variable(name, position)
+        key = self.index_key(segment, start)
 
-        if is_array:
+        if key is None:
+            self.vm.write_push(segment, index)
+            self.vm.write_arithmetic("add")
+            self.eat("symbol", "=")
+            self.compile_expression()
+            self.eat("symbol", ";")
             self.vm.write_pop("temp", 0)
             self.vm.write_pop("pointer", 1)
             self.vm.write_push("temp", 0)
             self.vm.write_pop("that", 0)
-        else:
-            kind = self.symbol_table.kind_of(name)
-            index = self.symbol_table.index_of(name)
-            self.vm.write_pop(self.kind_to_segment(kind), index)
+            self.that = None
+            return
+
+        # 下标是纯表达式：先让 THAT 指向目标，右边的表达式可以复用它
+        offset = self.load_that(segment, index, key, start)
+        target = self.that
+        self.eat("symbol", "=")
+        self.compile_expression()
+        self.eat("symbol", ";")
+        if self.that is not target:
+            # 右边访问过别的数组：重新计算地址（纯下标重算结果不变）
+            offset = self.load_that(segment, index, key, len(self.vm.commands()))
+        self.vm.write_pop("that", offset)
 
     def compile_do(self):
         self.eat("keyword", "do")
@@ -206,7 +434,7 @@ class CompilationEngine:
 
         self.vm.write_if(label_true)
         self.vm.write_goto(label_false)
-        self.vm.write_label(label_true)
+        self.write_label(label_true)
 
         self.eat("symbol", "{")
         self.compile_statements()
@@ -214,56 +442,171 @@ class CompilationEngine:
 
         if self.tokenizer.token_value() == "else":
             self.vm.write_goto(label_end)
-            self.vm.write_label(label_false)
+            self.write_label(label_false)
             self.eat("keyword", "else")
             self.eat("symbol", "{")
             self.compile_statements()
             self.eat("symbol", "}")
-            self.vm.write_label(label_end)
+            self.write_label(label_end)
         else:
-            self.vm.write_label(label_false)
+            self.write_label(label_false)
 
     def compile_while(self):
+        """
+        旋转为 do-while：入口测试一次，每轮迭代在循环底部测试、条件成立时跳回顶部
+        （条件的指令直接复制一份，不重新解析）
+            <cond> / not / if-goto END
+            label EXP
+            <body>
+            <cond> / if-goto EXP
+            label END
+        入口按 not cond 退出（只有 cond == -1 才继续），底部的 if-goto 却是 cond != 0 就继续，
+        两者只在条件一定是 0 / -1 时等价；其余条件（例如位掩码 x & 4）底部测试保持 not 的语义：
+            <cond> / not / if-goto END / goto EXP
+        """
+        line = self.tokenizer.current_line
         self.eat("keyword", "while")
         label_start = self.new_label("WHILE_EXP")
         label_end = self.new_label("WHILE_END")
 
-        self.vm.write_label(label_start)
         self.eat("symbol", "(")
+        # 条件在循环底部还要执行一次，不能依赖入口处的 THAT
+        self.that = None
+        start = len(self.vm.commands())
         self.compile_expression()
+        condition = self.vm.commands()[start:]
         self.eat("symbol", ")")
         self.vm.write_arithmetic("not")
         self.vm.write_if(label_end)
 
+        header = len(self.vm.commands())
+        self.write_label(label_start)
         self.eat("symbol", "{")
         self.compile_statements()
         self.eat("symbol", "}")
 
-        self.vm.write_goto(label_start)
-        self.vm.write_label(label_end)
+        # 底部测试属于 while 所在行
+        self.vm.set_line(line)
+        self.vm.commands().extend(condition)
+        if self.is_boolean(condition):
+            self.vm.write_if(label_start)
+        else:
+            self.vm.write_arithmetic("not")
+            self.vm.write_if(label_end)
+            self.vm.write_goto(label_start)
+        self.hoist_invariants(header)
+        self.write_label(label_end)
+
+    def is_boolean(self, commands):
+        """
+        表达式的值是否一定是 0 或 -1：比较、true / false，以及它们的 ~ / & / |
+        按指令模拟求值栈，每项记录该值是否一定是布尔值
+        """
+        stack = []
+        for op, name, arg in commands:
+            if op == Op.PUSH:
+                stack.append(name == "constant" and arg == 0)
+            elif op == Op.POP:
+                stack.pop()
+            elif op == Op.CALL:
+                del stack[len(stack) - arg:]
+                stack.append(False)
+            elif op == Op.ARITHMETIC:
+                if name in COMPARISON_OPS:
+                    stack[-2:] = [True]
+                elif name in ("and", "or"):
+                    stack[-2:] = [stack[-2] and stack[-1]]
+                elif name == "neg":
+                    stack[-1] = False
+                elif name != "not":
+                    stack[-2:] = [False]
+            elif op != Op.LOCATION:
+                return False
+        return len(stack) == 1 and stack[0]
+
+    def hoist_invariants(self, header):
+        """
+        循环不变量外提：buffer[header:]（顶部标签到底部测试）中含 Math.multiply 的
+        不变纯子表达式，移到循环入口（入口测试之后），结果存入隐藏的局部变量，
+        循环中改为 push local k；相同的表达式共用一个变量
+        """
+        buffer = self.vm.commands()
+        loop = buffer[header:]
+        written = {(segment, index) for op, segment, index in loop if op == Op.POP}
+        # 循环中有其他调用或写 that 时，static / 字段可能被改写
+        opaque = any(
+            (op == Op.CALL and name not in PURE_CALLS) or (op == Op.POP and name == "that")
+            for op, name, _ in loop
+        )
+
+        hoisted = {}
+        replaced = []
+        end = len(loop) - 1
+        while end >= 0:
+            start = self.invariant_start(loop, end, written, opaque)
+            if start is None:
+                end -= 1
+                continue
+            expression = tuple(loop[start:end + 1])
+            if expression not in hoisted:
+                hoisted[expression] = self.symbol_table.var_count("var") + self.hidden
+                self.hidden += 1
+            replaced.append((start, end, hoisted[expression]))
+            end = start - 1
+
+        if not replaced:
+            return
+        # 从后往前替换，前面的下标不受影响
+        for start, end, local in replaced:
+            loop[start:end + 1] = [(Op.PUSH, "local", local)]
+        preheader = []
+        for expression, local in hoisted.items():
+            preheader.extend(expression)
+            preheader.append((Op.POP, "local", local))
+        buffer[header:] = preheader + loop
+
+    def invariant_start(self, loop, end, written, opaque):
+        """
+        以 loop[end] 为根的子表达式是不变的纯表达式且含 Math.multiply 时返回它的起点，否则返回 None
+        后序指令从根往前扫描，need 为还缺的操作数个数
+        """
+        need = 1
+        has_call = False
+        for i in range(end, -1, -1):
+            op, arg1, arg2 = loop[i]
+            if op == Op.PUSH:
+                if arg1 != "constant" and (
+                    (arg1, arg2) in written
+                    or arg1 not in ("local", "argument", "static", "this", "pointer")
+                    or (opaque and arg1 in ("static", "this"))
+                ):
+                    return None
+                need -= 1
+            elif op == Op.ARITHMETIC:
+                if arg1 not in UNARY_OPS:
+                    need += 1
+            elif op == Op.CALL and arg1 in PURE_CALLS:
+                need += arg2 - 1
+                has_call = True
+            else:
+                return None
+            if need == 0:
+                return i if has_call else None
+        return None
 
     # ---------- expression / term ----------
 
     def compile_expression(self):
         self.compile_term()
-        while self.tokenizer.token_value() in {"+", "-", "*", "/", "&", "|", "<", ">", "="}:
+        while self.tokenizer.token_value() in BINARY_OPS:
             op = self.tokenizer.token_value()
             self.eat("symbol")
             self.compile_term()
             self.write_op(op)
 
     def write_op(self, op):
-        mapping = {
-            "+": "add",
-            "-": "sub",
-            "&": "and",
-            "|": "or",
-            "<": "lt",
-            ">": "gt",
-            "=": "eq",
-        }
-        if op in mapping:
-            self.vm.write_arithmetic(mapping[op])
+        if op in ARITHMETIC_OPS:
+            self.vm.write_arithmetic(ARITHMETIC_OPS[op])
         elif op == "*":
             self.vm.write_call("Math.multiply", 2)
         elif op == "/":
@@ -293,6 +636,8 @@ class CompilationEngine:
                 self.vm.write_push("constant", 0)
             elif v == "this":
                 self.vm.write_push("pointer", 0)
+            else:
+                raise self.error(f"Expected expression, found {self.found()}")
             self.eat("keyword")
 
         elif t == "symbol" and v in ("-", "~"):
@@ -306,30 +651,98 @@ class CompilationEngine:
             self.eat("symbol", ")")
 
         elif t == "identifier":
+            position = self.position()
             name = v
             self.eat("identifier")
 
             if self.tokenizer.token_value() == "[":
                 self.eat("symbol", "[")
+                start = len(self.vm.commands())
                 self.compile_expression()
                 self.eat("symbol", "]")
-                kind = self.symbol_table.kind_of(name)
-                index = self.symbol_table.index_of(name)
-                self.vm.write_push(self.kind_to_segment(kind), index)
-                self.vm.write_arithmetic("add")
-                self.vm.write_pop("pointer", 1)
-                self.vm.write_push("that", 0)
+                segment, index, _ = self.variable(name, position)
+                key = self.index_key(segment, start)
+                if key is None:
+                    self.vm.write_push(segment, index)
+                    self.vm.write_arithmetic("add")
+                    self.vm.write_pop("pointer", 1)
+                    self.vm.write_push("that", 0)
+                    self.that = None
+                else:
+                    self.vm.write_push("that", self.load_that(segment, index, key, start))
 
             elif self.tokenizer.token_value() in ("(", "."):
-                self.compile_subroutine_call(name)
+                self.compile_subroutine_call(name, position, used=True)
 
             else:
-                kind = self.symbol_table.kind_of(name)
-                index = self.symbol_table.index_of(name)
-                self.vm.write_push(self.kind_to_segment(kind), index)
+                segment, index, _ = self.variable(name, position)
+                self.vm.write_push(segment, index)
 
-    def compile_subroutine_call(self, name=None):
+        else:
+            raise self.error(f"Expected expression, found {self.found()}")
+
+    # ---------- array base cache ----------
+
+    def index_key(self, segment, start):
+        """
+        刚写出的下标表达式（buffer[start:]）-> (base, 偏移)，下标 = base + 常量偏移
+        数组变量和 base 中的变量都在 local / argument 段、base 只含 push 和 add / sub 时
+        下标是纯表达式，可以缓存；否则返回 None
+        """
+        if segment not in CACHED_SEGMENTS:
+            return None
+        commands = self.vm.commands()[start:]
+        offset = 0
+        if len(commands) == 1 and commands[0][:2] == (Op.PUSH, "constant"):
+            commands, offset = [], commands[0][2]
+        elif len(commands) > 2 and commands[-2][:2] == (Op.PUSH, "constant"):
+            if commands[-1] == (Op.ARITHMETIC, "add", None):
+                commands, offset = commands[:-2], commands[-2][2]
+            elif commands[-1] == (Op.ARITHMETIC, "sub", None):
+                commands, offset = commands[:-2], -commands[-2][2]
+
+        for op, arg1, _ in commands:
+            if op == Op.PUSH:
+                if arg1 != "constant" and arg1 not in CACHED_SEGMENTS:
+                    return None
+            elif op != Op.ARITHMETIC or arg1 not in ("add", "sub"):
+                return None
+        return tuple(commands), offset
+
+    def load_that(self, segment, index, key, start):
+        """
+        让 THAT 指向数组 (segment, index) 的 base 附近，返回目标元素在 that 段的下标
+        buffer[start:] 是已写出的下标表达式，由这里重写：
+        THAT 已经是同一数组同一 base 时直接复用，否则 THAT = 数组 + base（偏移为负时含偏移）
+        """
+        buffer = self.vm.commands()
+        del buffer[start:]
+        base, offset = key
+        that = self.that
+        if that is not None and that[:2] == ((segment, index), base) and offset >= that[2]:
+            return offset - that[2]
+
+        buffer.extend(base)
+        if offset < 0:
+            self.vm.write_push("constant", -offset)
+            self.vm.write_arithmetic("sub")
+        self.vm.write_push(segment, index)
+        if base or offset < 0:
+            self.vm.write_arithmetic("add")
+        self.vm.write_pop("pointer", 1)
+
+        variables = {(segment, index)}
+        variables.update((arg1, arg2) for op, arg1, arg2 in base if arg1 in CACHED_SEGMENTS)
+        that_offset = min(offset, 0)
+        self.that = ((segment, index), base, that_offset, variables)
+        return offset - that_offset
+
+    def compile_subroutine_call(self, name=None, position=None, used=False):
+        """
+        used: 返回值是否被使用（表达式中的调用为 True，do 语句为 False）
+        """
         if name is None:
+            position = self.position()
             name = self.tokenizer.token_value()
             self.eat("identifier")
 
@@ -340,25 +753,29 @@ class CompilationEngine:
             sub = self.tokenizer.token_value()
             self.eat("identifier")
 
-            kind = self.symbol_table.kind_of(name)
-            if kind:
-                segment = self.kind_to_segment(kind)
-                index = self.symbol_table.index_of(name)
+            resolved = self.symbol_table.resolve(name)
+            if resolved:
+                segment, index, type_ = resolved
                 self.vm.write_push(segment, index)
-                name = f"{self.symbol_table.type_of(name)}.{sub}"
+                call = ("method", type_, sub)
+                name = f"{type_}.{sub}"
                 n_args += 1
             else:
+                call = ("function", name, sub)
                 name = f"{name}.{sub}"
         else:
             self.vm.write_push("pointer", 0)
+            call = ("this", self.class_name, name)
             name = f"{self.class_name}.{name}"
             n_args += 1
 
         self.eat("symbol", "(")
-        n_args += self.compile_expression_list()
+        n_explicit = self.compile_expression_list()
+        n_args += n_explicit
         self.eat("symbol", ")")
 
         self.vm.write_call(name, n_args)
+        self.calls.append((self.subroutine_name, *call, n_explicit, used, *position))
 
     def compile_expression_list(self):
         count = 0
@@ -1,29 +1,107 @@
 # nand2tetris/jack/compiler.py
 import os
+import sys
 from nand2tetris.jack.tokenizer import JackTokenizer
-from nand2tetris.jack.compilation_engine import CompilationEngine
+from nand2tetris.jack.compilation_engine import CompilationEngine, CompileError
 from nand2tetris.jack.vm_writer import VMWriter
 
 
-def compile_single_file(path):
-    out_path = path.replace(".jack", ".vm")
-    with open(out_path, "w") as out:
-        tokenizer = JackTokenizer(path)
-        vm = VMWriter(out)
-        engine = CompilationEngine(tokenizer, vm)
-        engine.compile_class()
+def compile_single_file(path, source_map=False, bytecode=False):
+    """
+    X.jack -> X.vm；bytecode=True 时写出 X.vmb 字节码（见 vm/bytecode.py）
+    返回该类的签名与调用点（见 CompilationEngine.class_info）
+    """
+    engine = _compile(path, source_map)
+    if bytecode:
+        from nand2tetris.vm.bytecode import write_bytecode
+
+        write_bytecode(path.replace(".jack", ".vmb"), engine.vm.commands())
+    else:
+        out_path = path.replace(".jack", ".vm")
+        with open(out_path, "w") as out:
+            out.write(engine.vm.text())
+    return engine.class_info()
+
+
+def _compile(path, source_map=False):
+    tokenizer = JackTokenizer(path)
+    vm = VMWriter(source=os.path.basename(path) if source_map else None)
+    engine = CompilationEngine(tokenizer, vm)
+    engine.compile_class()
+    return engine
+
+
+def compile_to_commands(path, source_map=False):
+    """
+    编译单个 .jack 文件，返回 VM 指令元组列表（见 vm/commands.py），不经过文本
+    source_map=True 时包含 Op.LOCATION 行号记录
+    """
+    return _compile(path, source_map).vm.commands()
+
+
+def compile_to_vm(path, source_map=False):
+    """
+    编译单个 .jack 文件，返回 VM 代码文本（不写文件）
+    source_map=True 时在 VM 中写入 "// @Foo.jack:12" 行号注释
+    """
+    return _compile(path, source_map).vm.text()
 
 
-def compile_path(path):
+def compile_path(path, source_map=False, bytecode=False, check=False):
+    """
+    编译单个文件或目录下所有 .jack 文件
+    某个文件有错误时继续编译其余文件，返回全部错误 [JackError, ...]，按文件和位置排序
+    check=True 时，全部编译成功后再做全程序调用检查（见 jack/checker.py）
+    """
     if os.path.isdir(path):
-        for f in os.listdir(path):
-            if f.endswith(".jack"):
-                compile_single_file(os.path.join(path, f))
+        files = [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith(".jack")]
     else:
-        compile_single_file(path)
+        files = [path]
+
+    errors = []
+    compiled = {}
+    for f in files:
+        try:
+            compiled[f] = compile_single_file(f, source_map, bytecode)
+        except CompileError as e:
+            errors.extend(e.errors)
+    errors.sort(key=lambda error: (error.path, error.line, error.column))
+
+    if check and not errors:
+        from nand2tetris.jack.checker import check_path
+
+        errors = check_path(path, compiled)
+    return errors
+
+
+def report_errors(errors, json_output=False):
+    if json_output:
+        import json
+
+        print(json.dumps([error.to_json() for error in errors], indent=2))
+        return
+    for error in errors:
+        print(error, file=sys.stderr)
+    if errors:
+        print(f"{len(errors)} error(s)", file=sys.stderr)
 
 
 def main(argv):
+    """
+    jack [--source-map] [--vmb] [--check] [--json] <file|directory>
+    --check  编译后检查跨类调用（子程序是否存在、method / function、参数个数）
+    --json   错误以 JSON 数组输出到 stdout（[{"file", "line", "column", "message"}, ...]）
+    """
+    options = ("--source-map", "--vmb", "--check", "--json")
+    source_map = "--source-map" in argv
+    bytecode = "--vmb" in argv
+    check = "--check" in argv
+    json_output = "--json" in argv
+    argv = [arg for arg in argv if arg not in options]
     if len(argv) != 1:
-        raise ValueError("Usage: jack <file|directory>")
-    compile_path(argv[0])
+        raise ValueError("Usage: jack [--source-map] [--vmb] [--check] [--json] <file|directory>")
+
+    errors = compile_path(argv[0], source_map, bytecode, check)
+    report_errors(errors, json_output)
+    if errors:
+        sys.exit(1)
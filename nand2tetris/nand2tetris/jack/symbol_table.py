@@ -1,5 +1,28 @@
 # nand2tetris/jack/symbol_table.py
 
+# Jack 变量种类 -> VM 内存段（定义时算好，存进符号记录）
+KIND_SEGMENT = {
+    "static": "static",
+    "field": "this",
+    "arg": "argument",
+    "var": "local",
+}
+
+
+class Symbol:
+    """
+    一个符号的记录；__slots__ 避免每个符号一个 __dict__
+    """
+
+    __slots__ = ("type", "kind", "index", "segment")
+
+    def __init__(self, type_, kind, index):
+        self.type = type_
+        self.kind = kind
+        self.index = index
+        self.segment = KIND_SEGMENT[kind]
+
+
 class SymbolTable:
     def __init__(self):
         self.class_scope = {}
@@ -14,30 +37,42 @@ class SymbolTable:
     def define(self, name, type_, kind):
         index = self.counts[kind]
         self.counts[kind] += 1
-        entry = {"type": type_, "kind": kind, "index": index}
+        symbol = Symbol(type_, kind, index)
 
         if kind in ("static", "field"):
-            self.class_scope[name] = entry
+            self.class_scope[name] = symbol
         else:
-            self.subroutine_scope[name] = entry
+            self.subroutine_scope[name] = symbol
+
+    def lookup(self, name):
+        """
+        先查子程序作用域，再查类作用域；未定义时返回 None
+        """
+        symbol = self.subroutine_scope.get(name)
+        if symbol is None:
+            symbol = self.class_scope.get(name)
+        return symbol
+
+    def resolve(self, name):
+        """
+        一次查找得到 (segment, index, type)；未定义时返回 None
+        """
+        symbol = self.lookup(name)
+        if symbol is None:
+            return None
+        return symbol.segment, symbol.index, symbol.type
 
     def kind_of(self, name):
-        return (
-            self.subroutine_scope.get(name, self.class_scope.get(name, {}))
-            .get("kind")
-        )
+        symbol = self.lookup(name)
+        return symbol.kind if symbol else None
 
     def type_of(self, name):
-        return (
-            self.subroutine_scope.get(name, self.class_scope.get(name, {}))
-            .get("type")
-        )
+        symbol = self.lookup(name)
+        return symbol.type if symbol else None
 
     def index_of(self, name):
-        return (
-            self.subroutine_scope.get(name, self.class_scope.get(name, {}))
-            .get("index")
-        )
+        symbol = self.lookup(name)
+        return symbol.index if symbol else None
 
     def var_count(self, kind):
         return self.counts[kind]
@@ -1,38 +1,77 @@
 # nand2tetris/jack/tokenizer.py
 import re
 
-KEYWORDS = {
+KEYWORDS = frozenset({
     "class", "constructor", "function", "method", "field", "static",
     "var", "int", "char", "boolean", "void",
     "true", "false", "null", "this",
     "let", "do", "if", "else", "while", "return"
-}
+})
 
 SYMBOLS = "{}()[].,;+-*/&|<>=~"
 
+# 对 mmap 映射的字节一次扫描：注释、换行、token 四选一，只有 token 被解码
+# （同一位置先尝试注释，字符串常量整体匹配，其中的 // 不会被当作注释）
+SCAN_PATTERN = re.compile(
+    rb'(//[^\n]*)|(/\*.*?\*/)|(\n)|("[^"\n]*"|[A-Za-z_]\w*|\d+|['
+    + re.escape(SYMBOLS.encode())
+    + rb'])',
+    re.S,
+)
+
 
 class JackTokenizer:
     def __init__(self, path):
-        with open(path) as f:
-            source = f.read()
+        self.path = path
+        self.tokens = []
+        # 每个 token 所在的源码行号、列号（从 1 开始），用于 source map 和错误报告
+        self.lines = []
+        self.columns = []
 
-        source = re.sub(r"//.*", "", source)
-        source = re.sub(r"/\*.*?\*/", "", source, flags=re.S)
+        from nand2tetris.common.mmapio import mapped
 
-        token_pattern = r'"[^"\n]*"|[A-Za-z_]\w*|\d+|[' + re.escape(SYMBOLS) + r']'
-        self.tokens = re.findall(token_pattern, source)
+        line = 1
+        line_start = 0
+        with mapped(path) as buf:
+            for m in SCAN_PATTERN.finditer(buf):
+                token = m.group(4)
+                if token is not None:
+                    self.tokens.append(token.decode())
+                    self.lines.append(line)
+                    self.columns.append(m.start() - line_start + 1)
+                elif m.group(3) is not None:
+                    line += 1
+                    line_start = m.end()
+                elif m.group(2) is not None:
+                    # 块注释跨行时同样推进行号
+                    newlines = m.group(2).count(b"\n")
+                    if newlines:
+                        line += newlines
+                        line_start = m.start() + m.group(2).rfind(b"\n") + 1
 
         self.index = 0
         self.current = None
+        # 没有任何 token 的文件（空文件、只有注释）把错误报告在 1:1
+        self.current_line = 1
+        self.current_column = 1
         self.advance()
 
     def advance(self):
         if self.index < len(self.tokens):
             self.current = self.tokens[self.index]
+            self.current_line = self.lines[self.index]
+            self.current_column = self.columns[self.index]
             self.index += 1
         else:
+            # 到达文件末尾：位置停在最后一个 token 上（"found end of file" 报告在这里）
             self.current = None
 
+    def is_last(self):
+        """
+        当前 token 是否是文件中的最后一个
+        """
+        return self.current is not None and self.index == len(self.tokens)
+
     def token_type(self):
         if self.current is None:
             return None
@@ -1,32 +1,69 @@
 # nand2tetris/jack/vm_writer.py
+# 指令先以 (opcode, arg1, arg2) 元组缓存在内存中（见 vm/commands.py），
+# flush / close 时一次性格式化写出；也可以用 commands() 直接交给翻译器
+
+from nand2tetris.vm.commands import Op, format_command
+
 
 class VMWriter:
-    def __init__(self, out):
+    def __init__(self, out=None, source=None):
         self.out = out
+        # source map：给出源文件名时，在行号变化处记录 "// @Foo.jack:12" 注释
+        self.source = source
+        self.location = None
+        self.buffer = []
+
+    def set_line(self, line):
+        if self.source is None:
+            return
+        location = f"{self.source}:{line}"
+        if location != self.location:
+            self.location = location
+            self.buffer.append((Op.LOCATION, location, None))
 
     def write_push(self, segment, index):
-        self.out.write(f"push {segment} {index}\n")
+        self.buffer.append((Op.PUSH, segment, index))
 
     def write_pop(self, segment, index):
-        self.out.write(f"pop {segment} {index}\n")
+        self.buffer.append((Op.POP, segment, index))
 
     def write_arithmetic(self, command):
-        self.out.write(f"{command}\n")
+        self.buffer.append((Op.ARITHMETIC, command, None))
 
     def write_label(self, label):
-        self.out.write(f"label {label}\n")
+        self.buffer.append((Op.LABEL, label, None))
 
     def write_goto(self, label):
-        self.out.write(f"goto {label}\n")
+        self.buffer.append((Op.GOTO, label, None))
 
     def write_if(self, label):
-        self.out.write(f"if-goto {label}\n")
+        self.buffer.append((Op.IF_GOTO, label, None))
 
     def write_call(self, name, n_args):
-        self.out.write(f"call {name} {n_args}\n")
+        self.buffer.append((Op.CALL, name, n_args))
 
     def write_function(self, name, n_locals):
-        self.out.write(f"function {name} {n_locals}\n")
+        self.buffer.append((Op.FUNCTION, name, n_locals))
 
     def write_return(self):
-        self.out.write("return\n")
+        self.buffer.append((Op.RETURN, None, None))
+
+    def commands(self):
+        """
+        尚未写出的指令元组
+        """
+        return self.buffer
+
+    def text(self):
+        return "".join([format_command(command) + "\n" for command in self.buffer])
+
+    def flush(self):
+        """
+        缓存的指令一次写入 out，然后清空缓存
+        """
+        if self.out is not None and self.buffer:
+            self.out.write(self.text())
+        self.buffer = []
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,503 @@
+# nand2tetris/testing/runner.py
+# 批量测试：把 tests/ 下的夹具逐个走完 jack -> vm -> asm -> 模拟器，并行执行
+#
+# 夹具类型：
+#   X.jack             编译；若同目录有 X.vm，则逐行比对编译结果
+#   Dir/               一个完整程序（.jack 与预编译的 .vm，如 OS）
+#   Dir/*.tst          该程序上的一个运行场景，每个 .tst 是一个测试用例
+#                      没有 .tst 的程序目录只检查能否完整构建
+#   X.asm              反汇编往返检查（disasm verify）；有 X.dis.asm 时逐行比对恢复名字的反汇编
+#   X.hack [+ X.sym]   反汇编再汇编必须与原机器码相同；有 X.dis.asm 时同样逐行比对
+#                      （不含 .jack / .vm 的目录中的 .asm / .hack 逐个作为用例）
+#   X.vmb              有 X.vm 时两者必须无损互转（含位置注释）；没有时是损坏文件，必须被拒绝
+#                      （含 .vmb、不含 .jack 的目录中的 .vmb 逐个作为用例）
+#   .jack 用例另外检查带位置记录的编译结果经 .vmb 编码、解码后不变
+#
+# .tst 场景文件（// 之后为注释）：
+#   vm --inline --regalloc        VM 翻译选项（同 nand2tetris vm）
+#   cycles 2000000                周期预算
+#   stop Sys.halt                 执行到该函数（ROM 标签）时停机
+#   ram 8000 1083                 期望 RAM[8000] = 1083
+#   ram 8000-8002 1083 5 41       期望一段连续 RAM 的值（有符号十进制）
+#   keys Keys.txt                 按键脚本（同 nand2tetris emu --keys，相对 .tst 所在目录）
+#   resume 20000                  另外录制一次（每 20000 个周期一个快照），从中间的快照恢复到
+#                                 新的模拟器继续运行，最终状态（RAM、周期、PC、A、D）必须与直接运行相同
+#   check                         做全程序调用检查（jack/checker.py），期望没有错误
+#   error Main.jack:9:17 Point.new expects 2 argument(s), got 1
+#                                 期望的检查错误（按报告顺序逐条列出，隐含 check）
+# 检查在目录的临时副本上进行，连续三次：首次解析全部类；没有改动时全部复用索引；
+# 改动一个文件后只重新解析这个文件。三次的错误都必须与期望相同。
+# 只有 check / error、没有 stop / ram 的场景不构建、不运行程序。
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from nand2tetris.asm.assembler import assemble, assemble_with_symbols
+from nand2tetris.asm.disassembler import disassemble, disassemble_path, load_words, verify_file
+from nand2tetris.emu.emulator import HackEmulator, parse_key_script
+from nand2tetris.emu.snapshot import Session, record
+from nand2tetris.jack import checker
+from nand2tetris.jack.compiler import compile_to_commands, compile_to_vm
+from nand2tetris.vm.bytecode import decode, encode, load_bytecode
+from nand2tetris.vm.commands import Op, as_command, format_command, parse_command
+from nand2tetris.vm.translator import link_program, parse_options
+
+DEFAULT_CYCLES = 1_000_000
+FILE_KINDS = {".tst": "scenario", ".jack": "jack", ".asm": "asm", ".hack": "hack", ".vmb": "vmb"}
+
+
+class TestFailure(Exception):
+    pass
+
+
+def discover(paths):
+    """
+    收集测试用例，返回 [(kind, path), ...]，按路径排序以便分片稳定
+    kind: "jack" / "scenario" / "build" / "asm" / "hack" / "vmb"
+    """
+    cases = []
+    for root in paths:
+        root = Path(root)
+        if root.is_file():
+            cases.append((FILE_KINDS.get(root.suffix, "jack"), str(root)))
+            continue
+        for entry in sorted(root.iterdir()):
+            if entry.suffix == ".jack":
+                cases.append(("jack", str(entry)))
+            elif not entry.is_dir():
+                continue
+            elif any(entry.glob("*.vmb")) and not any(entry.glob("*.jack")):
+                cases.extend(("vmb", str(f)) for f in sorted(entry.glob("*.vmb")))
+            elif any(entry.glob("*.jack")) or any(entry.glob("*.vm")):
+                scenarios = sorted(entry.glob("*.tst"))
+                if scenarios:
+                    cases.extend(("scenario", str(tst)) for tst in scenarios)
+                else:
+                    cases.append(("build", str(entry)))
+            else:
+                cases.extend(
+                    (FILE_KINDS[f.suffix], str(f))
+                    for f in sorted(entry.iterdir())
+                    if f.suffix in (".asm", ".hack") and not f.name.endswith(".dis.asm")
+                )
+    return sorted(cases, key=lambda case: case[1])
+
+
+def shard(cases, spec):
+    """
+    spec 形如 "2/4"：取第 2 片（共 4 片），按下标取模划分
+    """
+    k, n = (int(x) for x in spec.split("/"))
+    if not 1 <= k <= n:
+        raise ValueError(f"Invalid shard: {spec}")
+    return [case for i, case in enumerate(cases) if i % n == k - 1]
+
+
+def vm_lines(text):
+    return [
+        line.strip()
+        for line in text.splitlines()
+        if line.strip() and not line.strip().startswith("//")
+    ]
+
+
+def parse_scenario(path):
+    scenario = {
+        "vm": [], "cycles": None, "stop": None, "ram": [], "keys": None, "resume": None,
+        "check": False, "errors": [],
+    }
+    with open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            parts = line.split("//")[0].split()
+            if not parts:
+                continue
+            command, args = parts[0], parts[1:]
+            if command == "vm":
+                scenario["vm"] = args
+            elif command == "cycles":
+                scenario["cycles"] = int(args[0])
+            elif command == "stop":
+                scenario["stop"] = args[0]
+            elif command == "ram":
+                start, _, end = args[0].partition("-")
+                start = int(start)
+                end = int(end or start)
+                values = [int(v) for v in args[1:]]
+                if len(values) != end - start + 1:
+                    raise TestFailure(f"{path}:{lineno}: expected {end - start + 1} value(s)")
+                scenario["ram"].append((start, values))
+            elif command == "keys":
+                scenario["keys"] = Path(path).parent / args[0]
+            elif command == "resume":
+                scenario["resume"] = int(args[0])
+            elif command == "check":
+                scenario["check"] = True
+            elif command == "error":
+                if len(args) < 2:
+                    raise TestFailure(f"{path}:{lineno}: expected 'error File.jack:L:C message'")
+                scenario["check"] = True
+                scenario["errors"].append(f"{args[0]}: {' '.join(args[1:])}")
+            else:
+                raise TestFailure(f"{path}:{lineno}: unknown directive '{command}'")
+    return scenario
+
+
+def build_program(directory):
+    """
+    编译目录中的 .jack，并收集没有对应 .jack 的预编译 .vm（如 OS）
+    返回 [(file_stem, line), ...]；.jack 编译出的是指令元组，.vm 是文本行
+    """
+    directory = Path(directory)
+    sources = {}
+    for vm_file in sorted(directory.glob("*.vm")):
+        sources[vm_file.stem] = vm_lines(vm_file.read_text())
+    for jack_file in sorted(directory.glob("*.jack")):
+        sources[jack_file.stem] = compile_to_commands(str(jack_file))
+
+    program = []
+    for stem in sorted(sources):
+        program.extend((stem, line) for line in sources[stem])
+    return program
+
+
+def label_address(asm_lines, label):
+    """
+    在汇编行中找到标签 (label) 对应的 ROM 地址
+    """
+    addr = 0
+    for line in asm_lines:
+        if line.startswith("("):
+            if line[1:-1] == label:
+                return addr
+        else:
+            addr += 1
+    raise TestFailure(f"label '{label}' not found")
+
+
+def compare_lines(what, expected, actual):
+    for i, (want, got) in enumerate(zip(expected, actual), 1):
+        if want != got:
+            raise TestFailure(f"{what} line {i}: expected '{want}', got '{got}'")
+    if len(expected) != len(actual):
+        raise TestFailure(f"{what} has {len(actual)} line(s), expected {len(expected)}")
+
+
+def compare_golden(path, suffix, what, actual):
+    """
+    有同名的期望文件（X + suffix）时逐行比对，没有时跳过
+    """
+    expected_path = Path(path).with_suffix(suffix)
+    if expected_path.exists():
+        compare_lines(what, vm_lines(expected_path.read_text()), vm_lines("\n".join(actual)))
+
+
+def run_jack(path):
+    compare_golden(path, ".vm", "VM", compile_to_vm(path).splitlines())
+    commands = compile_to_commands(path, source_map=True)
+    if decode(encode(commands)) != commands:
+        raise TestFailure("VM bytecode round trip changed the commands")
+    return {}
+
+
+def run_vmb(path):
+    text_path = Path(path).with_suffix(".vm")
+    if not text_path.exists():
+        try:
+            load_bytecode(path)
+        except ValueError:
+            return {}
+        raise TestFailure("corrupt VM bytecode was accepted")
+
+    from nand2tetris.common.mmapio import code_lines, mapped
+    from nand2tetris.vm.sourcemap import LOCATION_PREFIX
+
+    with mapped(text_path) as buf:
+        lines = [line.decode() for line in code_lines(buf, keep=LOCATION_PREFIX.encode())]
+    commands = [parse_command(line) for line in lines]
+    data = encode(commands)
+    expected = Path(path).read_bytes()
+    if data != expected:
+        offset = next(
+            (i for i, (a, b) in enumerate(zip(expected, data)) if a != b),
+            min(len(expected), len(data)),
+        )
+        raise TestFailure(f"{text_path.name} encodes differently at byte {offset}")
+    compare_lines("decoded VM", lines, [format_command(command) for command in load_bytecode(path)])
+    return {}
+
+
+def run_asm(path):
+    try:
+        verify_file(path)
+    except ValueError as e:
+        raise TestFailure(str(e)) from None
+    with open(path) as f:
+        machine_code, labels, variables, _ = assemble_with_symbols(f.readlines())
+    words = [int(code, 2) for code in machine_code]
+    compare_golden(path, ".dis.asm", "disassembly", disassemble(words, labels, variables))
+    return {"rom": len(words)}
+
+
+def run_hack(path):
+    symbols_path = Path(path).with_suffix(".sym")
+    symbols_path = str(symbols_path) if symbols_path.exists() else None
+    words = load_words(path)
+    machine_code = [f"{word:016b}" for word in words]
+
+    symbolic = disassemble_path(path, symbols_path)
+    for mode, text in (("numeric", disassemble(words)), ("symbolic", symbolic)):
+        again = assemble(text)
+        if again != machine_code:
+            pc = next(
+                (i for i, (a, b) in enumerate(zip(machine_code, again)) if a != b),
+                min(len(machine_code), len(again)),
+            )
+            raise TestFailure(f"{mode} disassembly reassembles differently at ROM[{pc}]")
+    compare_golden(path, ".dis.asm", "disassembly", symbolic)
+    return {"rom": len(words)}
+
+
+def run_check(directory, expected):
+    """
+    在目录的临时副本上检查三次（首次 / 复用索引 / 改动一个文件后），
+    比对错误和每次重新解析的文件
+    """
+    directory = Path(directory)
+    analyze = checker.analyze
+    parsed = []
+
+    def counting_analyze(path):
+        parsed.append(Path(path).name)
+        return analyze(path)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 副本与原目录同名，索引文件名 <dir>.sig.json 不变
+        copy = Path(tmp) / directory.name
+        copy.mkdir()
+        for source in sorted(directory.glob("*.jack")) + sorted(directory.glob("*.vm")):
+            shutil.copy(source, copy)
+        sources = sorted(f.name for f in copy.glob("*.jack"))
+        touched = copy / sources[0]
+
+        checker.analyze = counting_analyze
+        try:
+            for run, reparsed in (("first", sources), ("cached", []), ("touched", [touched.name])):
+                if run == "touched":
+                    # 在文件末尾加一行注释：摘要改变，错误位置不变
+                    with open(touched, "a") as f:
+                        f.write("\n// touched\n")
+                parsed.clear()
+                errors = [
+                    f"{Path(error.path).name}:{error.line}:{error.column}: {error.message}"
+                    for error in checker.check_path(str(copy))
+                ]
+                compare_lines(f"{run} check errors", expected, errors)
+                if parsed != reparsed:
+                    raise TestFailure(
+                        f"{run} check parsed {parsed or 'nothing'}, expected {reparsed or 'nothing'}"
+                    )
+        finally:
+            checker.analyze = analyze
+
+
+def run_scenario(path, default_cycles):
+    scenario = parse_scenario(path)
+    if scenario["check"]:
+        run_check(Path(path).parent, scenario["errors"])
+        if not scenario["stop"] and not scenario["ram"]:
+            return {}
+    options, rest = parse_options(scenario["vm"])
+    if rest:
+        raise TestFailure(f"unknown vm option(s): {' '.join(rest)}")
+
+    program = build_program(Path(path).parent)
+    if not any(as_command(line)[:2] == (Op.FUNCTION, "Sys.init") for _, line in program):
+        raise TestFailure("program has no Sys.init")
+
+    asm_lines = link_program(program, **options)
+    rom = [int(word, 2) for word in assemble(asm_lines)]
+    breakpoint = label_address(asm_lines, scenario["stop"]) if scenario["stop"] else None
+    keys = parse_key_script(scenario["keys"]) if scenario["keys"] else []
+
+    def new_emulator():
+        emulator = HackEmulator(rom)
+        if breakpoint is not None:
+            emulator.breakpoints.add(breakpoint)
+        emulator.schedule_keys(keys)
+        return emulator
+
+    emulator = new_emulator()
+    budget = scenario["cycles"] or default_cycles
+    emulator.run(budget)
+    if scenario["stop"] and not emulator.halted:
+        raise TestFailure(f"did not reach {scenario['stop']} within {budget} cycles")
+
+    for start, values in scenario["ram"]:
+        for offset, want in enumerate(values):
+            addr = start + offset
+            got = emulator.ram[addr]
+            got = got - 0x10000 if got & 0x8000 else got
+            if got != want:
+                raise TestFailure(f"RAM[{addr}]: expected {want}, got {got}")
+
+    if scenario["resume"]:
+        run_resume(new_emulator, emulator, budget, scenario["resume"])
+    return {"cycles": emulator.cycles, "rom": len(emulator.rom)}
+
+
+def run_resume(new_emulator, straight, budget, every):
+    """
+    录制一次，从中间的快照恢复到新的模拟器（已安排同样的按键脚本）继续运行，
+    最终状态必须与直接运行的 straight 相同
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        session_path = os.path.join(tmp, "run.hsnap")
+        record(new_emulator(), session_path, budget, every)
+        session = Session(session_path)
+
+    index = len(session.snapshots) // 2
+    resumed = new_emulator()
+    start = session.restore(resumed, index)
+    resumed.run(budget - start)
+
+    for name in ("cycles", "pc", "a", "d", "halted"):
+        want, got = getattr(straight, name), getattr(resumed, name)
+        if want != got:
+            raise TestFailure(f"resumed at cycle {start}: {name} is {got}, straight run {want}")
+    if resumed.ram != straight.ram:
+        addr = next(i for i, (a, b) in enumerate(zip(straight.ram, resumed.ram)) if a != b)
+        raise TestFailure(
+            f"resumed at cycle {start}: RAM[{addr}] is {resumed.ram[addr]}, "
+            f"straight run {straight.ram[addr]}"
+        )
+
+
+def run_build(directory):
+    asm_lines = link_program(build_program(directory))
+    return {"rom": len(assemble(asm_lines))}
+
+
+def run_case(case, default_cycles=DEFAULT_CYCLES):
+    """
+    在工作进程中执行一个用例，返回可序列化的结果字典
+    """
+    kind, path = case
+    result = {"name": path, "kind": kind, "status": "pass", "message": ""}
+    start = time.perf_counter()
+    try:
+        if kind == "jack":
+            result.update(run_jack(path))
+        elif kind == "scenario":
+            result.update(run_scenario(path, default_cycles))
+        elif kind == "asm":
+            result.update(run_asm(path))
+        elif kind == "hack":
+            result.update(run_hack(path))
+        elif kind == "vmb":
+            result.update(run_vmb(path))
+        else:
+            result.update(run_build(path))
+    except TestFailure as e:
+        result["status"] = "fail"
+        result["message"] = str(e)
+    except Exception as e:
+        result["status"] = "error"
+        result["message"] = f"{type(e).__name__}: {e}"
+    result["time"] = time.perf_counter() - start
+    return result
+
+
+def junit_xml(results) -> bytes:
+    suite = ET.Element(
+        "testsuite",
+        name="nand2tetris",
+        tests=str(len(results)),
+        failures=str(sum(r["status"] == "fail" for r in results)),
+        errors=str(sum(r["status"] == "error" for r in results)),
+        time=f"{sum(r['time'] for r in results):.3f}",
+    )
+    for r in results:
+        path = Path(r["name"])
+        case = ET.SubElement(
+            suite,
+            "testcase",
+            classname=str(path.parent).replace(os.sep, "."),
+            name=path.name,
+            time=f"{r['time']:.3f}",
+        )
+        if r["status"] != "pass":
+            tag = "failure" if r["status"] == "fail" else "error"
+            ET.SubElement(case, tag, message=r["message"]).text = r["message"]
+    return ET.tostring(suite, encoding="utf-8", xml_declaration=True)
+
+
+def main(argv=None):
+    """
+    批量测试入口
+    nand2tetris test [PATH ...] [-j N] [--shard K/N] [--junit FILE] [--cycles N]
+    PATH 默认为 tests；-j 默认使用全部 CPU 核
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+
+    usage = "Usage: nand2tetris test [PATH ...] [-j N] [--shard K/N] [--junit FILE] [--cycles N]"
+    jobs = os.cpu_count() or 1
+    shard_spec = None
+    junit_path = None
+    cycles = DEFAULT_CYCLES
+    paths = []
+
+    it = iter(argv)
+    for arg in it:
+        if arg in ("-j", "--shard", "--junit", "--cycles"):
+            value = next(it, None)
+            if value is None:
+                print(usage, file=sys.stderr)
+                sys.exit(1)
+            if arg == "-j":
+                jobs = int(value)
+            elif arg == "--shard":
+                shard_spec = value
+            elif arg == "--junit":
+                junit_path = value
+            else:
+                cycles = int(value)
+        else:
+            paths.append(arg)
+
+    cases = discover(paths or ["tests"])
+    if shard_spec:
+        cases = shard(cases, shard_spec)
+
+    if jobs > 1 and len(cases) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(run_case, cases, [cycles] * len(cases)))
+    else:
+        results = [run_case(case, cycles) for case in cases]
+
+    for r in results:
+        extra = ", ".join(f"{key}={r[key]}" for key in ("rom", "cycles") if key in r)
+        line = f"{r['status'].upper():5} {r['name']} ({r['time']:.2f}s{', ' + extra if extra else ''})"
+        if r["message"]:
+            line += f": {r['message']}"
+        print(line)
+
+    failed = sum(r["status"] != "pass" for r in results)
+    print(f"{len(results) - failed} passed, {failed} failed")
+
+    if junit_path:
+        with open(junit_path, "wb") as f:
+            f.write(junit_xml(results))
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# nand2tetris/vm/bytecode.py
+# 二进制 VM 字节码（.vmb）：与 .vm 文本一一对应，加载时不需要逐行切分、解析整数
+#
+# 格式（小端）：
+#   文件头   b"HVMB", 版本, 保留, 指令数 N, 字符串数 NS
+#   N 条指令，每条 4 字节：u8 opcode, u8 段 / 计数, u16 操作数
+#   u32[NS + 1]  字符串在字符串表中的起止偏移
+#   字符串表     UTF-8 字符串依次拼接（函数名、标签名、源码位置，各只存一次）
+#
+# 各指令的字段（opcode 见 vm/commands.py 的 Op）：
+#   push / pop             段号（SEGMENTS 下标）, 下标
+#   算术 / 逻辑             指令号（ARITHMETIC 下标）, 0
+#   label / goto / if-goto  0, 标签名的字符串号
+#   function / call        局部变量数 / 参数个数（<= 255）, 函数名的字符串号
+#   return                 0, 0
+#   位置注释                0, "File.jack:行号" 的字符串号
+# 表中为 0 的字段和文件头的保留字段必须为 0，否则加载时当作损坏文件拒绝。
+# 普通注释和空白不保留，其余与 .vm 可以无损互相转换。
+
+import struct
+import sys
+from pathlib import Path
+
+from nand2tetris.vm.commands import Op, format_command, parse_command
+
+MAGIC = b"HVMB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+COMMAND = struct.Struct("<BBH")
+
+SEGMENTS = ("constant", "local", "argument", "this", "that", "temp", "pointer", "static")
+ARITHMETIC = ("add", "sub", "neg", "and", "or", "not", "eq", "gt", "lt")
+SEGMENT_CODES = {name: i for i, name in enumerate(SEGMENTS)}
+ARITHMETIC_CODES = {name: i for i, name in enumerate(ARITHMETIC)}
+OPS = tuple(Op)
+
+
+def encode(commands) -> bytes:
+    """
+    指令元组列表 -> .vmb 字节
+    """
+    strings = {}
+    records = bytearray(COMMAND.size * len(commands))
+    for i, command in enumerate(commands):
+        op, arg1, arg2 = command
+        if op == Op.PUSH or op == Op.POP:
+            if arg1 not in SEGMENT_CODES:
+                raise ValueError(f"Unsupported VM instruction: {format_command(command)}")
+            field, operand = SEGMENT_CODES[arg1], arg2
+        elif op == Op.ARITHMETIC:
+            field, operand = ARITHMETIC_CODES[arg1], 0
+        elif op == Op.RETURN:
+            field, operand = 0, 0
+        else:
+            field = 0
+            if op == Op.FUNCTION or op == Op.CALL:
+                field = arg2
+            operand = strings.setdefault(arg1, len(strings))
+
+        if not 0 <= field <= 0xFF or not 0 <= operand <= 0xFFFF:
+            raise ValueError(f"Operand out of range: {format_command(command)}")
+        COMMAND.pack_into(records, i * COMMAND.size, op, field, operand)
+
+    names = [name.encode() for name in strings]
+    offsets = [0]
+    for name in names:
+        offsets.append(offsets[-1] + len(name))
+
+    return b"".join([
+        HEADER.pack(MAGIC, VERSION, 0, len(commands), len(names)),
+        records,
+        struct.pack(f"<{len(offsets)}I", *offsets),
+        *names,
+    ])
+
+
+def decode(buf) -> list[tuple]:
+    """
+    .vmb 字节（bytes / mmap）-> 指令元组列表
+    """
+    if len(buf) < HEADER.size:
+        raise ValueError("Not a VM bytecode file")
+    magic, version, reserved, n_commands, n_strings = HEADER.unpack_from(buf, 0)
+    if magic != MAGIC or version != VERSION or reserved:
+        raise ValueError("Not a VM bytecode file")
+
+    start = HEADER.size
+    table = start + COMMAND.size * n_commands
+    base = table + 4 * (n_strings + 1)
+    if len(buf) < base:
+        raise ValueError("Truncated VM bytecode file")
+    offsets = struct.unpack_from(f"<{n_strings + 1}I", buf, table)
+    if len(buf) != base + offsets[-1] or any(a > b for a, b in zip(offsets, offsets[1:])):
+        raise ValueError("Truncated or corrupt VM bytecode string table")
+    strings = [
+        str(buf[base + offsets[i]:base + offsets[i + 1]], "utf-8") for i in range(n_strings)
+    ]
+
+    # 每条指令按 u32 读出；相同的指令共享同一个元组，重复的 push / pop / 算术不再分配
+    commands = []
+    append = commands.append
+    seen = {}
+    for record in struct.unpack_from(f"<{n_commands}I", buf, start):
+        command = seen.get(record)
+        if command is None:
+            command = seen[record] = _command(
+                record & 0xFF, (record >> 8) & 0xFF, record >> 16, strings
+            )
+        append(command)
+    return commands
+
+
+def _command(opcode, field, operand, strings) -> tuple:
+    if opcode >= len(OPS):
+        raise ValueError(f"Invalid VM bytecode opcode: {opcode}")
+    op = OPS[opcode]
+    if op == Op.PUSH or op == Op.POP:
+        if field >= len(SEGMENTS):
+            raise ValueError(f"Invalid VM bytecode segment: {field}")
+        return op, SEGMENTS[field], operand
+    if op == Op.ARITHMETIC:
+        if field >= len(ARITHMETIC):
+            raise ValueError(f"Invalid VM bytecode arithmetic command: {field}")
+        if operand:
+            raise ValueError(f"Invalid VM bytecode operand for {ARITHMETIC[field]}: {operand}")
+        return op, ARITHMETIC[field], None
+    if op == Op.RETURN:
+        if field or operand:
+            raise ValueError("Invalid VM bytecode return: fields must be 0")
+        return op, None, None
+    if field and op != Op.FUNCTION and op != Op.CALL:
+        raise ValueError(f"Invalid VM bytecode field for opcode {opcode}: {field}")
+    if operand >= len(strings):
+        raise ValueError(f"Invalid VM bytecode string index: {operand}")
+    if op == Op.FUNCTION or op == Op.CALL:
+        return op, strings[operand], field
+    return op, strings[operand], None
+
+
+def load_bytecode(path) -> list[tuple]:
+    from nand2tetris.common.mmapio import mapped
+
+    with mapped(path) as buf:
+        return decode(buf)
+
+
+def write_bytecode(path, commands):
+    with open(path, "wb") as f:
+        f.write(encode(commands))
+
+
+def convert(path) -> Path:
+    """
+    X.vm -> X.vmb，X.vmb -> X.vm（同目录），返回输出路径
+    """
+    from nand2tetris.common.mmapio import code_lines, mapped
+    from nand2tetris.vm.sourcemap import LOCATION_PREFIX
+
+    path = Path(path)
+    if path.suffix == ".vm":
+        with mapped(path) as buf:
+            lines = code_lines(buf, keep=LOCATION_PREFIX.encode())
+            commands = [parse_command(line.decode()) for line in lines]
+        output = path.with_suffix(".vmb")
+        write_bytecode(output, commands)
+    elif path.suffix == ".vmb":
+        commands = load_bytecode(path)
+        output = path.with_suffix(".vm")
+        output.write_text("".join([format_command(command) + "\n" for command in commands]))
+    else:
+        raise ValueError(f"Expected a .vm or .vmb file: {path}")
+    return output
+
+
+def main(argv=None):
+    """
+    nand2tetris vmb [-j N] <file.vm | file.vmb> ...
+    .vm 与 .vmb 互相转换（按扩展名决定方向），输出到同目录
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+
+    from nand2tetris.common.batch import expand_inputs, parse_jobs, run_batch
+
+    usage = "Usage: nand2tetris vmb [-j N] <file.vm | file.vmb> ..."
+    try:
+        jobs, argv = parse_jobs(argv)
+    except ValueError:
+        print(usage, file=sys.stderr)
+        sys.exit(1)
+    inputs = expand_inputs(argv)
+    if not inputs:
+        print(usage, file=sys.stderr)
+        sys.exit(1)
+
+    if run_batch(convert, inputs, jobs):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
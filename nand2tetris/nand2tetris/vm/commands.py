@@ -0,0 +1,95 @@
+# nand2tetris/vm/commands.py
+# VM 指令的内存表示：(opcode, arg1, arg2) 元组
+#
+#   push / pop          (Op.PUSH, "local", 2)
+#   算术 / 逻辑          (Op.ARITHMETIC, "add", None)
+#   label / goto / if-goto  (Op.LABEL, "WHILE_EXP0", None)
+#   function / call     (Op.CALL, "Math.multiply", 2)
+#   return              (Op.RETURN, None, None)
+#   位置注释             (Op.LOCATION, "Main.jack:12", None)
+#
+# Jack 编译器直接产出这种元组，翻译器按 opcode 分派，不必重新切分文本。
+
+from enum import IntEnum
+
+from nand2tetris.vm.sourcemap import LOCATION_PREFIX, is_location, parse_location
+
+
+class Op(IntEnum):
+    PUSH = 0
+    POP = 1
+    ARITHMETIC = 2
+    LABEL = 3
+    GOTO = 4
+    IF_GOTO = 5
+    FUNCTION = 6
+    CALL = 7
+    RETURN = 8
+    LOCATION = 9
+
+
+ARITHMETIC_COMMANDS = frozenset(("add", "sub", "neg", "and", "or", "not", "eq", "gt", "lt"))
+
+# 指令关键字 <-> opcode（算术指令、return、位置注释单独处理）
+OPCODES = {
+    "push": Op.PUSH,
+    "pop": Op.POP,
+    "label": Op.LABEL,
+    "goto": Op.GOTO,
+    "if-goto": Op.IF_GOTO,
+    "function": Op.FUNCTION,
+    "call": Op.CALL,
+}
+KEYWORDS = {op: keyword for keyword, op in OPCODES.items()}
+
+# 只带一个参数（标签名）的指令
+LABEL_OPS = frozenset((Op.LABEL, Op.GOTO, Op.IF_GOTO))
+
+
+def parse_command(line: str) -> tuple:
+    """
+    一行 VM 文本 -> 指令元组
+    """
+    if is_location(line):
+        return Op.LOCATION, parse_location(line), None
+
+    parts = line.split()
+    command = parts[0] if parts else ""
+    if command in ARITHMETIC_COMMANDS:
+        return Op.ARITHMETIC, command, None
+    if command == "return":
+        return Op.RETURN, None, None
+
+    op = OPCODES.get(command)
+    if op is None:
+        raise ValueError(f"Unsupported VM instruction: {line}")
+    if op in LABEL_OPS:
+        if len(parts) < 2:
+            raise ValueError(f"Unsupported VM instruction: {line}")
+        return op, parts[1], None
+    if len(parts) < 3:
+        raise ValueError(f"Unsupported VM instruction: {line}")
+    return op, parts[1], int(parts[2])
+
+
+def format_command(command: tuple) -> str:
+    """
+    指令元组 -> 一行 VM 文本（parse_command 的逆运算）
+    """
+    op, arg1, arg2 = command
+    if op == Op.ARITHMETIC:
+        return arg1
+    if op == Op.RETURN:
+        return "return"
+    if op == Op.LOCATION:
+        return LOCATION_PREFIX + arg1
+    if arg2 is None:
+        return f"{KEYWORDS[op]} {arg1}"
+    return f"{KEYWORDS[op]} {arg1} {arg2}"
+
+
+def as_command(line) -> tuple:
+    """
+    VM 文本行或指令元组 -> 指令元组（链接阶段的程序中两种形式可以混用）
+    """
+    return parse_command(line) if isinstance(line, str) else line
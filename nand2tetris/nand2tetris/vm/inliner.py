@@ -0,0 +1,186 @@
+# nand2tetris/vm/inliner.py
+# 整程序内联：把小的叶子函数体直接展开到调用点，省掉 call / return 的栈帧协议
+
+from nand2tetris.vm.commands import LABEL_OPS, Op, as_command
+from nand2tetris.vm.linker import split_functions
+
+# 展开后 argument / local 映射到 temp 1..7（temp 0 留给 Jack 编译器自己用）
+FIRST_REG = 1
+LAST_REG = 7
+
+# 默认只内联函数体不超过 8 条 VM 指令的函数
+DEFAULT_THRESHOLD = 8
+
+inline_counter = 0
+
+
+def _uses_high_temp(body) -> bool:
+    """
+    函数体是否使用了 temp 1..7（与内联的寄存器映射冲突）
+    """
+    for _, line in body:
+        op, segment, index = as_command(line)
+        if op in (Op.PUSH, Op.POP) and segment == "temp" and index >= FIRST_REG:
+            return True
+    return False
+
+
+def analyze_candidate(body, threshold):
+    """
+    判断函数能否被内联，能则返回描述信息，否则返回 None
+
+    条件：
+    - 叶子函数（不含 call，因此也不会递归）
+    - 函数体（不含 function 行）不超过 threshold 条指令
+    - 不使用 temp 1..7
+    """
+    n_vars = as_command(body[0][1])[2]
+    # 位置注释不计入指令数；展开后的代码归属调用点所在行
+    commands = [as_command(line) for _, line in body[1:]]
+    commands = [command for command in commands if command[0] != Op.LOCATION]
+
+    if len(commands) > threshold or _uses_high_temp(body):
+        return None
+
+    max_arg = -1
+    writes_pointer = set()
+    uses_static = False
+    for op, segment, index in commands:
+        if op == Op.CALL:
+            return None
+        if op in (Op.PUSH, Op.POP):
+            if segment == "argument":
+                max_arg = max(max_arg, index)
+            elif segment == "static":
+                uses_static = True
+            elif segment == "pointer" and op == Op.POP:
+                writes_pointer.add(index)
+
+    return {
+        "file_stem": body[0][0],
+        "n_vars": n_vars,
+        "min_args": max_arg + 1,
+        "writes_pointer": sorted(writes_pointer),
+        "uses_static": uses_static,
+        "commands": commands,
+    }
+
+
+def expand_call(info, n_args, file_stem):
+    """
+    生成一次调用点展开的 VM 指令元组（file_stem 为调用方所在文件）
+    """
+    global inline_counter
+    tag = f"INLINE{inline_counter}"
+    inline_counter += 1
+
+    n_vars = info["n_vars"]
+    arg_reg = FIRST_REG
+    local_reg = arg_reg + n_args
+    save_reg = local_reg + n_vars
+
+    out = []
+
+    # 实参已在栈顶：倒序弹出到寄存器
+    for i in reversed(range(n_args)):
+        out.append((Op.POP, "temp", arg_reg + i))
+
+    # 局部变量初始化为 0
+    for j in range(n_vars):
+        out.append((Op.PUSH, "constant", 0))
+        out.append((Op.POP, "temp", local_reg + j))
+
+    # 被调函数会改写 THIS / THAT，先保存调用方的值
+    saved = []
+    for k, pointer in enumerate(info["writes_pointer"]):
+        out.append((Op.PUSH, "pointer", pointer))
+        out.append((Op.POP, "temp", save_reg + k))
+        saved.append((pointer, save_reg + k))
+
+    end_label = f"{tag}.END"
+    commands = info["commands"]
+    need_end = False
+
+    for pos, command in enumerate(commands):
+        op, segment, index = command
+
+        if op == Op.RETURN:
+            # 返回值已在栈顶；最后一条 return 直接落到结尾
+            if pos != len(commands) - 1:
+                out.append((Op.GOTO, end_label, None))
+                need_end = True
+            continue
+
+        if op in LABEL_OPS:
+            out.append((op, f"{tag}.{segment}", None))
+            continue
+
+        if op in (Op.PUSH, Op.POP):
+            if segment == "argument":
+                out.append((op, "temp", arg_reg + index))
+                continue
+            if segment == "local":
+                out.append((op, "temp", local_reg + index))
+                continue
+
+        out.append(command)
+
+    if need_end:
+        out.append((Op.LABEL, end_label, None))
+
+    # 恢复调用方的 THIS / THAT，返回值仍留在栈顶
+    for pointer, reg in saved:
+        out.append((Op.PUSH, "temp", reg))
+        out.append((Op.POP, "pointer", pointer))
+
+    return [(file_stem, line) for line in out]
+
+
+def inline_functions(program, threshold=DEFAULT_THRESHOLD):
+    """
+    对整个程序做内联
+    返回 (新程序, {被内联函数名: 展开次数})
+    """
+    global inline_counter
+    # 每次从 0 编号：同样的输入得到同样的输出（增量构建按内容缓存翻译结果）
+    inline_counter = 0
+    chunks = split_functions(program)
+
+    candidates = {}
+    for name, body in chunks:
+        if name is None:
+            continue
+        info = analyze_candidate(body, threshold)
+        if info is not None:
+            candidates[name] = info
+
+    result = []
+    counts = {}
+    for name, body in chunks:
+        # 调用方自己用了 temp 1..7 时，展开会破坏它的值
+        if not candidates or _uses_high_temp(body):
+            result.extend(body)
+            continue
+
+        for file_stem, line in body:
+            op, callee, n_args = as_command(line)
+            if op != Op.CALL or callee not in candidates:
+                result.append((file_stem, line))
+                continue
+
+            info = candidates[callee]
+            fits = (
+                n_args >= info["min_args"]
+                and n_args + info["n_vars"] + len(info["writes_pointer"])
+                <= LAST_REG - FIRST_REG + 1
+                # static 段按文件命名，跨文件展开会指向调用方的 static
+                and (not info["uses_static"] or info["file_stem"] == file_stem)
+            )
+            if not fits:
+                result.append((file_stem, line))
+                continue
+
+            result.extend(expand_call(info, n_args, file_stem))
+            counts[callee] = counts.get(callee, 0) + 1
+
+    return result, counts
@@ -0,0 +1,83 @@
+# nand2tetris/vm/linker.py
+# 整程序链接阶段：基于 function / call 构建调用图，删除不可达函数
+
+# VM 程序在链接阶段的表示：
+#   program = [(file_stem, line), ...]
+# line 是一行 VM 文本或指令元组（见 commands.py，Jack 编译器直接产出元组）
+# file_stem 决定 static 段的符号名，因此必须跟随每一行
+
+from nand2tetris.vm.commands import Op, as_command
+
+
+def split_functions(program):
+    """
+    按 function 指令把程序切分为若干块
+    返回 [(func_name, [(file_stem, line), ...]), ...]
+    第一个 function 之前的指令归入 name=None 的块
+    """
+    chunks = []
+    name, body = None, []
+
+    for file_stem, line in program:
+        command = as_command(line)
+        if command[0] == Op.FUNCTION:
+            if body:
+                chunks.append((name, body))
+            name, body = command[1], []
+        body.append((file_stem, line))
+
+    if body:
+        chunks.append((name, body))
+    return chunks
+
+
+def build_call_graph(chunks, ignore=()):
+    """
+    调用图：func_name -> {被调用的函数名}
+    ignore: 不计入的被调用函数（例如翻译时改为内建例程的 Math.multiply）
+    """
+    graph = {}
+    for name, body in chunks:
+        callees = graph.setdefault(name, set())
+        for _, line in body:
+            command = as_command(line)
+            if command[0] == Op.CALL and command[1] not in ignore:
+                callees.add(command[1])
+    return graph
+
+
+def reachable_functions(graph, entry="Sys.init"):
+    """
+    从入口函数出发做深度优先遍历，返回所有可达函数名
+    """
+    seen = set()
+    stack = [entry]
+    while stack:
+        name = stack.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        stack.extend(graph.get(name, ()))
+    return seen
+
+
+def eliminate_dead_code(program, entry="Sys.init", ignore=()):
+    """
+    删除从 entry 不可达的函数（ignore 见 build_call_graph）
+    返回 (保留的程序, 被删除的块列表)
+    若程序中不存在 entry，则无法判断可达性，原样返回
+    """
+    chunks = split_functions(program)
+    graph = build_call_graph(chunks, ignore)
+    if entry not in graph:
+        return program, []
+
+    live = reachable_functions(graph, entry)
+    kept, removed = [], []
+    for name, body in chunks:
+        # 不属于任何函数的指令（name=None）总是保留
+        if name is None or name in live:
+            kept.extend(body)
+        else:
+            removed.append((name, body))
+    return kept, removed
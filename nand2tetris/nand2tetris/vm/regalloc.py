@@ -0,0 +1,221 @@
+# nand2tetris/vm/regalloc.py
+# 叶子函数的寄存器分配：把最常用的 local / argument 放进 temp 1..7
+#
+# 叶子函数不调用任何函数，执行期间不会有别的函数运行，
+# 因此所有叶子函数可以共享同一组固定寄存器。
+# 收益直接取 translator 模板的长度：
+# push local i   -> 7 条指令（i <= 1），8 条（i = 2），否则 9 条（基址 + 偏移）
+# push temp k    -> 6 条指令（直接地址）
+# pop local i    -> 6 条指令（i <= 1），i + 5 条（i <= 5），否则 12 条（经 R13 中转）
+# pop temp k     -> 5 条指令
+
+from nand2tetris.vm.commands import Op, as_command
+from nand2tetris.vm.linker import split_functions
+
+FIRST_REG = 1
+LAST_REG = 7
+
+# 循环内的访问按嵌套深度加权
+LOOP_WEIGHT = 8
+
+
+def _variable(command):
+    """
+    push/pop local|argument i 返回 (segment, i)，否则返回 None
+    """
+    op, segment, index = command
+    if op in (Op.PUSH, Op.POP) and segment in ("local", "argument"):
+        return segment, index
+    return None
+
+
+def access_saving(op, segment, index):
+    """
+    一次访问从基址段改为 temp 后节省的指令数
+    """
+    # translator 导入了本模块，延迟导入
+    from nand2tetris.vm import translator
+
+    if op == Op.PUSH:
+        return len(translator.translate_push_segment(segment, index)) - len(
+            translator.translate_push_temp(FIRST_REG)
+        )
+    return len(translator.translate_pop_segment(segment, index)) - len(
+        translator.translate_pop_temp(FIRST_REG)
+    )
+
+
+def init_cost(var):
+    """
+    入口处初始化一个寄存器的代价：local 置 0，argument 拷入（push / pop 融合后的指令数）
+    """
+    from nand2tetris.vm import translator
+
+    segment, index = var
+    source = (Op.PUSH, "constant", 0) if segment == "local" else (Op.PUSH, "argument", index)
+    return len(translator.translate_move(source, (Op.POP, "temp", FIRST_REG), ""))
+
+
+def build_cfg(commands):
+    """
+    VM 指令级控制流图：返回每条指令的后继下标列表
+    """
+    labels = {}
+    for i, (op, label, _) in enumerate(commands):
+        if op == Op.LABEL:
+            labels[label] = i
+
+    succ = []
+    for i, (op, label, _) in enumerate(commands):
+        nxt = [i + 1] if i + 1 < len(commands) else []
+        if op == Op.GOTO:
+            succ.append([labels[label]])
+        elif op == Op.IF_GOTO:
+            succ.append(nxt + [labels[label]])
+        elif op == Op.RETURN:
+            succ.append([])
+        else:
+            succ.append(nxt)
+    return succ, labels
+
+
+def live_at_entry(commands, succ):
+    """
+    反向数据流求活跃变量，返回函数入口处活跃的变量集合
+    （入口活跃 = 存在一条路径在写之前先读）
+    """
+    n = len(commands)
+    use = [set() for _ in range(n)]
+    defs = [set() for _ in range(n)]
+    for i, command in enumerate(commands):
+        var = _variable(command)
+        if var is not None:
+            (use if command[0] == Op.PUSH else defs)[i].add(var)
+
+    live_in = [set() for _ in range(n)]
+    changed = True
+    while changed:
+        changed = False
+        for i in reversed(range(n)):
+            out = set()
+            for s in succ[i]:
+                out |= live_in[s]
+            new_in = use[i] | (out - defs[i])
+            if new_in != live_in[i]:
+                live_in[i] = new_in
+                changed = True
+
+    return live_in[0] if n else set()
+
+
+def loop_depths(commands, labels):
+    """
+    以回边（跳转到前面的标签）界定循环区间，返回每条指令的循环嵌套深度
+    """
+    depth = [0] * len(commands)
+    for i, (op, label, _) in enumerate(commands):
+        if op in (Op.GOTO, Op.IF_GOTO):
+            target = labels[label]
+            if target <= i:
+                for k in range(target, i + 1):
+                    depth[k] += 1
+    return depth
+
+
+def allocate_function(body):
+    """
+    为单个叶子函数分配寄存器
+    返回 (新的函数体, {(segment, i): temp 下标})；不适用时映射为空
+    """
+    file_stem, header = body[0]
+    _, name, n_vars = as_command(header)
+    commands = [as_command(line) for _, line in body[1:]]
+
+    used_temps = set()
+    for op, segment, index in commands:
+        if op == Op.CALL:
+            return body, {}
+        if op in (Op.PUSH, Op.POP) and segment == "temp":
+            used_temps.add(index)
+
+    free = [r for r in range(FIRST_REG, LAST_REG + 1) if r not in used_temps]
+    if not free or not commands:
+        return body, {}
+
+    try:
+        succ, labels = build_cfg(commands)
+    except KeyError:
+        # 跳转到函数内不存在的标签，无法分析
+        return body, {}
+    entry_live = live_at_entry(commands, succ)
+    depth = loop_depths(commands, labels)
+
+    benefit = {}
+    for i, command in enumerate(commands):
+        var = _variable(command)
+        if var is None:
+            continue
+        saving = access_saving(command[0], *var)
+        benefit[var] = benefit.get(var, 0) + saving * LOOP_WEIGHT ** depth[i]
+
+    ranked = []
+    for var, gain in benefit.items():
+        cost = init_cost(var) if var in entry_live else 0
+        if gain > cost:
+            ranked.append((gain - cost, var))
+    ranked.sort(key=lambda item: (-item[0], item[1]))
+
+    mapping = {}
+    for (_, var), reg in zip(ranked, free):
+        mapping[var] = reg
+    if not mapping:
+        return body, {}
+
+    # 未分配到寄存器的 local 重新紧凑编号，栈帧随之缩小
+    renumber = {}
+    for i in range(n_vars):
+        if ("local", i) not in mapping:
+            renumber[i] = len(renumber)
+
+    out = [(Op.FUNCTION, name, len(renumber))]
+
+    # 入口处活跃的变量需要初始化：local 置 0，argument 拷入寄存器
+    for var, reg in sorted(mapping.items(), key=lambda item: item[1]):
+        if var not in entry_live:
+            continue
+        if var[0] == "local":
+            out.append((Op.PUSH, "constant", 0))
+        else:
+            out.append((Op.PUSH, "argument", var[1]))
+        out.append((Op.POP, "temp", reg))
+
+    for command in commands:
+        var = _variable(command)
+        if var is None:
+            out.append(command)
+        elif var in mapping:
+            out.append((command[0], "temp", mapping[var]))
+        elif var[0] == "local" and var[1] in renumber:
+            out.append((command[0], "local", renumber[var[1]]))
+        else:
+            out.append(command)
+
+    return [(file_stem, command) for command in out], mapping
+
+
+def allocate_registers(program):
+    """
+    对程序中所有叶子函数做寄存器分配
+    返回 (新程序, {函数名: {(segment, i): temp 下标}})
+    """
+    result = []
+    report = {}
+    for name, body in split_functions(program):
+        if name is None:
+            result.extend(body)
+            continue
+        new_body, mapping = allocate_function(body)
+        result.extend(new_body)
+        if mapping:
+            report[name] = mapping
+    return result, report
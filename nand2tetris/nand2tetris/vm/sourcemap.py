@@ -0,0 +1,88 @@
+# nand2tetris/vm/sourcemap.py
+# 源码映射：ROM 地址 -> (VM 指令, 所在 VM 函数, Jack 源码位置)
+#
+# Jack 编译器（--source-map）在 VM 中写入位置注释：
+#   // @Main.jack:12
+# 之后的指令都属于该行，直到下一个位置注释或下一个 function。
+#
+# 映射文件（.map.json）：
+#   entries    去重后的 [VM 指令, 函数名, "File.jack:行号" 或 null]
+#   rom        每个 ROM 字对应的 entries 下标
+#   functions  函数名 -> 入口地址
+#   calls      执行 call 跳转（0;JMP）的 ROM 地址
+#   returns    执行 return 跳转的 ROM 地址
+# 分析器据此在运行时维护调用栈。
+
+import json
+
+LOCATION_PREFIX = "// @"
+
+
+def is_location(line: str) -> bool:
+    return line.startswith(LOCATION_PREFIX)
+
+
+def parse_location(line: str) -> str:
+    return line[len(LOCATION_PREFIX):].strip()
+
+
+class SourceMap:
+    def __init__(self):
+        self.entries = []
+        self.index = {}
+        self.rom = []
+        self.functions = {}
+        self.calls = []
+        self.returns = []
+
+    def add(self, asm_lines, command, function, location):
+        """
+        记录一条 VM 指令（或融合后的指令对）生成的汇编
+        command 为 "call ..." / "bootstrap" 时，最后一个 ROM 字是调用跳转
+        """
+        key = (command, function, location)
+        entry = self.index.get(key)
+        if entry is None:
+            entry = self.index[key] = len(self.entries)
+            self.entries.append(key)
+
+        start = len(self.rom)
+        for asm in asm_lines:
+            if not asm.startswith("("):
+                self.rom.append(entry)
+
+        kind = command.split()[0]
+        if kind == "function":
+            # 没有局部变量的函数不占 ROM 字，入口即下一条指令
+            self.functions[command.split()[1]] = start
+        elif len(self.rom) == start:
+            return
+        elif kind in ("call", "bootstrap"):
+            self.calls.append(len(self.rom) - 1)
+        elif kind == "return":
+            self.returns.append(len(self.rom) - 1)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "entries": [list(entry) for entry in self.entries],
+            "rom": self.rom,
+            "functions": self.functions,
+            "calls": self.calls,
+            "returns": self.returns,
+        })
+
+    def save(self, path):
+        with open(path, "w") as f:
+            f.write(self.to_json())
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        source_map = cls()
+        source_map.entries = [tuple(entry) for entry in data["entries"]]
+        source_map.rom = data["rom"]
+        source_map.functions = data["functions"]
+        source_map.calls = data["calls"]
+        source_map.returns = data["returns"]
+        return source_map
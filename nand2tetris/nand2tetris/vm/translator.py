@@ -1,9 +1,18 @@
 # nand2tetris/vm/translator.py
 # Project 7: VM Translator（第一阶段）
 
+import functools
 import sys
 from pathlib import Path
 
+from nand2tetris.vm.commands import Op, as_command, format_command, parse_command
+from nand2tetris.vm.inliner import DEFAULT_THRESHOLD, inline_functions
+from nand2tetris.vm.linker import (
+    build_call_graph, eliminate_dead_code, reachable_functions, split_functions,
+)
+from nand2tetris.vm.regalloc import allocate_registers
+from nand2tetris.vm.sourcemap import LOCATION_PREFIX, SourceMap
+
 # VM 内存段到 Hack 基地址寄存器的映射
 SEGMENT_BASE = {
     "local": "LCL",
@@ -14,6 +23,55 @@ SEGMENT_BASE = {
 
 label_counter = 0
 call_counter = 0
+# 当前所在函数名：label / goto / if-goto 的标签作用域限定在函数内
+current_function = ""
+# 比较 / 调用生成的标签前缀：按文件分片翻译时为 "<file>$"，各片的标签互不冲突
+label_prefix = ""
+# 常量大小的 Memory.alloc 是否改为内联的 bump 分配（由 link_program 在确认安全后打开）
+bump_alloc = False
+# call Math.multiply 2 / call Math.divide 2 是否改为跳到共享的内建例程（由 link_program 打开）
+intrinsic_calls = False
+
+
+# 下标不超过该值时，用 A=M+1 / A=A+1 链直接算地址，不经过 D / R13
+PUSH_INLINE_INDEX = 2
+POP_INLINE_INDEX = 5
+
+
+def push_d() -> list[str]:
+    """
+    *SP = D; SP++（SP 自增后 A 回退一格写入）
+    """
+    return [
+        "@SP",
+        "AM=M+1",
+        "A=A-1",
+        "M=D",
+    ]
+
+
+def pop_d() -> list[str]:
+    """
+    SP--; D = *SP
+    """
+    return [
+        "@SP",
+        "AM=M-1",
+        "D=M",
+    ]
+
+
+def segment_address(base: str, index: int) -> list[str]:
+    """
+    A = base + index，不使用 D（小下标专用）
+    """
+    asm = [f"@{base}"]
+    if index == 0:
+        asm.append("A=M")
+    else:
+        asm.append("A=M+1")
+        asm.extend(["A=A+1"] * (index - 1))
+    return asm
 
 
 def translate_push_segment(segment: str, index: int) -> list[str]:
@@ -24,20 +82,19 @@ def translate_push_segment(segment: str, index: int) -> list[str]:
     """
     base = SEGMENT_BASE[segment]
 
-    return [
-        f"@{index}",
-        "D=A",
-        f"@{base}",
-        "A=M+D",   # A = base + index
-        "D=M",     # D = segment[index]
-
-        "@SP",
-        "A=M",
-        "M=D",     # *SP = D
+    if index <= PUSH_INLINE_INDEX:
+        address = segment_address(base, index)
+    else:
+        address = [
+            f"@{index}",
+            "D=A",
+            f"@{base}",
+            "A=D+M",   # A = base + index
+        ]
 
-        "@SP",
-        "M=M+1",   # SP++
-    ]
+    return address + [
+        "D=M",     # D = segment[index]
+    ] + push_d()
 def translate_pop_segment(segment: str, index: int) -> list[str]:
     """
     翻译：
@@ -45,19 +102,20 @@ def translate_pop_segment(segment: str, index: int) -> list[str]:
     """
     base = SEGMENT_BASE[segment]
 
+    if index <= POP_INLINE_INDEX:
+        # 先弹出到 D，再直接算目标地址，无需 R13 中转
+        return pop_d() + segment_address(base, index) + [
+            "M=D",     # segment[index] = 栈顶值
+        ]
+
     return [
         f"@{index}",
         "D=A",
         f"@{base}",
-        "D=M+D",   # D = base + index
+        "D=D+M",   # D = base + index
         "@R13",
         "M=D",     # R13 = 目标地址
-
-        "@SP",
-        "M=M-1",   # SP--
-        "A=M",
-        "D=M",     # D = 栈顶值
-
+    ] + pop_d() + [
         "@R13",
         "A=M",
         "M=D",     # segment[index] = 栈顶值
@@ -70,15 +128,19 @@ def translate_push_constant(value: int) -> list[str]:
 
     返回对应的 Hack 汇编指令列表
     """
+    if value in (0, 1):
+        # ALU 可直接产生 0 / 1，不必经过 D
+        return [
+            "@SP",
+            "AM=M+1",
+            "A=A-1",
+            f"M={value}",
+        ]
+
     return [
         f"@{value}",   # A = value
         "D=A",         # D = value
-        "@SP",         # A = SP
-        "A=M",         # A = *SP（栈顶）
-        "M=D",         # *SP = value
-        "@SP",
-        "M=M+1",       # SP++
-    ]
+    ] + push_d()
 
 def translate_add() -> list[str]:
     """
@@ -94,7 +156,7 @@ def translate_add() -> list[str]:
         "@SP",
         "M=M-1",
         "A=M",
-        "M=M+D",   # y = y + x
+        "M=D+M",   # y = y + x
 
         "@SP",
         "M=M+1",   # SP++
@@ -146,7 +208,7 @@ def translate_and() -> list[str]:
         "@SP",
         "M=M-1",
         "A=M",
-        "M=M&D",   # y = y & x
+        "M=D&M",   # y = y & x
 
         "@SP",
         "M=M+1",
@@ -165,7 +227,7 @@ def translate_or() -> list[str]:
         "@SP",
         "M=M-1",
         "A=M",
-        "M=M|D",   # y = y | x
+        "M=D|M",   # y = y | x
 
         "@SP",
         "M=M+1",
@@ -194,8 +256,8 @@ def translate_compare(jump: str) -> list[str]:
     idx = label_counter
     label_counter += 1
 
-    true_label = f"TRUE_{idx}"
-    end_label = f"END_{idx}"
+    true_label = f"{label_prefix}TRUE_{idx}"
+    end_label = f"{label_prefix}END_{idx}"
 
     return [
         # 弹出 x
@@ -241,6 +303,17 @@ def translate_gt() -> list[str]:
 def translate_lt() -> list[str]:
     return translate_compare("JLT")
 
+def direct_address(segment: str, index: int, file_stem: str) -> str:
+    """
+    temp / pointer / static 段是固定地址，返回对应的汇编符号
+    """
+    if segment == "temp":
+        return str(5 + index)
+    if segment == "pointer":
+        return "THIS" if index == 0 else "THAT"
+    return f"{file_stem}.{index}"
+
+
 def translate_push_temp(index: int) -> list[str]:
     """
     temp 段：RAM[5 + index]
@@ -249,25 +322,13 @@ def translate_push_temp(index: int) -> list[str]:
     return [
         f"@{addr}",
         "D=M",
-
-        "@SP",
-        "A=M",
-        "M=D",
-
-        "@SP",
-        "M=M+1",
-    ]
+    ] + push_d()
 def translate_pop_temp(index: int) -> list[str]:
     """
     temp 段：RAM[5 + index]
     """
     addr = 5 + index
-    return [
-        "@SP",
-        "M=M-1",
-        "A=M",
-        "D=M",
-
+    return pop_d() + [
         f"@{addr}",
         "M=D",
     ]
@@ -276,22 +337,10 @@ def translate_push_pointer(index: int) -> list[str]:
     return [
         f"@{base}",
         "D=M",
-
-        "@SP",
-        "A=M",
-        "M=D",
-
-        "@SP",
-        "M=M+1",
-    ]
+    ] + push_d()
 def translate_pop_pointer(index: int) -> list[str]:
     base = "THIS" if index == 0 else "THAT"
-    return [
-        "@SP",
-        "M=M-1",
-        "A=M",
-        "D=M",
-
+    return pop_d() + [
         f"@{base}",
         "M=D",
     ]
@@ -300,49 +349,140 @@ def translate_push_static(file_stem: str, index: int) -> list[str]:
     return [
         f"@{symbol}",
         "D=M",
+    ] + push_d()
+def translate_pop_static(file_stem: str, index: int) -> list[str]:
+    symbol = f"{file_stem}.{index}"
+    return pop_d() + [
+        f"@{symbol}",
+        "M=D",
+    ]
+
 
+def translate_move(push: tuple, pop: tuple, file_stem: str) -> list[str] | None:
+    """
+    融合相邻的指令元组
+        push <src> i
+        pop  <dst> j
+    为一次直接搬运，不经过栈（SP 不变）
+    例如 push argument 0 / pop pointer 0 -> @ARG / A=M / D=M / @THIS / M=D
+
+    无法融合时返回 None，由调用方逐条翻译
+    """
+    if push[0] != Op.PUSH or pop[0] != Op.POP:
+        return None
+
+    _, src_segment, src_index = push
+    _, dst_segment, dst_index = pop
+
+    # 目标地址：大下标的基址段需要 D 参与计算，不融合
+    if dst_segment in SEGMENT_BASE:
+        if dst_index > POP_INLINE_INDEX:
+            return None
+        store_address = segment_address(SEGMENT_BASE[dst_segment], dst_index)
+    elif dst_segment in ("temp", "pointer", "static"):
+        store_address = [f"@{direct_address(dst_segment, dst_index, file_stem)}"]
+    else:
+        return None
+
+    # 常量 0 / 1 直接写入内存
+    if src_segment == "constant" and src_index in (0, 1):
+        return store_address + [f"M={src_index}"]
+
+    if src_segment == "constant":
+        load = [f"@{src_index}", "D=A"]
+    elif src_segment in SEGMENT_BASE:
+        load = translate_push_segment(src_segment, src_index)[:-len(push_d())]
+    elif src_segment in ("temp", "pointer", "static"):
+        load = [f"@{direct_address(src_segment, src_index, file_stem)}", "D=M"]
+    else:
+        return None
+
+    return load + store_address + ["M=D"]
+
+
+# 函数序言的代价模型：cost = ROM 字数 * 权重 + 每次调用执行的周期数 * 权重
+# ROM 是全程序共享的硬上限（32K），每个字的权重高于单次调用的一个周期
+PROLOGUE_ROM_WEIGHT = 4
+PROLOGUE_CYCLE_WEIGHT = 1
+
+
+def prologue_unrolled(n_vars: int) -> list[str]:
+    """
+    展开式序言：A 始终指向当前局部变量，逐个写 0，最后一次性更新 SP
+    ROM 字数 = 执行周期 = 2 * n_vars + 4（n_vars = 1 时为 4）
+    """
+    if n_vars == 0:
+        return []
+    if n_vars == 1:
+        return [
+            "@SP",
+            "AM=M+1",
+            "A=A-1",
+            "M=0",
+        ]
+
+    asm = [
         "@SP",
         "A=M",
+        "M=0",
+    ]
+    for _ in range(n_vars - 1):
+        asm.extend([
+            "A=A+1",
+            "M=0",
+        ])
+    asm.extend([
+        "D=A+1",   # D = SP + n_vars
+        "@SP",
         "M=D",
+    ])
+    return asm
 
-        "@SP",
-        "M=M+1",
-    ]
-def translate_pop_static(file_stem: str, index: int) -> list[str]:
-    symbol = f"{file_stem}.{index}"
+
+def prologue_loop(name: str, n_vars: int) -> list[str]:
+    """
+    循环式序言：D 作为计数器，每轮压入一个 0
+    ROM 字数 = 9，执行周期 = 7 * n_vars + 2
+    """
+    loop_label = f"{name}$INIT_LOCALS"
     return [
+        f"@{n_vars}",
+        "D=A",
+        f"({loop_label})",
         "@SP",
-        "M=M-1",
-        "A=M",
-        "D=M",
-
-        f"@{symbol}",
-        "M=D",
+        "AM=M+1",
+        "A=A-1",
+        "M=0",
+        "D=D-1",
+        f"@{loop_label}",
+        "D;JGT",
     ]
 
 
+def prologue_cost(rom_words: int, cycles: int) -> int:
+    return rom_words * PROLOGUE_ROM_WEIGHT + cycles * PROLOGUE_CYCLE_WEIGHT
+
+
 def translate_function(name: str, n_vars: int) -> list[str]:
     """
     翻译：
         function f nVars
     """
+    global current_function
+    current_function = name
+
     asm = [
         f"({name})"  # 函数入口标签
     ]
 
-    # 初始化 n_vars 个局部变量为 0
-    for _ in range(n_vars):
-        asm.extend([
-            "@0",
-            "D=A",
-
-            "@SP",
-            "A=M",
-            "M=D",
-
-            "@SP",
-            "M=M+1",
-        ])
+    # 初始化 n_vars 个局部变量为 0：按代价模型在展开式和循环式之间选择
+    unrolled = prologue_unrolled(n_vars)
+    unrolled_words = len(unrolled)
+    loop_cost = prologue_cost(9, 7 * n_vars + 2)
+    if n_vars > 0 and loop_cost < prologue_cost(unrolled_words, unrolled_words):
+        asm.extend(prologue_loop(name, n_vars))
+    else:
+        asm.extend(unrolled)
 
     return asm
 def translate_return() -> list[str]:
@@ -419,7 +559,7 @@ def translate_call(func_name: str, n_args: int) -> list[str]:
         call f nArgs
     """
     global call_counter
-    ret_label = f"RETURN_LABEL_{call_counter}"
+    ret_label = f"{label_prefix}RETURN_LABEL_{call_counter}"
     call_counter += 1
 
     asm = [
@@ -474,12 +614,22 @@ def translate_call(func_name: str, n_args: int) -> list[str]:
 
     return asm
 
+def scoped_label(label: str) -> str:
+    """
+    VM 标签的作用域是函数：label L 在函数 f 中对应汇编标签 f$L
+    否则不同类中同名的 IF_TRUE0 / WHILE_EXP0 链接后会互相覆盖
+    """
+    if current_function:
+        return f"{current_function}${label}"
+    return label
+
+
 def translate_label(label: str) -> list[str]:
     """
     翻译：
         label LABEL_NAME
     """
-    return [f"({label})"]
+    return [f"({scoped_label(label)})"]
 
 
 def translate_goto(label: str) -> list[str]:
@@ -488,7 +638,7 @@ def translate_goto(label: str) -> list[str]:
         goto LABEL_NAME
     """
     return [
-        f"@{label}",
+        f"@{scoped_label(label)}",
         "0;JMP",
     ]
 
@@ -504,7 +654,7 @@ def translate_if_goto(label: str) -> list[str]:
         "M=M-1",   # SP--
         "A=M",
         "D=M",     # D = 栈顶值
-        f"@{label}",
+        f"@{scoped_label(label)}",
         "D;JNE",   # 如果 D != 0 则跳转
     ]
 
@@ -525,101 +675,558 @@ def bootstrap_code() -> list[str]:
 
 
 
+# 算术 / 逻辑指令 -> 翻译函数（比较指令每次调用都会生成新标签）
+ARITHMETIC_TRANSLATORS = {
+    "add": translate_add,
+    "sub": translate_sub,
+    "neg": translate_neg,
+    "and": translate_and,
+    "or": translate_or,
+    "not": translate_not,
+    "eq": translate_eq,
+    "gt": translate_gt,
+    "lt": translate_lt,
+}
+
+
+# bump 分配：每次向 Memory.alloc 申请 BUMP_CHUNK 个字，再在块内按对象大小切分
+# 只对不超过 BUMP_MAX_SIZE 的常量大小启用，块尾浪费的空间有上界
+BUMP_CHUNK = 256
+BUMP_MAX_SIZE = 16
+BUMP_ALLOC = "Memory.alloc"
+
+
+def translate_bump_alloc(size: int) -> list[str]:
+    """
+    翻译（常量大小的对象分配）：
+        push constant size
+        call Memory.alloc 1
+    当前块足够时直接切分（约 20 条指令，没有 call / return）；
+    不够时跳到共享的 $bump.refill 申请新块，返回后重试
+    """
+    global label_counter
+    idx = label_counter
+    label_counter += 1
+
+    retry_label = f"{label_prefix}BUMP_{idx}"
+    ok_label = f"{label_prefix}BUMP_OK_{idx}"
+
+    return [
+        f"({retry_label})",
+        # D = ptr + size - end
+        "@$bump.ptr",
+        "D=M",
+        f"@{size}",
+        "D=D+A",
+        "@$bump.end",
+        "D=D-M",
+        f"@{ok_label}",
+        "D;JLE",
+
+        # 块不够：$bump.refill 完成后回到 retry_label
+        f"@{retry_label}",
+        "D=A",
+        "@$bump.ret",
+        "M=D",
+        "@$bump.refill",
+        "0;JMP",
+
+        # push ptr; ptr += size
+        f"({ok_label})",
+        "@$bump.ptr",
+        "D=M",
+    ] + push_d() + [
+        f"@{size}",
+        "D=A",
+        "@$bump.ptr",
+        "M=D+M",
+    ]
+
+
+def bump_refill_code() -> tuple[list[str], list[str]]:
+    """
+    共享的块分配例程：ptr = Memory.alloc(BUMP_CHUNK); end = ptr + BUMP_CHUNK
+    返回 (到 call 为止的部分, 其余部分)，分开是为了让源码映射记录 call 的位置
+    """
+    call = ["($bump.refill)"] + translate_push_constant(BUMP_CHUNK) + translate_call(BUMP_ALLOC, 1)
+    rest = pop_d() + [
+        "@$bump.ptr",
+        "M=D",
+        f"@{BUMP_CHUNK}",
+        "D=D+A",
+        "@$bump.end",
+        "M=D",
+        "@$bump.ret",
+        "A=M",
+        "0;JMP",
+    ]
+    return call, rest
+
+
+def bump_size(command: tuple, following: tuple):
+    """
+    command / following 是可以 bump 分配的一对指令时返回对象大小，否则返回 None
+    """
+    if (
+        command[0] == Op.PUSH and command[1] == "constant" and 0 < command[2] <= BUMP_MAX_SIZE
+        and following == (Op.CALL, BUMP_ALLOC, 1)
+    ):
+        return command[2]
+    return None
+
+
+# 乘除法内建例程：直接在栈顶的两个值上运算，不建立栈帧
+# 调用点只保存返回地址再跳转（6 个字），例程整个程序共享一份
+INTRINSICS = {
+    ("Math.multiply", 2): "$math.mul",
+    ("Math.divide", 2): "$math.div",
+}
+# 内建后不再被调用的函数（除法在除数为 0、操作数为 -32768 时仍调用 Math.divide）
+INTRINSIC_ONLY = ("Math.multiply",)
+
+
+def translate_intrinsic(routine: str) -> list[str]:
+    """
+    翻译（乘除法调用）：
+        call Math.multiply 2 / call Math.divide 2
+    保存返回地址到 <routine>.ret，跳到共享例程
+    """
+    global label_counter
+    ret_label = f"{label_prefix}{routine[len('$math.'):].upper()}_RET_{label_counter}"
+    label_counter += 1
+
+    return [
+        f"@{ret_label}",
+        "D=A",
+        f"@{routine}.ret",
+        "M=D",
+        f"@{routine}",
+        "0;JMP",
+        f"({ret_label})",
+    ]
+
+
+def multiply_code() -> list[str]:
+    """
+    共享的乘法例程：栈顶 x, y -> x * y（模 2^16，与 Math.multiply 相同）
+    逐位移位相加；y 剩下的高位全为 0 时提前结束，小乘数只需几轮
+    """
+    return [
+        "($math.mul)",
+        # b = y（弹出），a = x
+        "@SP",
+        "AM=M-1",
+        "D=M",
+        "@$math.b",
+        "M=D",
+        "@SP",
+        "A=M-1",
+        "D=M",
+        "@$math.a",
+        "M=D",
+        "@$math.r",
+        "M=0",
+        "@$math.bit",
+        "M=1",
+
+        "($math.mul.loop)",
+        # b & bit 非 0 时 r += a
+        "@$math.b",
+        "D=M",
+        "@$math.bit",
+        "D=D&M",
+        "@$math.mul.next",
+        "D;JEQ",
+        "@$math.a",
+        "D=M",
+        "@$math.r",
+        "M=D+M",
+        "($math.mul.next)",
+        # a <<= 1; bit <<= 1; 直到 b & -bit == 0（bit 移出第 15 位后为 0）
+        "@$math.a",
+        "D=M",
+        "M=D+M",
+        "@$math.bit",
+        "D=M",
+        "MD=D+M",
+        "D=-D",
+        "@$math.b",
+        "D=D&M",
+        "@$math.mul.loop",
+        "D;JNE",
+
+        # 栈顶 = r
+        "@$math.r",
+        "D=M",
+        "@SP",
+        "A=M-1",
+        "M=D",
+        "@$math.mul.ret",
+        "A=M",
+        "0;JMP",
+    ]
+
+
+def divide_code() -> tuple[list[str], list[str], list[str]]:
+    """
+    共享的除法例程：栈顶 x, y -> x / y（向 0 取整，与 Math.divide 相同）
+    对 |x|、|y| 做 16 轮移位相减，最后按符号取反
+    y == 0（报错）或 x、y 为 -32768（取绝对值会溢出）时照常调用 Math.divide
+    返回 (例程, 到 call 为止的退回部分, 其余部分)，分开是为了让源码映射记录 call 的位置
+    """
+    routine = [
+        "($math.div)",
+        # b = y；y & -y 为 0 说明 y == 0，为负说明 y == -32768
+        "@SP",
+        "A=M-1",
+        "D=M",
+        "@$math.b",
+        "M=D",
+        "D=-D",
+        "D=D&M",
+        "@$math.div.call",
+        "D;JLE",
+        # a = x；x & -x 为负说明 x == -32768
+        "@SP",
+        "A=M-1",
+        "A=A-1",
+        "D=M",
+        "@$math.a",
+        "M=D",
+        "D=-D",
+        "D=D&M",
+        "@$math.div.call",
+        "D;JLT",
+
+        # 取绝对值，sign 记录结果是否为负
+        "@$math.sign",
+        "M=0",
+        "@$math.a",
+        "D=M",
+        "@$math.div.a",
+        "D;JGE",
+        "@$math.a",
+        "M=-M",
+        "@$math.sign",
+        "M=!M",
+        "($math.div.a)",
+        "@$math.b",
+        "D=M",
+        "@$math.div.b",
+        "D;JGE",
+        "@$math.b",
+        "M=-M",
+        "@$math.sign",
+        "M=!M",
+        "($math.div.b)",
+        "@$math.r",
+        "M=0",
+        "@$math.m",
+        "M=0",
+        "@$math.bit",
+        "M=1",
+
+        "($math.div.loop)",
+        # m = 2m + a 的最高位；a <<= 1；r <<= 1
+        "@$math.m",
+        "D=M",
+        "M=D+M",
+        "@$math.a",
+        "D=M",
+        "M=D+M",
+        "@$math.div.shift",
+        "D;JGE",
+        "@$math.m",
+        "M=M+1",
+        "($math.div.shift)",
+        "@$math.r",
+        "D=M",
+        "M=D+M",
+        # m >= b 时 m -= b，r += 1（m 溢出为负时按无符号数一定 >= b）
+        "@$math.m",
+        "D=M",
+        "@$math.div.sub",
+        "D;JLT",
+        "@$math.b",
+        "D=D-M",
+        "@$math.div.next",
+        "D;JLT",
+        "($math.div.sub)",
+        "@$math.b",
+        "D=M",
+        "@$math.m",
+        "M=M-D",
+        "@$math.r",
+        "M=M+1",
+        "($math.div.next)",
+        "@$math.bit",
+        "D=M",
+        "MD=D+M",
+        "@$math.div.loop",
+        "D;JNE",
+
+        "@$math.sign",
+        "D=M",
+        "@$math.div.end",
+        "D;JEQ",
+        "@$math.r",
+        "M=-M",
+        "($math.div.end)",
+        # 弹出 y，栈顶 = r
+        "@$math.r",
+        "D=M",
+        "@SP",
+        "AM=M-1",
+        "A=A-1",
+        "M=D",
+        "@$math.div.ret",
+        "A=M",
+        "0;JMP",
+    ]
+
+    # 退回 Math.divide：x, y -> ret, x, y，返回地址压在参数下面，
+    # Math.divide 内部的除法可以重入本例程
+    call = [
+        "($math.div.call)",
+        "@SP",
+        "A=M-1",
+        "D=M",
+        "@SP",
+        "A=M",
+        "M=D",
+        "@SP",
+        "A=M-1",
+        "A=A-1",
+        "D=M",
+        "@SP",
+        "A=M-1",
+        "M=D",
+        "@$math.div.ret",
+        "D=M",
+        "@SP",
+        "A=M-1",
+        "A=A-1",
+        "M=D",
+        "@SP",
+        "M=M+1",
+    ] + translate_call("Math.divide", 2)
+    # ret, q -> q，跳回 ret
+    rest = [
+        "@SP",
+        "AM=M-1",
+        "D=M",
+        "@R13",
+        "M=D",
+        "@SP",
+        "A=M-1",
+        "D=M",
+        "@R14",
+        "M=D",
+        "@R13",
+        "D=M",
+        "@SP",
+        "A=M-1",
+        "M=D",
+        "@R14",
+        "A=M",
+        "0;JMP",
+    ]
+    return routine, call, rest
+
+
 def translate_line(line: str, file_stem: str) -> list[str]:
-    parts = line.split()
-    command = parts[0]
-
-    # 1. 算术 / 逻辑指令（1个单词）
-    if command in ("add", "sub", "neg", "and", "or", "not", "eq", "gt", "lt"):
-        if command == "add":
-            return translate_add()
-        if command == "sub":
-            return translate_sub()
-        if command == "neg":
-            return translate_neg()
-        if command == "and":
-            return translate_and()
-        if command == "or":
-            return translate_or()
-        if command == "not":
-            return translate_not()
-        if command == "eq":
-            return translate_eq()
-        if command == "gt":
-            return translate_gt()
-        if command == "lt":
-            return translate_lt()
-
-    # 2. return 指令（1个单词）
-    if command == "return":
+    return translate_command(parse_command(line), file_stem)
+
+
+def translate_command(command: tuple, file_stem: str) -> list[str]:
+    """
+    翻译一条指令元组 (opcode, arg1, arg2)，见 vm/commands.py
+    """
+    op, arg1, arg2 = command
+
+    # 1. 算术 / 逻辑指令
+    if op == Op.ARITHMETIC:
+        return ARITHMETIC_TRANSLATORS[arg1]()
+
+    # 2. push/pop 指令
+    if op == Op.PUSH:
+        if arg1 == "constant":
+            return translate_push_constant(arg2)
+        if arg1 in SEGMENT_BASE:
+            return translate_push_segment(arg1, arg2)
+        if arg1 == "temp":
+            return translate_push_temp(arg2)
+        if arg1 == "pointer":
+            return translate_push_pointer(arg2)
+        if arg1 == "static":
+            return translate_push_static(file_stem, arg2)
+
+    if op == Op.POP:
+        if arg1 in SEGMENT_BASE:
+            return translate_pop_segment(arg1, arg2)
+        if arg1 == "temp":
+            return translate_pop_temp(arg2)
+        if arg1 == "pointer":
+            return translate_pop_pointer(arg2)
+        if arg1 == "static":
+            return translate_pop_static(file_stem, arg2)
+
+    # 3. 程序流程指令
+    if op == Op.LABEL:
+        return translate_label(arg1)
+    if op == Op.GOTO:
+        return translate_goto(arg1)
+    if op == Op.IF_GOTO:
+        return translate_if_goto(arg1)
+
+    # 4. 函数指令
+    if op == Op.FUNCTION:
+        return translate_function(arg1, arg2)
+    if op == Op.CALL:
+        return translate_call(arg1, arg2)
+    if op == Op.RETURN:
         return translate_return()
 
-    # 3. label 指令（2个单词）
-    if command == "label":
-        if len(parts) < 2:
-            raise ValueError(f"Unsupported VM instruction: {line}")
-        label_name = parts[1]
-        return translate_label(label_name)
-
-    # 4. goto 指令（2个单词）
-    if command == "goto":
-        if len(parts) < 2:
-            raise ValueError(f"Unsupported VM instruction: {line}")
-        label_name = parts[1]
-        return translate_goto(label_name)
-
-    # 5. if-goto 指令（2个单词）
-    if command == "if-goto":
-        if len(parts) < 2:
-            raise ValueError(f"Unsupported VM instruction: {line}")
-        label_name = parts[1]
-        return translate_if_goto(label_name)
-
-    # 6. 内存访问和函数调用指令（3个单词）
-    if len(parts) < 3:
-        raise ValueError(f"Unsupported VM instruction: {line}")
-
-    segment = parts[1]
-    index_or_count = int(parts[2])
-
-    # push/pop 指令
-    if command == "push":
-        if segment == "constant":
-            return translate_push_constant(index_or_count)
-        if segment in SEGMENT_BASE:
-            return translate_push_segment(segment, index_or_count)
-        if segment == "temp":
-            return translate_push_temp(index_or_count)
-        if segment == "pointer":
-            return translate_push_pointer(index_or_count)
-        if segment == "static":
-            return translate_push_static(file_stem, index_or_count)
-
-    if command == "pop":
-        if segment in SEGMENT_BASE:
-            return translate_pop_segment(segment, index_or_count)
-        if segment == "temp":
-            return translate_pop_temp(index_or_count)
-        if segment == "pointer":
-            return translate_pop_pointer(index_or_count)
-        if segment == "static":
-            return translate_pop_static(file_stem, index_or_count)
-
-    # function/call 指令
-    if command == "function":
-        func_name = parts[1]
-        n_vars = int(parts[2])
-        return translate_function(func_name, n_vars)
-
-    if command == "call":
-        func_name = parts[1]
-        n_args = int(parts[2])
-        return translate_call(func_name, n_args)
-
-    raise ValueError(f"Unsupported VM instruction: {line}")
+    raise ValueError(f"Unsupported VM instruction: {format_command(command)}")
+
+
+def translate_program(program, source_map=None) -> list[str]:
+    """
+    翻译 [(file_stem, line), ...]，每行只解析一次，见 translate_commands
+    line 可以是 VM 文本或指令元组，元组原样传下去
+    """
+    return translate_commands(
+        [(file_stem, as_command(line)) for file_stem, line in program], source_map
+    )
+
+
+def translate_commands(program, source_map=None) -> list[str]:
+    """
+    翻译 [(file_stem, 指令元组), ...]，相邻的 push / pop 尽量融合为直接搬运
+
+    source_map: 可选的 SourceMap，记录每个 ROM 字来自哪条 VM 指令和 Jack 源码行
+    （位置来自 Op.LOCATION，即 "// @File.jack:行号" 注释）
+    """
+    asm = []
+    location = None
+    i = 0
+    while i < len(program):
+        file_stem, command = program[i]
+        op = command[0]
+        if op == Op.LOCATION:
+            location = command[1]
+            i += 1
+            continue
+        if op == Op.FUNCTION:
+            location = None
+
+        code = None
+        fused = None
+        routine = INTRINSICS.get(command[1:]) if intrinsic_calls and op == Op.CALL else None
+        if routine is not None:
+            code = translate_intrinsic(routine)
+        elif op == Op.PUSH and i + 1 < len(program) and program[i + 1][0] == file_stem:
+            following = program[i + 1][1]
+            size = bump_size(command, following) if bump_alloc else None
+            if size is not None:
+                code = translate_bump_alloc(size)
+            else:
+                code = translate_move(command, following, file_stem)
+            if code is not None:
+                fused = following
+                i += 1
+        if code is None:
+            code = translate_command(command, file_stem)
+        i += 1
+
+        asm.extend(code)
+        if source_map is not None:
+            text = format_command(command)
+            if routine is not None:
+                # 不是真正的 call：分析器不在这里压栈
+                text = f"intrinsic {command[1]}"
+            if fused is not None:
+                text = f"{text}; {format_command(fused)}"
+            source_map.add(code, text, current_function or None, location)
+    return asm
+
 
+def translate_fragment(program, prefix: str) -> list[str]:
+    """
+    独立翻译一段程序（通常是一个文件的全部函数）：计数器从 0 开始，标签加 prefix
+    结果只取决于输入本身，可以按内容缓存，再与其他片段直接拼接
+    """
+    global label_counter, call_counter, label_prefix, current_function
+    saved = (label_counter, call_counter, label_prefix, current_function)
+    label_counter, call_counter, label_prefix, current_function = 0, 0, prefix, ""
+    try:
+        return translate_program(program)
+    finally:
+        label_counter, call_counter, label_prefix, current_function = saved
 
 
+def translate_cached(program, cache: dict) -> list[str]:
+    """
+    按文件分片翻译，片段以 (file_stem, 内容摘要) 为键缓存在 cache 中
+    cache 只保留本次用到的片段，不会无限增长
+    """
+    # 只有常驻进程会用到，延迟导入以免拖慢一次性的命令行调用
+    import hashlib
+
+    groups = []
+    for file_stem, line in program:
+        if not groups or groups[-1][0] != file_stem:
+            groups.append((file_stem, []))
+        groups[-1][1].append(line)
+
+    asm = []
+    used = {}
+    for file_stem, lines in groups:
+        digest = hashlib.sha1(repr(lines).encode()).digest()
+        key = (file_stem, bump_alloc, intrinsic_calls, digest)
+        fragment = cache.get(key)
+        if fragment is None:
+            fragment = translate_fragment([(file_stem, line) for line in lines], f"{file_stem}$")
+        used[key] = fragment
+        asm.extend(fragment)
+
+    cache.clear()
+    cache.update(used)
+    return asm
+
+
+def count_rom_words(asm_lines: list[str]) -> int:
+    """
+    统计汇编指令占用的 ROM 字数（标签伪指令不占空间）
+    """
+    return sum(1 for asm in asm_lines if not asm.startswith("("))
+
+
+def parse_options(argv):
+    """
+    解析翻译选项，返回 (link_program 的关键字参数, 其余参数)
+    """
+    options = {
+        "dce": True, "inline_threshold": None, "regalloc": False, "bump": False,
+        "intrinsics": False,
+    }
+    args = []
+    for arg in argv:
+        if arg == "--no-dce":
+            options["dce"] = False
+        elif arg == "--regalloc":
+            options["regalloc"] = True
+        elif arg == "--bump-alloc":
+            options["bump"] = True
+        elif arg == "--intrinsics":
+            options["intrinsics"] = True
+        elif arg == "--inline":
+            options["inline_threshold"] = DEFAULT_THRESHOLD
+        elif arg.startswith("--inline="):
+            options["inline_threshold"] = int(arg.split("=", 1)[1])
+        else:
+            args.append(arg)
+    return options, args
 
 
 def main(argv=None):
@@ -628,78 +1235,367 @@ def main(argv=None):
     支持两种使用方式：
     1. nand2tetris vm Prog.vm      - 翻译单个VM文件，输出到stdout
     2. nand2tetris vm DirName      - 翻译目录下所有VM文件，输出到DirName/DirName.asm
+    VM 文件可以是 .vm 文本或 .vmb 字节码（见 vm/bytecode.py）
+
+    选项：
+    --no-dce        目录模式下保留不可达函数（默认从 Sys.init 做死代码消除）
+    --inline[=N]    内联不超过 N 条指令的叶子函数（默认 N=8）
+    --regalloc      把叶子函数中最常用的 local / argument 分配到 temp 1..7
+    --bump-alloc    目录模式下，Memory.deAlloc 不可达时把常量大小的 Memory.alloc
+                    （构造函数）改为内联的 bump 分配，按块向 Memory.alloc 申请
+    --intrinsics    目录模式下，Math.multiply / Math.divide 的调用改为跳到共享的
+                    Hack 乘除法例程，不走 call / return 协议
+    --source-map    同时生成 <name>.map.json（ROM 地址 -> VM 指令 / Jack 源码行），
+                    供 nand2tetris emu --profile 使用
+
+    批量模式：多个输入、glob（"src/*.vm"）或 @list.txt 时，一个进程处理全部输入，
+    X.vm 写出同目录的 X.asm，目录照常写出 <dir>/<dir>.asm；-j N 使用 N 个工作进程
     """
     if argv is None:
         argv = sys.argv[1:]
 
-    if len(argv) != 1:
-        print("Usage: nand2tetris vm <file.vm | directory>", file=sys.stderr)
+    from nand2tetris.common.batch import expand_inputs, parse_jobs, run_batch
+
+    usage = (
+        "Usage: nand2tetris vm [--no-dce] [--inline[=N]] [--regalloc] [--bump-alloc] "
+        "[--intrinsics] [--source-map] [-j N] <file.vm | file.vmb | directory> ..."
+    )
+    source_map = "--source-map" in argv
+    try:
+        jobs, argv = parse_jobs([arg for arg in argv if arg != "--source-map"])
+    except ValueError:
+        print(usage, file=sys.stderr)
         sys.exit(1)
+    options, args = parse_options(argv)
+    inputs = expand_inputs(args)
+
+    if not inputs:
+        print(usage, file=sys.stderr)
+        sys.exit(1)
+
+    if len(inputs) != 1 or inputs != args:
+        task = functools.partial(translate_to_file, source_map=source_map, **options)
+        if run_batch(task, inputs, jobs):
+            sys.exit(1)
+        return
 
-    path = Path(argv[0])
+    path = Path(inputs[0])
     
     if path.is_file():
         # 单个文件：直接翻译并输出到stdout
-        _translate_file(path)
+        _translate_file(
+            path,
+            inline_threshold=options["inline_threshold"],
+            regalloc=options["regalloc"],
+            source_map=source_map,
+        )
     elif path.is_dir():
         # 目录：翻译所有VM文件，输出到 <dir>/<dir>.asm
-        _translate_directory(path)
+        output_file = _translate_directory(path, source_map=source_map, **options)
+        if output_file:
+            print(f"Generated: {output_file}", file=sys.stderr)
     else:
-        print(f"Error: '{argv[0]}' is neither a file nor a directory", file=sys.stderr)
+        print(f"Error: '{inputs[0]}' is neither a file nor a directory", file=sys.stderr)
         sys.exit(1)
 
 
-def _translate_file(vm_file: Path):
+def _read_vm_lines(vm_file: Path, keep_locations: bool = False) -> list[str]:
     """
-    翻译单个VM文件，输出到stdout
+    读取VM文件，去掉空行和注释行
+    keep_locations=True 时保留 "// @File.jack:行号" 位置注释（用于生成源码映射）
+    文件通过 mmap 按字节扫描，只解码指令行；.vmb 字节码先解码再格式化
     """
-    with vm_file.open() as f:
-        lines = [
-            line.strip()
-            for line in f
-            if line.strip() and not line.strip().startswith("//")
+    if vm_file.suffix == ".vmb":
+        from nand2tetris.vm.bytecode import load_bytecode
+
+        return [
+            format_command(command)
+            for command in load_bytecode(vm_file)
+            if keep_locations or command[0] != Op.LOCATION
         ]
 
-    file_stem = vm_file.stem
-    for line in lines:
-        asm_lines = translate_line(line, file_stem)
-        for asm in asm_lines:
-            print(asm)
+    from nand2tetris.common.mmapio import code_lines, mapped
+
+    keep = LOCATION_PREFIX.encode() if keep_locations else None
+    with mapped(vm_file) as buf:
+        return [line.decode() for line in code_lines(buf, keep=keep)]
+
+
+def _vm_files(directory: Path) -> list[Path]:
+    """
+    目录中的 .vm 与 .vmb 文件，按文件名排序；同名的两种文件取较新的一个
+    """
+    chosen = {}
+    for vm_file in list(directory.glob("*.vm")) + list(directory.glob("*.vmb")):
+        other = chosen.get(vm_file.stem)
+        if other is None or vm_file.stat().st_mtime_ns > other.stat().st_mtime_ns:
+            chosen[vm_file.stem] = vm_file
+    return [chosen[stem] for stem in sorted(chosen)]
+
+
+def _log_stderr(message: str):
+    print(message, file=sys.stderr)
+
+
+def _inline(program, inline_threshold, log=None):
+    """
+    按阈值内联小叶子函数，并报告展开情况
+    """
+    program, counts = inline_functions(program, inline_threshold)
+    if counts and log:
+        summary = ", ".join(f"{name} x{n}" for name, n in sorted(counts.items()))
+        log(f"Inline: {summary}")
+    return program
+
+
+def _allocate(program, log=None):
+    """
+    叶子函数寄存器分配，并报告映射结果
+    """
+    program, report = allocate_registers(program)
+    if log:
+        for name, mapping in report.items():
+            regs = ", ".join(
+                f"{segment} {index}->temp {reg}"
+                for (segment, index), reg in sorted(mapping.items(), key=lambda item: item[1])
+            )
+            log(f"Regalloc: {name}: {regs}")
+    return program
+
+
+def _bump_sites(program, log=None) -> int:
+    """
+    可以改为 bump 分配的位置数；不安全时返回 0
+    只有对象从不释放（Memory.deAlloc 从 Sys.init 不可达）时，按块切分才与逐个分配等价
+    """
+    graph = build_call_graph(split_functions(program))
+    live = reachable_functions(graph, "Sys.init")
+    if BUMP_ALLOC not in graph:
+        return 0
+    if "Memory.deAlloc" in live:
+        if log:
+            log("Bump: Memory.deAlloc is reachable, allocation not specialized")
+        return 0
+
+    commands = [as_command(line) for _, line in program]
+    sites = sum(
+        1 for command, following in zip(commands, commands[1:])
+        if bump_size(command, following) is not None
+    )
+    if sites and log:
+        log(f"Bump: {sites} constant-size allocation site(s), {BUMP_CHUNK}-word chunks")
+    return sites
+
+
+def _intrinsic_sites(program, log=None) -> dict:
+    """
+    可以改为内建例程的乘除法调用：{函数名: 调用数}
+    """
+    counts = {}
+    for _, line in program:
+        op, name, n_args = as_command(line)
+        if op == Op.CALL and (name, n_args) in INTRINSICS:
+            counts[name] = counts.get(name, 0) + 1
+    if counts and log:
+        summary = ", ".join(f"{name} x{n}" for name, n in sorted(counts.items()))
+        log(f"Intrinsics: {summary}")
+    return counts
+
+
+def intrinsic_code(sites, source_map=None) -> list[str]:
+    """
+    用到的共享例程（放在 bootstrap 之后，不会被顺序执行到）
+    """
+    asm = []
+    if "Math.multiply" in sites:
+        code = multiply_code()
+        asm.extend(code)
+        if source_map is not None:
+            source_map.add(code, "intrinsic multiply", None, None)
+    if "Math.divide" in sites:
+        routine, call, rest = divide_code()
+        asm.extend(routine + call + rest)
+        if source_map is not None:
+            source_map.add(routine, "intrinsic divide", None, None)
+            source_map.add(call, "call Math.divide 2", None, None)
+            source_map.add(rest, "intrinsic divide", None, None)
+    return asm
+
+
+def link_program(
+    program, dce: bool = True, inline_threshold=None, regalloc=False, log=None, source_map=None,
+    cache=None, bump=False, intrinsics=False,
+):
+    """
+    把 [(file_stem, line), ...] 作为一个完整程序翻译为汇编行
+    line 是 VM 文本或指令元组（Jack 编译器的 compile_to_commands），两者可以混用
+
+    若其中定义了 Sys.init，则写入 bootstrap 代码，并删除从 Sys.init 不可达的函数
+    （先内联再做死代码消除，被完全内联的函数随之删除）
+    log: 可选的回调，接收各优化阶段的报告
+    source_map: 可选的 SourceMap，见 translate_program
+    cache: 可选的片段缓存（dict），按文件增量翻译，见 translate_cached
+    bump: 常量大小的 Memory.alloc 改为内联 bump 分配（需要 Sys.init，且对象从不释放）
+    intrinsics: Math.multiply / Math.divide 的调用改为共享的内建例程（需要 Sys.init）
+    """
+    global bump_alloc, intrinsic_calls, label_counter, call_counter, current_function
+    # 每次链接从头编号：同一程序总是得到同样的汇编，不依赖本进程之前翻译过什么
+    label_counter, call_counter, current_function = 0, 0, ""
+    if inline_threshold is not None:
+        program = _inline(program, inline_threshold, log)
+
+    has_entry = any(as_command(line)[:2] == (Op.FUNCTION, "Sys.init") for _, line in program)
+    sites = _intrinsic_sites(program, log) if intrinsics and has_entry else {}
+    intrinsics = bool(sites)
+
+    asm_output = []
+    removed = []
+    if has_entry:
+        asm_output.extend(bootstrap_code())
+        if source_map is not None:
+            source_map.add(bootstrap_code(), "bootstrap", None, None)
+        if dce:
+            # 乘法全部内建后 Math.multiply 不再被调用，可以删除
+            ignore = INTRINSIC_ONLY if intrinsics else ()
+            program, removed = eliminate_dead_code(program, "Sys.init", ignore)
+
+    if regalloc:
+        program = _allocate(program, log)
+
+    bump = bump and has_entry and _bump_sites(program, log) > 0
+    if bump:
+        call, rest = bump_refill_code()
+        asm_output.extend(call + rest)
+        if source_map is not None:
+            source_map.add(call, f"call {BUMP_ALLOC} 1", None, None)
+            source_map.add(rest, "bump refill", None, None)
+
+    if intrinsics:
+        asm_output.extend(intrinsic_code(sites, source_map))
+
+    bump_alloc = bump
+    intrinsic_calls = intrinsics
+    try:
+        if cache is not None and source_map is None:
+            asm_output.extend(translate_cached(program, cache))
+        else:
+            asm_output.extend(translate_program(program, source_map))
+    finally:
+        bump_alloc = False
+        intrinsic_calls = False
+
+    if removed and log:
+        # 被删除的函数单独翻译一次，只用于统计节省的 ROM 字数
+        saved = 0
+        for _, body in removed:
+            saved += count_rom_words(translate_program(body))
+        names = ", ".join(name for name, _ in removed)
+        log(
+            f"DCE: removed {len(removed)} unreachable function(s), "
+            f"saved {saved} ROM words: {names}"
+        )
+
+    return asm_output
+
+
+def translate_to_file(path, dce: bool = True, inline_threshold=None, regalloc=False,
+                      source_map=False, bump=False, intrinsics=False):
+    """
+    批量模式的单个输入：X.vm -> 同目录的 X.asm，目录 -> <dir>/<dir>.asm
+    返回输出路径
+    """
+    global label_counter, call_counter, current_function
+    # 每个输入从头编号：输出与单独运行时一致，不依赖批内顺序和工作进程分配
+    label_counter, call_counter, current_function = 0, 0, ""
+
+    path = Path(path)
+    if path.is_dir():
+        return _translate_directory(
+            path, dce=dce, inline_threshold=inline_threshold, regalloc=regalloc,
+            source_map=source_map, bump=bump, intrinsics=intrinsics,
+        )
+    if not path.is_file():
+        raise FileNotFoundError(f"No such file or directory: '{path}'")
+
+    output_file = path.with_suffix(".asm")
+    with output_file.open("w") as f:
+        _translate_file(path, inline_threshold, regalloc, source_map, out=f)
+    return output_file
 
 
-def _translate_directory(directory: Path):
+def _translate_file(vm_file: Path, inline_threshold=None, regalloc=False, source_map=False,
+                    out=None):
+    """
+    翻译单个VM文件，输出到stdout 或 out（源码映射写入 <file>.map.json）
+    """
+    file_stem = vm_file.stem
+    mapping = SourceMap() if source_map else None
+    if vm_file.suffix == ".vmb" and inline_threshold is None and not regalloc:
+        # 字节码直接以指令元组翻译，不经过文本
+        from nand2tetris.vm.bytecode import load_bytecode
+
+        program = [(file_stem, command) for command in load_bytecode(vm_file)]
+        asm_lines = translate_commands(program, mapping)
+    else:
+        program = [(file_stem, line) for line in _read_vm_lines(vm_file, source_map)]
+        if inline_threshold is not None:
+            program = _inline(program, inline_threshold, _log_stderr)
+        if regalloc:
+            program = _allocate(program, _log_stderr)
+        asm_lines = translate_program(program, mapping)
+
+    for asm in asm_lines:
+        print(asm, file=out)
+
+    if mapping is not None:
+        map_file = vm_file.with_suffix(".map.json")
+        mapping.save(map_file)
+        print(f"Generated: {map_file}", file=sys.stderr)
+
+
+def _translate_directory(
+    directory: Path, dce: bool = True, inline_threshold=None, regalloc=False, source_map=False,
+    bump=False, intrinsics=False,
+):
     """
     翻译目录下所有VM文件，输出到 <directory>/<directory.name>.asm
+    目录被视为一个完整程序，见 link_program
     """
-    vm_files = sorted(directory.glob("*.vm"))
+    vm_files = _vm_files(directory)
     
     if not vm_files:
         print(f"Warning: No .vm files found in {directory}", file=sys.stderr)
         return
     
-    asm_output = []
-    
+    program = []
     for vm_file in vm_files:
-        with vm_file.open() as f:
-            lines = [
-                line.strip()
-                for line in f
-                if line.strip() and not line.strip().startswith("//")
-            ]
-        
         file_stem = vm_file.stem
-        for line in lines:
-            asm_lines = translate_line(line, file_stem)
-            asm_output.extend(asm_lines)
+        program.extend((file_stem, line) for line in _read_vm_lines(vm_file, source_map))
+
+    mapping = SourceMap() if source_map else None
+    asm_output = link_program(
+        program,
+        dce=dce,
+        inline_threshold=inline_threshold,
+        regalloc=regalloc,
+        log=_log_stderr,
+        source_map=mapping,
+        bump=bump,
+        intrinsics=intrinsics,
+    )
     
     # 生成输出文件：<directory>/<directory.name>.asm
     output_file = directory / f"{directory.name}.asm"
     with output_file.open("w") as f:
         f.write("\n".join(asm_output) + "\n")
-    
-    print(f"Generated: {output_file}", file=sys.stderr)
+
+    if mapping is not None:
+        map_file = directory / f"{directory.name}.map.json"
+        mapping.save(map_file)
+        print(f"Generated: {map_file}", file=sys.stderr)
+
+    return output_file
 
 
 if __name__ == "__main__":
     main()
-
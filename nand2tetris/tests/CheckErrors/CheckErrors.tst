@@ -0,0 +1,14 @@
+// 只做调用检查，不运行；Lib.anything 只有 .vm，不检查
+error Main.jack:9:17 Point.new expects 2 argument(s), got 1
+error Main.jack:10:12 Point.setX expects 1 argument(s), got 2
+error Main.jack:11:17 Math.multiply expects 2 argument(s), got 1
+error Main.jack:13:12 Unknown class 'Shape'
+error Main.jack:14:12 Point.nope is not defined
+error Main.jack:15:12 Point.nope is not defined
+error Main.jack:16:12 Output.printBool is not defined
+error Main.jack:18:17 Point.getX is a method; call it on an object
+error Main.jack:19:17 Point.origin is a function; call it as Point.origin(...)
+error Main.jack:20:17 Point.new is a constructor; call it as Point.new(...)
+error Main.jack:21:12 Method Main.bump called inside function Main.main (no 'this')
+error Main.jack:23:17 Point.setX returns void; its value cannot be used
+error Main.jack:24:12 Cannot call method 'foo' on a value of type int
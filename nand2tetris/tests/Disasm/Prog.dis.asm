@@ -0,0 +1,39 @@
+@SP
+D=M
+@n
+M=D
+@i
+M=1
+@sum
+M=0
+(LOOP)
+@i
+D=M
+@n
+D=D-M
+@STORE
+D;JGT
+@i
+D=M
+@sum
+M=D+M
+@i
+M=M+1
+@LOOP
+0;JMP
+(STORE)
+@33
+D=A
+@R15
+M=D
+@sum
+D=M
+@LCL
+M=D
+@R15
+A=M
+0;JMP
+(RET)
+@RET
+0;JMP
+(END)
@@ -0,0 +1,25 @@
+// 变量先在 D=A 中出现（只取地址，不读写 M）：汇编器已按这里的顺序分配
+// base = 16, limit = 17, count = 18；反汇编时这些 @ 不能写成名字
+@base
+D=A
+@limit
+D=A
+@count
+D=A
+// count 是第一个读写 M 的变量，但 18 != 16 + 0，写成名字会被重新分配到 16
+@count
+M=0
+// base 恰好是下一个 (16)，之后 limit (17)，count 也就能写名字了
+@base
+M=D
+@limit
+M=D
+@count
+M=M+1
+@SP
+M=M+1
+@R13
+D=M
+(END)
+@END
+0;JMP
@@ -0,0 +1,21 @@
+@16
+D=A
+@17
+D=A
+@18
+D=A
+@18
+M=0
+@base
+M=D
+@limit
+M=D
+@count
+M=M+1
+@SP
+M=M+1
+@R13
+D=M
+(END)
+@END
+0;JMP
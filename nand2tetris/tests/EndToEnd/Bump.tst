@@ -0,0 +1,6 @@
+// 同一程序，构造函数改用 bump 分配后结果不变（Memory.deAlloc 不可达）
+vm --bump-alloc
+cycles 2000000
+stop Sys.halt
+ram 7999 9
+ram 8000-8008 1083 5 41 -14 -14 -35 5040 800 70
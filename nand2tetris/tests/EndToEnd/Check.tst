@@ -0,0 +1,2 @@
+// 整个程序（含 OS 类）通过调用检查；只检查，不运行
+check
@@ -0,0 +1,6 @@
+// 端到端：Jack -> VM -> Hack -> 模拟器
+// Output.printInt 把结果依次写入 RAM[8000..]，个数写入 RAM[7999]
+cycles 2000000
+stop Sys.halt
+ram 7999 9
+ram 8000-8008 1083 5 41 -14 -14 -35 5040 800 70
@@ -0,0 +1,6 @@
+// 同一程序，乘除法改用共享的内建例程后结果不变（含负数的乘除法）
+vm --intrinsics
+cycles 2000000
+stop Sys.halt
+ram 7999 9
+ram 8000-8008 1083 5 41 -14 -14 -35 5040 800 70
@@ -0,0 +1,7 @@
+// 按键脚本中同一周期的事件按书写顺序生效（含重复的事件）；
+// 录制后从中间的快照（第 260000 周期，正好有同一周期的三个事件）恢复，结果与直接运行相同
+cycles 1000000
+stop Sys.halt
+keys Keys.txt
+resume 20000
+ram 8000-8002 -8973 7 71
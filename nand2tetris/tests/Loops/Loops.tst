@@ -0,0 +1,4 @@
+// 旋转后的 while 与 Jack 语义一致：条件不是 true 就退出（位掩码条件的值可能是 4、-2 等）
+cycles 100000
+stop Sys.halt
+ram 8000-8003 1 0 6 1
@@ -0,0 +1,5 @@
+// 同一程序，打开内联与寄存器分配后结果不变
+vm --inline --regalloc
+cycles 100000
+stop Sys.halt
+ram 8000-8003 1 0 6 1